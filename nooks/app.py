@@ -26,7 +26,7 @@ def update(self, spec, document, upsert=False, multi=False, safe=False, check_ke
 Collection.update = update
 
 # Import models and database utilities
-from models import DatabaseManager, User, TestimonialModel
+from models import DatabaseManager, User, TestimonialModel, QuizScoreModel, QuizSessionModel, PointsLedgerModel
 
 # Import blueprints
 from blueprints.auth.routes import auth_bp
@@ -45,8 +45,15 @@ from blueprints.analytics import analytics_bp, configure_cache
 from blueprints.donations.routes import donations_bp
 from blueprints.testimonials.routes import testimonials_bp
 
+from blueprints.nook.services import ProgressService, PageTextService
+from blueprints.rewards.services import RewardCompactionService
+from blueprints.hook.timers import sweep_expired_timers, SWEEP_INTERVAL
+from blueprints.nooks_club.services import DailyQuizService
+
 # Import breadcrumb helper
 from utils.breadcrumbs import register_breadcrumbs
+from utils.scheduler import scheduler
+from utils.realtime import init_realtime
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
@@ -70,6 +77,11 @@ def create_app():
     app.config['WTF_CSRF_TIME_LIMIT'] = 7200
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
     app.config['CACHE_TYPE'] = 'simple'
+    app.config['BOOK_INDEX_SNAPSHOT'] = os.environ.get('BOOK_INDEX_SNAPSHOT', os.path.join(app.instance_path, 'book_index.json'))
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'true').lower() != 'false'
+    app.config['REWARD_ARCHIVE_DIR'] = os.environ.get('REWARD_ARCHIVE_DIR')  # Unset: archive to the rewards_archive collection
+    # `mongodb` uses the bundled broker on MONGO_URI; redis:// or amqp:// URLs use that service
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
     
     # Initialize MongoDB Client
     client = MongoClient(app.config['MONGO_URI'])
@@ -114,6 +126,9 @@ def create_app():
     # Initialize Flask-Caching for analytics blueprint
     configure_cache(app)
     
+    # Initialize Socket.IO (timer state push, club chat)
+    init_realtime(app)
+    
     # Register breadcrumb helper
     register_breadcrumbs(app)
     
@@ -183,6 +198,18 @@ def create_app():
     with app.app_context():
         DatabaseManager.initialize_database()
     
+    # Background jobs
+    scheduler.add_job('flush_reading_progress', ProgressService.flush_due, interval=ProgressService.FLUSH_INTERVAL)
+    scheduler.add_job('sweep_expired_timers', sweep_expired_timers, interval=SWEEP_INTERVAL)
+    scheduler.add_job('build_daily_quiz_sets', DailyQuizService.build_upcoming, interval=DailyQuizService.BUILD_INTERVAL)
+    scheduler.add_job('rebuild_quiz_scores', QuizScoreModel.rebuild, interval=QuizScoreModel.REBUILD_INTERVAL)
+    scheduler.add_job('finish_expired_quiz_sessions', QuizSessionModel.finish_expired, interval=QuizSessionModel.EXPIRE_INTERVAL)
+    scheduler.add_job('index_page_texts', PageTextService.index_pending, interval=PageTextService.INDEX_INTERVAL)
+    scheduler.add_job('snapshot_points_balances', PointsLedgerModel.snapshot_balances, interval=PointsLedgerModel.SNAPSHOT_INTERVAL)
+    scheduler.add_job('reconcile_points', PointsLedgerModel.reconcile, interval=PointsLedgerModel.RECONCILE_INTERVAL)
+    scheduler.add_job('compact_rewards', RewardCompactionService.compact, interval=RewardCompactionService.COMPACT_INTERVAL)
+    scheduler.init_app(app)
+    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(general_bp, url_prefix='/general')
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Socket.IO Fan-out Benchmark for Nook & Hook
+
+Starts N socketio_server.py processes sharing a message queue, connects M clients
+per club spread across them, publishes timestamped chat messages from outside
+every worker and reports how long each takes to reach every client in the club.
+Clients sign in as a throwaway member of throwaway clubs, which are removed afterwards.
+
+Usage:
+    python benchmark_socketio.py --workers 4 --clients 50 --clubs 5 --messages 100
+
+Environment Variables Required:
+    - MONGO_URI: MongoDB connection string (also used by the `mongodb` queue)
+"""
+
+import argparse
+import os
+import re
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+import socketio
+from bson import ObjectId
+from pymongo import MongoClient
+from werkzeug.security import generate_password_hash
+
+from utils.message_queue import create_client_manager
+
+
+def start_workers(count, base_port, queue):
+    """Launch worker processes and wait until each answers the Socket.IO handshake"""
+    env = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=queue, SCHEDULER_ENABLED='false')
+    workers = []
+    for i in range(count):
+        port = base_port + i
+        process = subprocess.Popen(
+            [sys.executable, 'socketio_server.py'],
+            env=dict(env, PORT=str(port)),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        workers.append((process, f'http://127.0.0.1:{port}'))
+
+    deadline = time.time() + 60
+    for process, url in workers:
+        while True:
+            try:
+                requests.get(f'{url}/socket.io/?EIO=4&transport=polling', timeout=1)
+                break
+            except requests.RequestException:
+                if time.time() > deadline or process.poll() is not None:
+                    stop_workers(workers)
+                    sys.exit(f'Worker at {url} did not start')
+                time.sleep(0.5)
+    return workers
+
+
+def stop_workers(workers):
+    for process, _ in workers:
+        process.terminate()
+    for process, _ in workers:
+        process.wait()
+
+
+def create_fixtures(db, clubs):
+    """A throwaway user who is a member of `clubs` new clubs; returns (user, password, club_ids)"""
+    password = secrets.token_urlsafe(16)
+    name = f'benchmark-{secrets.token_hex(4)}'
+    user = {
+        '_id': ObjectId(),
+        'username': name,
+        'email': f'{name}@benchmark.invalid',
+        'password_hash': generate_password_hash(password),
+        'is_active': True,
+        'is_admin': False
+    }
+    db.users.insert_one(user)
+    club_ids = [ObjectId() for _ in range(clubs)]
+    db.club_memberships.insert_many([
+        {'club_id': club_id, 'user_id': str(user['_id']), 'role': 'member'} for club_id in club_ids
+    ])
+    return user, password, [str(club_id) for club_id in club_ids]
+
+
+def remove_fixtures(db, user):
+    db.club_memberships.delete_many({'user_id': str(user['_id'])})
+    db.users.delete_one({'_id': user['_id']})
+
+
+def login_cookie(url, username, password):
+    """Session cookie from the real login form; sessions live in Mongo, so it works on every worker"""
+    page = requests.get(f'{url}/auth/login', timeout=10)
+    token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page.text).group(1)
+    cookies = page.cookies.get_dict()
+    response = requests.post(
+        f'{url}/auth/login',
+        data={'identifier': username, 'password': password, 'csrf_token': token},
+        cookies=cookies,
+        allow_redirects=False,
+        timeout=10
+    )
+    cookies.update(response.cookies.get_dict())
+    return '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+
+def connect_clients(workers, club_ids, per_club, cookie, latencies, lock):
+    """Connect `per_club` clients to every club, round-robin across workers"""
+    clients = []
+    for club, club_id in enumerate(club_ids):
+        for i in range(per_club):
+            client = socketio.Client(reconnection=False)
+
+            @client.on('chat_message')
+            def on_message(data, club_id=club_id):
+                received_at = time.time()
+                with lock:
+                    latencies.setdefault(club_id, []).append(received_at - data['sent_at'])
+
+            client.connect(workers[(club * per_club + i) % len(workers)][1], headers={'Cookie': cookie})
+            client.emit('join_club', {'club_id': club_id})
+            clients.append(client)
+    return clients
+
+
+def publisher_for(queue):
+    """Write-only client manager that emits into the queue like a worker would"""
+    manager = create_client_manager(queue, mongo_uri=os.environ.get('MONGO_URI'), write_only=True)
+    if manager:
+        return manager
+    if queue.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(queue, channel='flask-socketio', write_only=True)
+    return socketio.KombuManager(queue, channel='flask-socketio', write_only=True)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Socket.IO fan-out latency across worker processes')
+    parser.add_argument('--workers', type=int, default=2, help='socketio_server.py processes to start')
+    parser.add_argument('--clients', type=int, default=20, help='connected clients per club')
+    parser.add_argument('--clubs', type=int, default=5)
+    parser.add_argument('--messages', type=int, default=50, help='messages published per club')
+    parser.add_argument('--interval', type=float, default=0.02, help='seconds between messages')
+    parser.add_argument('--base-port', type=int, default=5100)
+    parser.add_argument('--queue', default=os.environ.get('SOCKETIO_MESSAGE_QUEUE', 'mongodb'))
+    args = parser.parse_args()
+
+    if not os.environ.get('MONGO_URI'):
+        sys.exit('MONGO_URI is required')
+
+    db = MongoClient(os.environ['MONGO_URI']).get_default_database()
+    user, password, club_ids = create_fixtures(db, args.clubs)
+    latencies = {}
+    lock = threading.Lock()
+    workers = start_workers(args.workers, args.base_port, args.queue)
+    clients = []
+    try:
+        # Joining a club's room requires a signed-in member
+        cookie = login_cookie(workers[0][1], user['username'], password)
+        clients = connect_clients(workers, club_ids, args.clients, cookie, latencies, lock)
+        time.sleep(1)  # Let room joins propagate to every worker
+
+        publisher = publisher_for(args.queue)
+        for n in range(args.messages):
+            for club_id in club_ids:
+                publisher.emit(
+                    'chat_message',
+                    {'user_id': 'benchmark', 'username': 'benchmark', 'message': f'message {n}', 'sent_at': time.time()},
+                    room=club_id,
+                    namespace='/'
+                )
+            time.sleep(args.interval)
+        time.sleep(3)  # Drain in-flight deliveries
+    finally:
+        for client in clients:
+            client.disconnect()
+        stop_workers(workers)
+        remove_fixtures(db, user)
+
+    expected = args.clubs * args.clients * args.messages
+    samples = [value for values in latencies.values() for value in values]
+    print(f'Workers: {args.workers}  Clubs: {args.clubs}  Clients/club: {args.clients}  Queue: {args.queue}')
+    print(f'Delivered: {len(samples)}/{expected} ({100 * len(samples) / max(1, expected):.1f}%)')
+    if samples:
+        print(f'Latency ms  mean {statistics.mean(samples) * 1000:.1f}  '
+              f'p50 {percentile(samples, 50) * 1000:.1f}  '
+              f'p95 {percentile(samples, 95) * 1000:.1f}  '
+              f'p99 {percentile(samples, 99) * 1000:.1f}  '
+              f'max {max(samples) * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main()
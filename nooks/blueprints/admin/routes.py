@@ -4,7 +4,7 @@ from bson import ObjectId
 from datetime import datetime, timedelta
 from utils.decorators import admin_required
 from blueprints.rewards.services import RewardService
-from models import AdminUtils, UserModel, ActivityLogger
+from models import AdminUtils, UserModel, ActivityLogger, CatalogModel
 
 admin_bp = Blueprint('admin', __name__, template_folder='templates')
 
@@ -145,8 +145,7 @@ def content():
     # Get content statistics
     content_stats = {
         'total_books': current_app.mongo.db.books.count_documents({}),
-        'unique_titles': len(current_app.mongo.db.books.distinct('title')),
-        'total_authors': len(current_app.mongo.db.books.distinct('authors')),
+        **CatalogModel.get_statistics(),
         'total_quotes': get_total_quotes(),
         'total_takeaways': get_total_takeaways(),
         'avg_book_rating': get_average_book_rating()
@@ -321,12 +320,13 @@ def cleanup_data():
             result = current_app.mongo.db.rewards.delete_many({
                 'user_id': {'$nin': list(user_ids)}
             })
+            current_app.mongo.db.reward_facets.delete_many({'_id': {'$nin': list(user_ids)}})
             flash(f'Removed {result.deleted_count} orphaned reward records', 'success')
         
         elif cleanup_type == 'orphaned_books':
             # Remove books for non-existent users
             user_ids = set(current_app.mongo.db.users.distinct('_id'))
-            result = current_app.mongo.db.books.delete_many({
+            result = CatalogModel.remove_books({
                 'user_id': {'$nin': list(user_ids)}
             })
             flash(f'Removed {result.deleted_count} orphaned book records', 'success')
@@ -477,10 +477,8 @@ def get_new_users_this_week():
 
 def get_total_points_awarded():
     """Get total points awarded across all users"""
-    result = list(current_app.mongo.db.rewards.aggregate([
-        {'$group': {'_id': None, 'total': {'$sum': '$points'}}}
-    ]))
-    return result[0]['total'] if result else 0
+    result = RewardService.reward_totals()
+    return result[0]['total_points'] if result else 0
 
 def get_average_user_level():
     """Get average user level"""
@@ -606,27 +604,9 @@ def get_activity_analytics():
 
 def get_reward_analytics():
     """Get reward analytics"""
-    # Points awarded by source
-    source_pipeline = [
-        {'$group': {
-            '_id': '$source',
-            'total_points': {'$sum': '$points'},
-            'count': {'$sum': 1}
-        }}
-    ]
-    
-    points_by_source = list(current_app.mongo.db.rewards.aggregate(source_pipeline))
-    
-    # Points awarded by category
-    category_pipeline = [
-        {'$group': {
-            '_id': '$category',
-            'total_points': {'$sum': '$points'},
-            'count': {'$sum': 1}
-        }}
-    ]
-    
-    points_by_category = list(current_app.mongo.db.rewards.aggregate(category_pipeline))
+    # Points awarded by source and by category, including compacted months
+    points_by_source = RewardService.reward_totals('source')
+    points_by_category = RewardService.reward_totals('category')
     
     return {
         'points_by_source': points_by_source,
@@ -635,27 +615,14 @@ def get_reward_analytics():
 
 def get_popular_content_analytics():
     """Get popular content analytics"""
-    # Most popular book titles
-    popular_books = list(current_app.mongo.db.books.aggregate([
-        {'$group': {
-            '_id': '$title',
-            'count': {'$sum': 1},
-            'avg_rating': {'$avg': '$rating'}
-        }},
-        {'$sort': {'count': -1}},
-        {'$limit': 10}
-    ]))
+    # Most popular book titles, from the catalog's popularity counters
+    popular_books = [
+        {'_id': book['_id']['title'], 'count': book['user_count'], 'avg_rating': book['avg_rating']}
+        for book in CatalogModel.get_popular(limit=10)
+    ]
     
     # Most popular authors
-    popular_authors = list(current_app.mongo.db.books.aggregate([
-        {'$unwind': '$authors'},
-        {'$group': {
-            '_id': '$authors',
-            'count': {'$sum': 1}
-        }},
-        {'$sort': {'count': -1}},
-        {'$limit': 10}
-    ]))
+    popular_authors = CatalogModel.get_popular_authors(limit=10)
     
     return {
         'popular_books': popular_books,
@@ -688,21 +655,7 @@ def get_average_book_rating():
 
 def get_popular_books():
     """Get most popular books (by number of users who added them)"""
-    return list(current_app.mongo.db.books.aggregate([
-        {'$group': {
-            '_id': {
-                'title': '$title',
-                'authors': '$authors'
-            },
-            'user_count': {'$sum': 1},
-            'avg_rating': {'$avg': '$rating'},
-            'finished_count': {
-                '$sum': {'$cond': [{'$eq': ['$status', 'finished']}, 1, 0]}
-            }
-        }},
-        {'$sort': {'user_count': -1}},
-        {'$limit': 20}
-    ]))
+    return CatalogModel.get_popular(limit=20)
 
 def get_top_point_earners():
     """Get top point earners"""
@@ -720,22 +673,8 @@ def get_top_point_earners():
 def get_reward_distribution():
     """Get reward distribution by source and category"""
     return {
-        'by_source': list(current_app.mongo.db.rewards.aggregate([
-            {'$group': {
-                '_id': '$source',
-                'total_points': {'$sum': '$points'},
-                'count': {'$sum': 1}
-            }},
-            {'$sort': {'total_points': -1}}
-        ])),
-        'by_category': list(current_app.mongo.db.rewards.aggregate([
-            {'$group': {
-                '_id': '$category',
-                'total_points': {'$sum': '$points'},
-                'count': {'$sum': 1}
-            }},
-            {'$sort': {'total_points': -1}}
-        ]))
+        'by_source': sorted(RewardService.reward_totals('source'), key=lambda item: item['total_points'], reverse=True),
+        'by_category': sorted(RewardService.reward_totals('category'), key=lambda item: item['total_points'], reverse=True)
     }
 
 def get_average_points_per_user():
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from bson import ObjectId
 from datetime import datetime, timedelta
 from blueprints.rewards.services import RewardService
+from blueprints.hook.timers import get_timer_state, serialize
 
 api_bp = Blueprint('api', __name__)
 
@@ -162,31 +163,7 @@ def dashboard_summary():
 @api_bp.route('/timer/status')
 @login_required
 def timer_status():
-    user_id = ObjectId(current_user.id)
-    timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
-    
-    if timer:
-        now = datetime.utcnow()
-        elapsed = (now - timer['start_time']).total_seconds()
-        
-        # Account for paused time
-        if timer.get('is_paused', False) and 'pause_start' in timer:
-            elapsed -= (now - timer['pause_start']).total_seconds()
-        
-        elapsed -= timer.get('paused_time', 0)
-        remaining = (timer['duration'] * 60) - elapsed
-        
-        return jsonify({
-            'active': True,
-            'task_name': timer['task_name'],
-            'remaining': max(0, remaining),
-            'is_paused': timer.get('is_paused', False),
-            'timer_type': timer['timer_type'],
-            'category': timer['category'],
-            'priority': timer.get('priority', 'medium')
-        })
-    
-    return jsonify({'active': False})
+    return jsonify(serialize(get_timer_state(current_user.id)))
 
 @api_bp.route('/achievements/progress')
 @login_required
@@ -251,6 +228,7 @@ def export_user_data():
     books = list(current_app.mongo.db.books.find({'user_id': user_id}))
     tasks = list(current_app.mongo.db.completed_tasks.find({'user_id': user_id}))
     rewards = list(current_app.mongo.db.rewards.find({'user_id': user_id}))
+    reward_summaries = list(current_app.mongo.db.reward_summaries.find({'user_id': user_id}, {'batches': 0}))
     badges = list(current_app.mongo.db.user_badges.find({'user_id': user_id}))
     sessions = list(current_app.mongo.db.reading_sessions.find({'user_id': user_id}))
     
@@ -273,6 +251,7 @@ def export_user_data():
         'books': convert_objectids(books),
         'tasks': convert_objectids(tasks),
         'rewards': convert_objectids(rewards),
+        'reward_summaries': convert_objectids(reward_summaries),
         'badges': convert_objectids(badges),
         'reading_sessions': convert_objectids(sessions)
     }
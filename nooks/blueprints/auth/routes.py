@@ -38,6 +38,7 @@ class SettingsForm(FlaskForm):
     default_timer_duration = IntegerField('Default Timer Duration (minutes)', validators=[DataRequired()])
     animations = BooleanField('Enable Animations')
     compact_mode = BooleanField('Compact Mode')
+    auto_complete_expired_timers = BooleanField('Complete Expired Timers Automatically')
     timer_theme = SelectField('Timer Theme', choices=[(t['name'], t['display_name']) for t in get_timer_themes()])
     dashboard_layout = SelectField('Dashboard Layout', choices=[
         ('default', 'Default'),
@@ -196,6 +197,7 @@ def settings():
         settings_form.default_timer_duration.data = user['preferences'].get('default_timer_duration', 25)
         settings_form.animations.data = user['preferences'].get('animations', False)
         settings_form.compact_mode.data = user['preferences'].get('compact_mode', False)
+        settings_form.auto_complete_expired_timers.data = user['preferences'].get('auto_complete_expired_timers', True)
         settings_form.timer_theme.data = user['preferences'].get('timer_theme', 'default')
         settings_form.dashboard_layout.data = user['preferences'].get('dashboard_layout', 'default')
         avatar_data = user['preferences'].get('avatar', {
@@ -227,6 +229,7 @@ def update_general_settings():
             'default_timer_duration': settings_form.default_timer_duration.data,
             'animations': settings_form.animations.data,
             'compact_mode': settings_form.compact_mode.data,
+            'auto_complete_expired_timers': settings_form.auto_complete_expired_timers.data,
             'timer_theme': settings_form.timer_theme.data,
             'dashboard_layout': settings_form.dashboard_layout.data,
         }
@@ -3,6 +3,7 @@ from flask_login import login_required  # Changed import to use Flask-Login
 from bson import ObjectId
 from datetime import datetime, timedelta
 from blueprints.rewards.services import RewardService
+from models import ReadingSessionModel
 
 dashboard_bp = Blueprint('dashboard', __name__, template_folder='templates')
 
@@ -293,9 +294,7 @@ def get_recent_activity(user_id):
     }).sort('date', -1).limit(10))
    
     # Recent reading sessions
-    recent_sessions = list(current_app.mongo.db.reading_sessions.find({
-        'user_id': user_id
-    }).sort('date', -1).limit(5))
+    recent_sessions = ReadingSessionModel.get_sessions(user_id, limit=5)
    
     return {
         'books': recent_books,
@@ -343,9 +342,10 @@ def get_reading_analytics(user_id):
         genre = book.get('genre', 'Unknown')
         genre_counts[genre] = genre_counts.get(genre, 0) + 1
    
-    # Reading pace (pages per session)
+    # Reading pace (pages per session); day buckets carry their own session counts
     total_pages = sum([session.get('pages_read', 0) for session in sessions])
-    avg_pages_per_session = total_pages / max(1, len(sessions))
+    total_sessions = sum([ReadingSessionModel.session_count(session) for session in sessions])
+    avg_pages_per_session = total_pages / max(1, total_sessions)
    
     # Favorite authors
     author_counts = {}
@@ -358,7 +358,7 @@ def get_reading_analytics(user_id):
     return {
         'genre_distribution': genre_counts,
         'avg_pages_per_session': round(avg_pages_per_session, 1),
-        'total_reading_sessions': len(sessions),
+        'total_reading_sessions': total_sessions,
         'top_authors': top_authors,
         'books_by_status': {
             'finished': len([b for b in books if b.get('status') == 'finished']),
@@ -409,7 +409,7 @@ def get_time_analytics(user_id):
     """Get time-based analytics"""
     # Weekly patterns
     tasks = list(current_app.mongo.db.completed_tasks.find({'user_id': user_id}))
-    sessions = list(current_app.mongo.db.reading_sessions.find({'user_id': user_id}))
+    sessions = ReadingSessionModel.get_sessions(user_id)
    
     # Day of week analysis
     weekday_tasks = [0] * 7  # Monday = 0, Sunday = 6
@@ -2,7 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from bson import ObjectId
 from datetime import datetime, timedelta
-from blueprints.rewards.services import RewardService
+from blueprints.hook.services import TaskCompletionService, TaskHistoryService
+from blueprints.hook.timers import get_timer_state, publish_timer_state, serialize, timer_registry
 
 hook_bp = Blueprint('hook', __name__, template_folder='templates')
 
@@ -17,7 +18,7 @@ def index():
     }).sort('completed_at', -1).limit(10))
     
     # Get active timer if any
-    active_timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
+    active_timer = timer_registry.load(user_id)
     
     # Calculate stats
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -56,7 +57,7 @@ def index():
 @login_required
 def timer():
     user_id = ObjectId(current_user.id)
-    active_timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
+    active_timer = timer_registry.load(user_id)
     
     # Get user preferences
     user = current_app.mongo.db.users.find_one({'_id': user_id})
@@ -89,10 +90,7 @@ def start_timer():
     category = request.form.get('category', 'general')
     priority = request.form.get('priority', 'medium')
     
-    # Clear any existing active timer
-    current_app.mongo.db.active_timers.delete_many({'user_id': user_id})
-    
-    # Create new timer
+    # Create new timer, replacing any existing active timer
     timer_data = {
         'user_id': user_id,
         'task_name': task_name,
@@ -107,7 +105,8 @@ def start_timer():
         'pause_count': 0
     }
     
-    current_app.mongo.db.active_timers.insert_one(timer_data)
+    timer = timer_registry.start(user_id, timer_data)
+    publish_timer_state(user_id, timer, 'start')
     
     return jsonify({'status': 'success', 'message': 'Timer started!'})
 
@@ -116,25 +115,10 @@ def start_timer():
 def pause_timer():
     user_id = ObjectId(current_user.id)
     
-    timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
+    timer = timer_registry.toggle_pause(user_id)
     if timer:
-        is_paused = not timer.get('is_paused', False)
-        update_data = {'is_paused': is_paused}
-        
-        if is_paused:
-            update_data['pause_start'] = datetime.utcnow()
-            update_data['pause_count'] = timer.get('pause_count', 0) + 1
-        else:
-            # Calculate paused time
-            if 'pause_start' in timer:
-                paused_duration = (datetime.utcnow() - timer['pause_start']).total_seconds()
-                update_data['paused_time'] = timer.get('paused_time', 0) + paused_duration
-                update_data['end_time'] = timer['end_time'] + timedelta(seconds=paused_duration)
-        
-        current_app.mongo.db.active_timers.update_one(
-            {'user_id': user_id},
-            {'$set': update_data}
-        )
+        is_paused = timer.get('is_paused', False)
+        publish_timer_state(user_id, timer, 'pause' if is_paused else 'resume')
         
         status = 'paused' if is_paused else 'resumed'
         return jsonify({'status': 'success', 'message': f'Timer {status}!'})
@@ -146,62 +130,26 @@ def pause_timer():
 def complete_timer():
     user_id = ObjectId(current_user.id)
     
-    timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
+    # Read from Mongo: the cached entry may predate a pause or a start on another process
+    timer = timer_registry.load(user_id)
     if timer:
         mood = request.form.get('mood', '😊')
         productivity_rating = int(request.form.get('productivity_rating', 3))
         notes = request.form.get('notes', '')
         
-        # Calculate actual duration
-        actual_duration = timer['duration']
-        if timer.get('paused_time', 0) > 0:
-            actual_duration -= timer['paused_time'] / 60  # Convert to minutes
-        
-        # Move to completed tasks
-        completed_task = {
-            'user_id': user_id,
-            'task_name': timer['task_name'],
-            'duration': timer['duration'],
-            'actual_duration': actual_duration,
-            'timer_type': timer['timer_type'],
-            'category': timer['category'],
-            'priority': timer.get('priority', 'medium'),
-            'completed_at': datetime.utcnow(),
-            'mood': mood,
-            'productivity_rating': productivity_rating,
-            'notes': notes,
-            'pause_count': timer.get('pause_count', 0),
-            'paused_time': timer.get('paused_time', 0)
-        }
-        
-        result = current_app.mongo.db.completed_tasks.insert_one(completed_task)
-        
-        # Award points based on duration and productivity
-        base_points = max(1, timer['duration'] // 5)  # 1 point per 5 minutes
-        productivity_bonus = productivity_rating - 3  # -2 to +2 bonus
-        priority_bonus = {'low': 0, 'medium': 1, 'high': 2}.get(timer.get('priority', 'medium'), 1)
-        
-        total_points = base_points + productivity_bonus + priority_bonus
-        
-        RewardService.award_points(
-            user_id=user_id,
-            points=max(1, total_points),  # Minimum 1 point
-            source='hook',
-            description=f'Completed task: {timer["task_name"]}',
-            category='task_completion',
-            reference_id=str(result.inserted_id)
-        )
-        
-        # Remove active timer
-        current_app.mongo.db.active_timers.delete_one({'user_id': user_id})
-        
-        # Check for streaks and badges
-        check_streaks_and_badges(user_id)
+        # Claims the timer and writes the task, rollups, streak and rewards together;
+        # None means a double submit or another device already completed it
+        result = TaskCompletionService.complete(timer, mood, productivity_rating, notes)
+        timer_registry.forget(user_id)
+        if not result:
+            return jsonify({'status': 'error', 'message': 'No active timer found'})
+        _, total_points = result
+        publish_timer_state(user_id, None, 'complete')
         
         return jsonify({
             'status': 'success', 
             'message': 'Task completed!', 
-            'points': max(1, total_points)
+            'points': total_points
         })
     
     return jsonify({'status': 'error', 'message': 'No active timer found'})
@@ -210,38 +158,15 @@ def complete_timer():
 @login_required
 def cancel_timer():
     user_id = ObjectId(current_user.id)
-    current_app.mongo.db.active_timers.delete_many({'user_id': user_id})
+    timer_registry.remove(user_id)
+    publish_timer_state(user_id, None, 'cancel')
     return jsonify({'status': 'success', 'message': 'Timer cancelled'})
 
 @hook_bp.route('/get_timer_status')
 @login_required
 def get_timer_status():
-    user_id = ObjectId(current_user.id)
-    timer = current_app.mongo.db.active_timers.find_one({'user_id': user_id})
-    
-    if timer:
-        now = datetime.utcnow()
-        elapsed = (now - timer['start_time']).total_seconds()
-        
-        # Account for paused time
-        if timer.get('is_paused', False) and 'pause_start' in timer:
-            elapsed -= (now - timer['pause_start']).total_seconds()
-        
-        elapsed -= timer.get('paused_time', 0)
-        
-        remaining = (timer['duration'] * 60) - elapsed
-        
-        return jsonify({
-            'active': True,
-            'task_name': timer['task_name'],
-            'remaining': max(0, remaining),
-            'is_paused': timer.get('is_paused', False),
-            'timer_type': timer['timer_type'],
-            'category': timer['category'],
-            'priority': timer.get('priority', 'medium')
-        })
-    
-    return jsonify({'active': False})
+    # Fallback for clients without a socket; state changes are pushed as `timer_state` events
+    return jsonify(serialize(get_timer_state(current_user.id)))
 
 @hook_bp.route('/history')
 @login_required
@@ -251,11 +176,9 @@ def history():
     # Get filter parameters
     category_filter = request.args.get('category', 'all')
     date_filter = request.args.get('date', 'all')
-    page = int(request.args.get('page', 1))
-    per_page = 20
     
     # Build query
-    query = {'user_id': user_id}
+    query = {}
     if category_filter != 'all':
         query['category'] = category_filter
     
@@ -270,30 +193,25 @@ def history():
             start_date = datetime.now() - timedelta(days=30)
             query['completed_at'] = {'$gte': start_date}
     
-    # Get tasks with pagination
-    skip = (page - 1) * per_page
-    tasks = list(current_app.mongo.db.completed_tasks.find(query)
-                .sort('completed_at', -1)
-                .skip(skip)
-                .limit(per_page))
+    # Get tasks with keyset pagination
+    tasks, older_cursor, newer_cursor = TaskHistoryService.page(
+        user_id, query,
+        before=request.args.get('before'),
+        after=request.args.get('after')
+    )
     
     # Get stats
-    total_tasks = current_app.mongo.db.completed_tasks.count_documents(query)
-    total_time = sum([task['duration'] for task in current_app.mongo.db.completed_tasks.find(query)])
-    
-    # Get unique categories for filter
-    all_tasks = list(current_app.mongo.db.completed_tasks.find({'user_id': user_id}))
-    categories = list(set([task.get('category', 'general') for task in all_tasks]))
+    stats = TaskHistoryService.summary(user_id, query, breakdowns=False)
     
     return render_template('hook/history.html', 
                          tasks=tasks, 
-                         total_tasks=total_tasks,
-                         total_time=total_time,
-                         categories=categories,
+                         total_tasks=stats['total_tasks'],
+                         total_time=stats['total_time'],
+                         categories=TaskHistoryService.categories(user_id),
                          current_category=category_filter,
                          current_date=date_filter,
-                         page=page,
-                         has_next=len(tasks) == per_page)
+                         older_cursor=older_cursor,
+                         newer_cursor=newer_cursor)
 
 @hook_bp.route('/analytics')
 @login_required
@@ -301,29 +219,19 @@ def analytics():
     user_id = ObjectId(current_user.id)
     
     # Get analytics data
-    tasks = list(current_app.mongo.db.completed_tasks.find({'user_id': user_id}))
+    summary = TaskHistoryService.summary(user_id)
     
     analytics_data = {
-        'total_tasks': len(tasks),
-        'total_time': sum([task['duration'] for task in tasks]),
-        'avg_session': sum([task['duration'] for task in tasks]) / max(1, len(tasks)),
+        'total_tasks': summary['total_tasks'],
+        'total_time': summary['total_time'],
+        'avg_session': summary['total_time'] / max(1, summary['total_tasks']),
         'productivity_streak': calculate_productivity_streak(user_id),
-        'tasks_by_category': {},
-        'tasks_by_mood': {},
+        'tasks_by_category': summary['tasks_by_category'],
+        'tasks_by_mood': summary['tasks_by_mood'],
         'productivity_trend': {},
-        'best_time_of_day': get_best_time_of_day(tasks)
+        'best_time_of_day': get_best_time_of_day(summary['tasks_by_hour'])
     }
     
-    # Tasks by category
-    for task in tasks:
-        category = task.get('category', 'general')
-        analytics_data['tasks_by_category'][category] = analytics_data['tasks_by_category'].get(category, 0) + 1
-    
-    # Tasks by mood
-    for task in tasks:
-        mood = task.get('mood', '😊')
-        analytics_data['tasks_by_mood'][mood] = analytics_data['tasks_by_mood'].get(mood, 0) + 1
-    
     return render_template('hook/analytics.html', analytics=analytics_data)
 
 @hook_bp.route('/themes')
@@ -362,36 +270,10 @@ def set_theme():
 
 def calculate_productivity_streak(user_id):
     """Calculate current productivity streak"""
-    tasks = list(current_app.mongo.db.completed_tasks.find({
-        'user_id': user_id
-    }).sort('completed_at', -1))
-    
-    if not tasks:
-        return 0
-    
-    streak = 0
-    current_date = datetime.now().date()
-    
-    # Group tasks by date
-    task_dates = set()
-    for task in tasks:
-        task_dates.add(task['completed_at'].date())
-    
-    # Calculate streak
-    while current_date in task_dates:
-        streak += 1
-        current_date -= timedelta(days=1)
-    
-    return streak
+    return TaskCompletionService.current_streak(user_id)
 
-def get_best_time_of_day(tasks):
-    """Analyze best time of day for productivity"""
-    hour_counts = {}
-    
-    for task in tasks:
-        hour = task['completed_at'].hour
-        hour_counts[hour] = hour_counts.get(hour, 0) + 1
-    
+def get_best_time_of_day(hour_counts):
+    """Analyze best time of day for productivity from task counts per hour"""
     if not hour_counts:
         return 'No data'
     
@@ -405,43 +287,3 @@ def get_best_time_of_day(tasks):
         return 'Evening'
     else:
         return 'Night'
-
-def check_streaks_and_badges(user_id):
-    """Check and award streaks and badges"""
-    today = datetime.now().date()
-    yesterday = today - timedelta(days=1)
-    
-    today_tasks = current_app.mongo.db.completed_tasks.count_documents({
-        'user_id': user_id,
-        'completed_at': {'$gte': datetime.combine(today, datetime.min.time())}
-    })
-    
-    # Daily completion badges
-    if today_tasks >= 5:
-        RewardService.award_points(
-            user_id=user_id,
-            points=25,
-            source='hook',
-            description='Daily Champion - 5 tasks completed',
-            category='achievement'
-        )
-    
-    if today_tasks >= 10:
-        RewardService.award_points(
-            user_id=user_id,
-            points=50,
-            source='hook',
-            description='Productivity Master - 10 tasks completed',
-            category='achievement'
-        )
-    
-    # Weekly streak check
-    streak = calculate_productivity_streak(user_id)
-    if streak >= 7:
-        RewardService.award_points(
-            user_id=user_id,
-            points=100,
-            source='hook',
-            description=f'Weekly Streak - {streak} days',
-            category='streak'
-        )
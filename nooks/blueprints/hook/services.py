@@ -0,0 +1,294 @@
+from flask import current_app
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+import logging
+
+from blueprints.rewards.services import RewardService
+from utils.pagination import keyset_page
+from utils.realtime import emit_to_user
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCompletionService:
+    """Single write path for turning a finished timer into a completed task.
+
+    Claiming the timer, inserting the task, bumping the user's `task_daily_rollups`
+    document and streak state, and writing every reward happen in one transaction
+    when the deployment supports it (replica set or mongos); on a standalone server
+    the same writes run in order without one. Threshold awards carry a per-day
+    `award_key`, so they are attempted only when a threshold is crossed and can
+    never be made twice.
+    """
+
+    # (tasks completed today, points, award key, description, category)
+    DAILY_TASK_AWARDS = [
+        (5, 25, 'daily_champion', 'Daily Champion - 5 tasks completed', 'achievement'),
+        (10, 50, 'productivity_master', 'Productivity Master - 10 tasks completed', 'achievement')
+    ]
+    STREAK_AWARD_DAYS = 7  # A streak award is made every time the streak reaches a multiple of this
+    STREAK_AWARD_POINTS = 100
+
+    _transactions_supported = None
+
+    @staticmethod
+    def task_points(timer, productivity_rating):
+        """Points for a task based on duration, productivity and priority"""
+        base_points = max(1, timer['duration'] // 5)  # 1 point per 5 minutes
+        productivity_bonus = productivity_rating - 3  # -2 to +2 bonus
+        priority_bonus = {'low': 0, 'medium': 1, 'high': 2}.get(timer.get('priority', 'medium'), 1)
+        return max(1, base_points + productivity_bonus + priority_bonus)  # Minimum 1 point
+
+    @staticmethod
+    def complete(timer, mood='', productivity_rating=3, notes='', completed_at=None,
+                 auto_completed=False, claim_timer=True):
+        """Record a finished timer; returns (task_id, points), or None if it was already completed.
+
+        With claim_timer the timer is deleted as part of the write, so a double submit
+        completes it once. Pass claim_timer=False when the caller already removed it.
+        """
+        user_id = timer['user_id']
+        completed_at = completed_at or datetime.utcnow()
+        day = datetime.combine(completed_at.date(), datetime.min.time())
+        day_key = day.strftime('%Y-%m-%d')
+
+        # Calculate actual duration
+        actual_duration = timer['duration']
+        if timer.get('paused_time', 0) > 0:
+            actual_duration -= timer['paused_time'] / 60  # Convert to minutes
+
+        task = {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'task_name': timer['task_name'],
+            'duration': timer['duration'],
+            'actual_duration': actual_duration,
+            'timer_type': timer['timer_type'],
+            'category': timer['category'],
+            'priority': timer.get('priority', 'medium'),
+            'completed_at': completed_at,
+            'mood': mood,
+            'productivity_rating': productivity_rating,
+            'notes': notes,
+            'pause_count': timer.get('pause_count', 0),
+            'paused_time': timer.get('paused_time', 0),
+            'auto_completed': auto_completed
+        }
+        points = TaskCompletionService.task_points(timer, productivity_rating)
+
+        # One-off backfills for users who completed tasks before this state existed
+        TaskCompletionService._seed_streak(user_id)
+        TaskHistoryService.categories(user_id)
+
+        def write(session):
+            db = current_app.mongo.db
+            if claim_timer and not db.active_timers.delete_one({'_id': timer['_id']}, session=session).deleted_count:
+                return None
+
+            db.completed_tasks.insert_one(task, session=session)
+
+            rollup = db.task_daily_rollups.find_one_and_update(
+                {'user_id': user_id, 'day': day},
+                {
+                    '$inc': {'tasks': 1, 'minutes': task['duration']},
+                    '$set': {'updated_at': datetime.utcnow()}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+
+            previous = db.users.find_one_and_update(
+                {'_id': user_id},
+                [{'$set': {
+                    'task_streak': TaskCompletionService._next_streak(day),
+                    'task_categories': {'$setUnion': [{'$ifNull': ['$task_categories', []]}, [task['category']]]}
+                }}],
+                projection={'task_streak': 1},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            ) or {}
+            previous_streak = previous.get('task_streak') or {}
+
+            awards = [{
+                'points': points,
+                'source': 'hook',
+                'description': f'Completed task: {timer["task_name"]}',
+                'category': 'task_completion',
+                'reference_id': str(task['_id'])
+            }]
+
+            # Each daily threshold is crossed by exactly one completion
+            for threshold, award_points, key, description, category in TaskCompletionService.DAILY_TASK_AWARDS:
+                if rollup['tasks'] == threshold:
+                    awards.append({
+                        'points': award_points,
+                        'source': 'hook',
+                        'description': description,
+                        'category': category,
+                        'award_key': f'{key}:{day_key}'
+                    })
+
+            # The streak only moves on the first task of a day that follows the last one
+            if previous_streak.get('last_day') == day - timedelta(days=1):
+                streak = previous_streak.get('current', 0) + 1
+                if streak % TaskCompletionService.STREAK_AWARD_DAYS == 0:
+                    awards.append({
+                        'points': TaskCompletionService.STREAK_AWARD_POINTS,
+                        'source': 'hook',
+                        'description': f'Weekly Streak - {streak} days',
+                        'category': 'streak',
+                        'award_key': f'weekly_streak:{day_key}'
+                    })
+
+            return RewardService.award_many(user_id, awards, session=session)
+
+        written = TaskCompletionService._run(write)
+        if written is None:
+            return None
+
+        RewardService.finish_awards(user_id)
+        emit_to_user(str(user_id), 'reward', {
+            'points': sum(reward['points'] for reward in written),
+            'awards': [{'description': reward['description'], 'points': reward['points']} for reward in written]
+        })
+        return task['_id'], points
+
+    @staticmethod
+    def current_streak(user_id):
+        """Days in a row with completed tasks, counting today; 0 if nothing was completed today"""
+        user_id = ObjectId(user_id)
+        TaskCompletionService._seed_streak(user_id)
+        user = current_app.mongo.db.users.find_one({'_id': user_id}, {'task_streak': 1}) or {}
+        state = user.get('task_streak') or {}
+        today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        return state.get('current', 0) if state.get('last_day') == today else 0
+
+    @staticmethod
+    def _next_streak(day):
+        """Pipeline expression for task_streak after a task completed on `day`"""
+        return {'$switch': {
+            'branches': [
+                # Same day again, or a late auto-completion for an earlier day
+                {'case': {'$gte': ['$task_streak.last_day', day]}, 'then': '$task_streak'},
+                {'case': {'$eq': ['$task_streak.last_day', day - timedelta(days=1)]},
+                 'then': {'last_day': day, 'current': {'$add': ['$task_streak.current', 1]}}}
+            ],
+            'default': {'last_day': day, 'current': 1}
+        }}
+
+    @staticmethod
+    def _seed_streak(user_id):
+        """Build task_streak from task history for a user that doesn't have it yet"""
+        if not current_app.mongo.db.users.find_one({'_id': user_id, 'task_streak': {'$exists': False}}, {'_id': 1}):
+            return
+
+        last_day = None
+        current = 0
+        for task in current_app.mongo.db.completed_tasks.find(
+            {'user_id': user_id}, {'completed_at': 1}
+        ).sort('completed_at', -1):
+            task_day = datetime.combine(task['completed_at'].date(), datetime.min.time())
+            if last_day is None:
+                last_day = task_day
+                current = 1
+            elif task_day == last_day - timedelta(days=current):
+                current += 1
+            elif task_day < last_day - timedelta(days=current - 1):
+                break
+
+        state = {'last_day': last_day, 'current': current} if last_day else None
+        current_app.mongo.db.users.update_one(
+            {'_id': user_id, 'task_streak': {'$exists': False}},
+            {'$set': {'task_streak': state}}
+        )
+
+    @staticmethod
+    def _run(write):
+        """Run `write(session)` in a transaction when the server supports them"""
+        client = current_app.mongo.cx
+        if TaskCompletionService._transactions_supported is None:
+            try:
+                hello = client.admin.command('hello')
+                TaskCompletionService._transactions_supported = bool(
+                    hello.get('setName') or hello.get('msg') == 'isdbgrid'
+                )
+            except PyMongoError as e:
+                logger.error(f"Error checking transaction support: {str(e)}")
+                TaskCompletionService._transactions_supported = False
+
+        if not TaskCompletionService._transactions_supported:
+            return write(None)
+        with client.start_session() as session:
+            return session.with_transaction(write)
+
+
+class TaskHistoryService:
+    """Read side of completed tasks for the history and analytics pages.
+
+    Pages are read with keyset pagination on the (user_id, completed_at) index, and
+    totals come from a single $facet aggregation, so neither loads the full history.
+    The category filter list is the `task_categories` set kept on the user document.
+    """
+
+    PER_PAGE = 20
+
+    @staticmethod
+    def page(user_id, query, before=None, after=None, per_page=None):
+        """One page of a user's tasks, newest first; returns (tasks, older_cursor, newer_cursor)"""
+        return keyset_page(
+            current_app.mongo.db.completed_tasks,
+            dict(query, user_id=ObjectId(user_id)),
+            'completed_at',
+            per_page or TaskHistoryService.PER_PAGE,
+            before=before,
+            after=after
+        )
+
+    @staticmethod
+    def summary(user_id, query=None, breakdowns=True):
+        """Totals for the matching tasks, plus per-category, per-mood and per-hour counts"""
+        facets = {
+            'totals': [{'$group': {'_id': None, 'count': {'$sum': 1}, 'minutes': {'$sum': '$duration'}}}]
+        }
+        if breakdowns:
+            facets['by_category'] = [{'$group': {
+                '_id': {'$ifNull': ['$category', 'general']}, 'count': {'$sum': 1}, 'minutes': {'$sum': '$duration'}
+            }}, {'$sort': {'count': -1}}]
+            facets['by_mood'] = [{'$group': {'_id': {'$ifNull': ['$mood', '😊']}, 'count': {'$sum': 1}}}]
+            facets['by_hour'] = [{'$group': {'_id': {'$hour': '$completed_at'}, 'count': {'$sum': 1}}}]
+
+        result = next(current_app.mongo.db.completed_tasks.aggregate([
+            {'$match': dict(query or {}, user_id=ObjectId(user_id))},
+            {'$project': {'duration': 1, 'category': 1, 'mood': 1, 'completed_at': 1}},
+            {'$facet': facets}
+        ]), {})
+
+        totals = (result.get('totals') or [{}])[0]
+        summary = {
+            'total_tasks': totals.get('count', 0),
+            'total_time': totals.get('minutes', 0)
+        }
+        if breakdowns:
+            summary['tasks_by_category'] = {row['_id']: row['count'] for row in result.get('by_category', [])}
+            summary['time_by_category'] = {row['_id']: row['minutes'] for row in result.get('by_category', [])}
+            summary['tasks_by_mood'] = {row['_id']: row['count'] for row in result.get('by_mood', [])}
+            summary['tasks_by_hour'] = {row['_id']: row['count'] for row in result.get('by_hour', [])}
+        return summary
+
+    @staticmethod
+    def categories(user_id):
+        """Categories the user has completed tasks in, seeded once from task history"""
+        user_id = ObjectId(user_id)
+        user = current_app.mongo.db.users.find_one({'_id': user_id}, {'task_categories': 1}) or {}
+        if 'task_categories' in user:
+            return sorted(user['task_categories'])
+
+        categories = list({c or 'general' for c in current_app.mongo.db.completed_tasks.distinct('category', {'user_id': user_id})})
+        current_app.mongo.db.users.update_one(
+            {'_id': user_id, 'task_categories': {'$exists': False}},
+            {'$set': {'task_categories': categories}}
+        )
+        return sorted(categories)
@@ -0,0 +1,209 @@
+from flask import current_app
+from flask_login import current_user
+from flask_socketio import emit
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+import logging
+import threading
+import time
+
+from blueprints.hook.services import TaskCompletionService
+from utils.realtime import socketio, emit_to_user
+
+logger = logging.getLogger(__name__)
+
+# How long a paused timer may sit before it counts as abandoned
+MAX_PAUSE = timedelta(hours=24)
+# Expired timers are left alone this long so the user can still fill in the completion form
+SWEEP_GRACE = timedelta(minutes=10)
+# Mongo's TTL index on expires_at (see DatabaseManager) is the backstop if the sweeper doesn't run
+SWEEP_INTERVAL = 60
+
+
+def expires_at(timer):
+    """When a timer stops being live: its end time, or MAX_PAUSE after a pause started"""
+    if timer.get('is_paused') and timer.get('pause_start'):
+        return timer['pause_start'] + MAX_PAUSE
+    return timer['end_time']
+
+
+class ActiveTimerRegistry:
+    """Per-process, write-through cache of `active_timers` keyed by user.
+
+    Writes go to Mongo first and then replace the cached entry, so status reads on a
+    warm cache never touch Mongo. Entries expire after CACHE_TTL seconds so changes
+    made by another worker are picked up. The cache only serves status polling: pause,
+    resume and complete read Mongo, since another process may have changed the timer.
+    """
+
+    CACHE_TTL = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+
+    def get(self, user_id):
+        """Active timer document for a user, or None"""
+        key = str(user_id)
+        with self._lock:
+            cached = self._timers.get(key)
+        if cached and time.time() - cached[1] < self.CACHE_TTL:
+            return cached[0]
+        return self.load(user_id)
+
+    def load(self, user_id):
+        """Active timer document for a user read from Mongo, refreshing the cache"""
+        timer = current_app.mongo.db.active_timers.find_one({'user_id': ObjectId(user_id)})
+        self._store(str(user_id), timer)
+        return timer
+
+    def start(self, user_id, timer_data):
+        """Replace any existing timer for the user with a new one"""
+        timer_data = dict(timer_data, user_id=ObjectId(user_id), expires_at=expires_at(timer_data))
+        timer = current_app.mongo.db.active_timers.find_one_and_replace(
+            {'user_id': ObjectId(user_id)},
+            timer_data,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._store(str(user_id), timer)
+        return timer
+
+    def toggle_pause(self, user_id):
+        """Pause a running timer or resume a paused one; returns the timer after the change,
+        or None if the user has no timer.
+
+        The flip is conditional on the state just read, and pause_start, end_time and
+        expires_at are computed by the server from its own clock, so two devices toggling
+        at once make one change rather than flipping twice or resuming from a stale pause.
+        """
+        current = self.load(user_id)
+        if not current:
+            return None
+        if current.get('is_paused'):
+            condition = {'is_paused': True}
+            pipeline = [
+                {'$set': {'_paused_ms': {'$cond': [
+                    {'$ifNull': ['$pause_start', False]}, {'$subtract': ['$$NOW', '$pause_start']}, 0
+                ]}}},
+                {'$set': {
+                    'is_paused': False,
+                    'paused_time': {'$add': [{'$ifNull': ['$paused_time', 0]}, {'$divide': ['$_paused_ms', 1000]}]},
+                    'end_time': {'$add': ['$end_time', '$_paused_ms']}
+                }},
+                {'$set': {'expires_at': '$end_time'}},
+                {'$unset': '_paused_ms'}
+            ]
+        else:
+            condition = {'is_paused': {'$ne': True}}
+            pipeline = [{'$set': {
+                'is_paused': True,
+                'pause_start': '$$NOW',
+                'pause_count': {'$add': [{'$ifNull': ['$pause_count', 0]}, 1]},
+                'expires_at': {'$add': ['$$NOW', MAX_PAUSE.total_seconds() * 1000]}
+            }}]
+        timer = current_app.mongo.db.active_timers.find_one_and_update(
+            {'_id': current['_id'], **condition},
+            pipeline,
+            return_document=ReturnDocument.AFTER
+        )
+        if timer is None:
+            # Another request toggled or removed it first; report the state it left
+            return self.load(user_id)
+        self._store(str(user_id), timer)
+        return timer
+
+    def remove(self, user_id):
+        """Delete the user's timer and return it; only one caller gets the document back"""
+        timer = current_app.mongo.db.active_timers.find_one_and_delete({'user_id': ObjectId(user_id)})
+        self._store(str(user_id), None)
+        return timer
+
+    def forget(self, user_id):
+        """Drop the cached entry so the next read goes to Mongo"""
+        with self._lock:
+            self._timers.pop(str(user_id), None)
+
+    def _store(self, key, timer):
+        with self._lock:
+            self._timers[key] = (timer, time.time())
+
+
+timer_registry = ActiveTimerRegistry()
+
+
+def _isoformat(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def serialize(timer, event=None):
+    """Client payload: `end_time` drives the countdown, `remaining` is included for older clients"""
+    now = datetime.utcnow()
+    if not timer:
+        payload = {'active': False}
+    else:
+        is_paused = timer.get('is_paused', False)
+        # While paused the clock is frozen at the moment the pause started
+        reference = timer.get('pause_start') if is_paused and timer.get('pause_start') else now
+        payload = {
+            'active': True,
+            'task_name': timer['task_name'],
+            'duration': timer['duration'],
+            'timer_type': timer['timer_type'],
+            'category': timer['category'],
+            'priority': timer.get('priority', 'medium'),
+            'is_paused': is_paused,
+            'end_time': _isoformat(timer['end_time']),
+            'remaining': max(0, (timer['end_time'] - reference).total_seconds())
+        }
+    payload['server_time'] = _isoformat(now)
+    if event:
+        payload['event'] = event
+    return payload
+
+
+def get_timer_state(user_id):
+    """Current timer for a user, served from the registry"""
+    return timer_registry.get(user_id)
+
+
+def publish_timer_state(user_id, timer, event):
+    """Push a timer change to every tab and device of the user"""
+    emit_to_user(str(user_id), 'timer_state', serialize(timer, event))
+
+
+def sweep_expired_timers():
+    """Complete or discard timers that ran out and were never closed, per user preference"""
+    cutoff = datetime.utcnow() - SWEEP_GRACE
+    expired = list(current_app.mongo.db.active_timers.find({'expires_at': {'$lt': cutoff}}, {'_id': 1}))
+    completed = discarded = 0
+    for entry in expired:
+        # Deleting is the claim, so concurrent sweepers in other workers can't double-complete
+        timer = current_app.mongo.db.active_timers.find_one_and_delete({'_id': entry['_id']})
+        if not timer:
+            continue
+        timer_registry.forget(timer['user_id'])
+        user = current_app.mongo.db.users.find_one(
+            {'_id': timer['user_id']}, {'preferences.auto_complete_expired_timers': 1}
+        ) or {}
+        if user.get('preferences', {}).get('auto_complete_expired_timers', True) and not timer.get('is_paused'):
+            TaskCompletionService.complete(
+                timer, completed_at=timer['end_time'], auto_completed=True, claim_timer=False
+            )
+            completed += 1
+            event = 'auto_complete'
+        else:
+            discarded += 1
+            event = 'expire'
+        publish_timer_state(timer['user_id'], None, event)
+    if completed or discarded:
+        logger.info(f"Swept expired timers: {completed} completed, {discarded} discarded")
+
+
+@socketio.on('timer_sync')
+def handle_timer_sync():
+    """Send the current state to a socket that just connected or reconnected"""
+    if not current_user.is_authenticated:
+        return
+    emit('timer_state', serialize(get_timer_state(current_user.id), 'sync'))
@@ -2,19 +2,21 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime, timedelta
 import os
 from werkzeug.utils import secure_filename
 from utils.google_books import search_books, get_book_details
+from utils.book_index import book_index
 from blueprints.rewards.services import RewardService
+from blueprints.nook.services import ProgressService, fernet
 import logging
-from cryptography.fernet import Fernet
 from io import BytesIO
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, TextAreaField, SelectField, IntegerField, HiddenField, BooleanField, FloatField
 from wtforms.validators import DataRequired, Optional, NumberRange
-from models import ActivityLogger  # Import ActivityLogger from models.py
+from models import ActivityLogger, CatalogModel, ReadingSessionModel  # Import ActivityLogger from models.py
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,9 +27,12 @@ nook_bp = Blueprint('nook', __name__, template_folder='templates')
 # Initialize CSRF protection for blueprint
 csrf = CSRFProtect()
 
-# Initialize encryption
-ENCRYPTION_KEY = os.environ.get('UPLOAD_ENCRYPTION_KEY', Fernet.generate_key())
-fernet = Fernet(ENCRYPTION_KEY)
+# Book search: results returned, and local hits needed before skipping Google Books
+SEARCH_RESULT_LIMIT = 10
+LOCAL_SEARCH_MIN_RESULTS = 5
+
+# Max page updates accepted in one viewer batch
+MAX_PROGRESS_BATCH = 50
 
 # Form Definitions
 class AddBookForm(FlaskForm):
@@ -92,9 +97,7 @@ def index():
     avg_rating = sum([b.get('rating', 0) for b in books if b.get('rating', 0) > 0]) / max(1, len([b for b in books if b.get('rating', 0) > 0]))
     
     # Get recent activity
-    recent_sessions = list(current_app.mongo.db.reading_sessions.find({
-        'user_id': user_id
-    }).sort('date', -1).limit(5))
+    recent_sessions = ReadingSessionModel.get_sessions(user_id, limit=5)
     
     stats = {
         'total_books': total_books,
@@ -236,8 +239,12 @@ def add_book():
                     'reading_sessions': [],
                     'pdf_path': pdf_path
                 }
+                if pdf_path:
+                    book_data['page_text_status'] = 'pending'
 
+                shared = CatalogModel.attach(book_data)
                 result = current_app.mongo.db.books.insert_one(book_data)
+                book_index.add_book(dict(book_data, **shared))
                 ActivityLogger.log_activity(
                     user_id=user_id,
                     action='add_book',
@@ -319,6 +326,7 @@ def edit_book(book_id):
                     with open(pdf_path_full, 'wb') as f:
                         f.write(encrypted_pdf)
                     update['pdf_path'] = f"uploads/{user_id}/{pdf_filename}"
+                    update['page_text_status'] = 'pending'
                     # Log upload
                     ActivityLogger.log_activity(
                         user_id=user_id,
@@ -327,6 +335,7 @@ def edit_book(book_id):
                         metadata={'book_id': book_id, 'filename': pdf_filename}
                     )
                 current_app.mongo.db.books.update_one({'_id': ObjectId(book_id)}, {'$set': update})
+                CatalogModel.status_changed(book.get('catalog_id'), book.get('status'), update['status'])
                 ActivityLogger.log_activity(
                     user_id=user_id,
                     action='edit_book',
@@ -348,6 +357,7 @@ def edit_book(book_id):
                 return render_template('nook/edit_book.html', form=form, book=book)
         
         # Pre-populate form with existing book data
+        CatalogModel.with_metadata(book)
         form.title.data = book.get('title', '')
         form.authors.data = ', '.join(book.get('authors', []))
         form.page_count.data = book.get('page_count', 0)
@@ -384,7 +394,9 @@ def delete_book(book_id):
                         logger.error(f"Error deleting PDF file {pdf_path_full}: {str(e)}")
 
             # Delete the book from the database
-            current_app.mongo.db.books.delete_one({'_id': ObjectId(book_id), 'user_id': user_id})
+            result = current_app.mongo.db.books.delete_one({'_id': ObjectId(book_id), 'user_id': user_id})
+            if result.deleted_count:
+                CatalogModel.book_removed(book)
             logger.info(f"Book {book_id} deleted by user {user_id}")
 
             # Log deletion
@@ -521,11 +533,20 @@ def search_books_route():
         query = request.args.get('q', '')
         logger.info(f"Search books query: {query}, Session ID: {session.sid if hasattr(session, 'sid') else 'None'}")
         if query:
-            books = search_books(query)
+            # Answer from the local catalog index first; only go to Google Books when it is thin
+            book_index.ensure_loaded()
+            books = book_index.search(query, limit=SEARCH_RESULT_LIMIT)
+            source = 'local'
+            if len(books) < LOCAL_SEARCH_MIN_RESULTS:
+                seen = {book_index.entry_key(b['title'], b['authors']) for b in books}
+                for book in search_books(query):
+                    if book_index.entry_key(book.get('title'), book.get('authors')) not in seen:
+                        books.append(book)
+                source = 'mixed' if seen else 'remote'
             sanitized_books = []
-            for book in books:
+            for book in books[:SEARCH_RESULT_LIMIT]:
                 sanitized_book = {
-                    'id': book.get('id', ''),
+                    'id': book.get('id') or book.get('google_books_id', ''),
                     'title': book.get('title', '').replace('<', '&lt;').replace('>', '&gt;'),
                     'authors': [author.replace('<', '&lt;').replace('>', '&gt;') for author in book.get('authors', [])],
                     'description': book.get('description', '').replace('<', '&lt;').replace('>', '&gt;'),
@@ -540,7 +561,7 @@ def search_books_route():
                 user_id=ObjectId(current_user.id),
                 action='search_books',
                 description=f'Searched books with query: {query}',
-                metadata={'query': query, 'result_count': len(sanitized_books)}
+                metadata={'query': query, 'result_count': len(sanitized_books), 'source': source}
             )
             return jsonify({
                 'books': sanitized_books,
@@ -556,6 +577,8 @@ def search_books_route():
 def book_detail(book_id):
     try:
         user_id = ObjectId(current_user.id)
+        # Apply any staged page turns so the detail view shows the latest progress
+        ProgressService.flush_user(user_id, book_id)
         book = current_app.mongo.db.books.find_one({
             '_id': ObjectId(book_id),
             'user_id': user_id
@@ -564,12 +587,10 @@ def book_detail(book_id):
         if not book:
             flash('Book not found', 'error')
             return redirect(url_for('nook.index'))
+        CatalogModel.with_metadata(book)
         
         # Get reading sessions for this book
-        reading_sessions = list(current_app.mongo.db.reading_sessions.find({
-            'user_id': user_id,
-            'book_id': ObjectId(book_id)
-        }).sort('date', -1))
+        reading_sessions = ReadingSessionModel.get_sessions(user_id, book_id=book_id)
         
         # Instantiate forms
         update_form = UpdateProgressForm()
@@ -615,6 +636,8 @@ def update_progress(book_id):
     form = UpdateProgressForm()
     try:
         user_id = ObjectId(current_user.id)
+        # Staged viewer pages go first, so a later flush can't undo this update
+        ProgressService.flush_user(user_id, book_id)
         book = current_app.mongo.db.books.find_one({
             '_id': ObjectId(book_id),
             'user_id': user_id
@@ -642,17 +665,15 @@ def update_progress(book_id):
                 )
                 
                 # Log reading session
-                session_data = {
-                    'user_id': user_id,
-                    'book_id': ObjectId(book_id),
-                    'pages_read': pages_read,
-                    'start_page': old_page,
-                    'end_page': current_page,
-                    'date': datetime.utcnow(),
-                    'notes': session_notes,
-                    'duration_minutes': duration_minutes
-                }
-                current_app.mongo.db.reading_sessions.insert_one(session_data)
+                ReadingSessionModel.record(
+                    user_id,
+                    book_id,
+                    pages_read,
+                    start_page=old_page,
+                    end_page=current_page,
+                    duration_minutes=duration_minutes,
+                    notes=session_notes
+                )
                 
                 ActivityLogger.log_activity(
                     user_id=user_id,
@@ -679,6 +700,7 @@ def update_progress(book_id):
                         {'_id': ObjectId(book_id)},
                         {'$set': {'status': 'finished', 'finished_at': datetime.utcnow()}}
                     )
+                    CatalogModel.status_changed(book.get('catalog_id'), book['status'], 'finished')
                     
                     ActivityLogger.log_activity(
                         user_id=user_id,
@@ -850,14 +872,17 @@ def rate_book(book_id):
             logger.info(f"Received CSRF Token: {request.form.get('csrf_token')}")
             logger.info(f"Form Data: {request.form}")
             if form.validate_on_submit():
-                current_app.mongo.db.books.update_one(
+                previous = current_app.mongo.db.books.find_one_and_update(
                     {'_id': ObjectId(book_id), 'user_id': user_id},
                     {'$set': {
                         'rating': form.rating.data,
                         'review': form.review.data,
                         'rated_at': datetime.utcnow()
-                    }}
+                    }},
+                    projection={'rating': 1, 'catalog_id': 1}
                 )
+                if previous:
+                    CatalogModel.rating_changed(previous.get('catalog_id'), previous.get('rating'), form.rating.data)
                 
                 ActivityLogger.log_activity(
                     user_id=user_id,
@@ -949,7 +974,10 @@ def analytics():
         user_id = ObjectId(current_user.id)
         # Get reading analytics data
         books = list(current_app.mongo.db.books.find({'user_id': user_id}))
-        sessions = list(current_app.mongo.db.reading_sessions.find({'user_id': user_id}))
+        total_sessions = sum(
+            ReadingSessionModel.session_count(doc)
+            for doc in current_app.mongo.db.reading_sessions.find({'user_id': user_id}, {'session_count': 1})
+        )
         
         # Calculate analytics
         analytics_data = {
@@ -982,7 +1010,7 @@ def analytics():
             user_id=user_id,
             action='view_analytics',
             description='Viewed reading analytics',
-            metadata={'total_books': len(books), 'total_sessions': len(sessions)}
+            metadata={'total_books': len(books), 'total_sessions': total_sessions}
         )
         
         return render_template('nook/analytics.html', analytics=analytics_data)
@@ -1039,72 +1067,54 @@ def update_progress_ajax(book_id):
         if not form.validate():
             return jsonify({'success': False, 'errors': form.errors}), 400
 
-        current_page = form.current_page.data
-        session_notes = form.session_notes.data
-        duration_minutes = form.duration_minutes.data or 0
-
-        old_page = book.get('current_page', 0)
-        pages_read = max(0, current_page - old_page)
+        # Bare page turns are staged and coalesced; an explicit session is recorded right away
+        if not form.session_notes.data and not form.duration_minutes.data:
+            ProgressService.record(user_id, book['_id'], form.current_page.data)
+            return jsonify({'success': True, 'status': book.get('status'), 'buffered': True})
 
-        # Update book progress
-        update = {
-            'current_page': current_page,
-            'last_read': datetime.utcnow()
-        }
-        if book.get('page_count') and current_page >= book['page_count'] and book['status'] != 'finished':
-            update['status'] = 'finished'
-            update['finished_at'] = datetime.utcnow()
-        else:
-            update['status'] = 'reading'
-
-        current_app.mongo.db.books.update_one({'_id': ObjectId(book_id)}, {'$set': update})
-
-        # Log reading session
-        session_data = {
-            'user_id': user_id,
-            'book_id': ObjectId(book_id),
-            'pages_read': pages_read,
-            'start_page': old_page,
-            'end_page': current_page,
-            'date': datetime.utcnow(),
-            'notes': session_notes or '',
-            'duration_minutes': duration_minutes
-        }
-        current_app.mongo.db.reading_sessions.insert_one(session_data)
-
-        # Log activity
-        ActivityLogger.log_activity(
-            user_id=user_id,
-            action='progress_update',
-            description=f'Updated progress for book: {book["title"]}',
-            metadata={'book_id': book_id, 'current_page': current_page}
+        ProgressService.flush_user(user_id, book['_id'])
+        book = current_app.mongo.db.books.find_one({'_id': book['_id']})
+        status = ProgressService.apply(
+            user_id,
+            book,
+            form.current_page.data,
+            duration_minutes=form.duration_minutes.data or 0,
+            notes=form.session_notes.data
         )
+        return jsonify({'success': True, 'status': status})
+    except Exception as e:
+        logger.error(f"Error updating progress for book {book_id}: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
 
-        # Award points for progress
-        if pages_read > 0:
-            points = min(pages_read, 20)
-            RewardService.award_points(
-                user_id=user_id,
-                points=points,
-                source='nook',
-                description=f'Read {pages_read} pages in {book["title"]}',
-                category='reading_progress',
-                reference_id=str(book_id)
-            )
+@nook_bp.route('/progress/batch', methods=['POST'])
+@login_required
+def progress_batch():
+    """Accept debounced page updates from the PDF viewer and stage the latest page per book"""
+    try:
+        user_id = ObjectId(current_user.id)
+        updates = (request.get_json(silent=True) or {}).get('updates') or []
+        if not isinstance(updates, list) or len(updates) > MAX_PROGRESS_BATCH:
+            return jsonify({'success': False, 'error': 'Invalid updates'}), 400
 
-        # Award points for completion
-        if 'finished_at' in update:
-            RewardService.award_points(
-                user_id=user_id,
-                points=50,
-                source='nook',
-                description=f'Finished reading "{book["title"]}"',
-                category='book_completion',
-                reference_id=str(book_id),
-                goal_type='book_finished'
+        latest = {}
+        for item in updates:
+            try:
+                book_id = ObjectId(item['book_id'])
+                page = int(item['page'])
+            except (KeyError, TypeError, ValueError, InvalidId):
+                return jsonify({'success': False, 'error': 'Invalid update entry'}), 400
+            if page >= 0:
+                latest[book_id] = page
+
+        owned = {
+            b['_id'] for b in current_app.mongo.db.books.find(
+                {'_id': {'$in': list(latest)}, 'user_id': user_id}, {'_id': 1}
             )
+        } if latest else set()
+        for book_id in owned:
+            ProgressService.record(user_id, book_id, latest[book_id])
 
-        return jsonify({'success': True, 'status': update['status']})
+        return jsonify({'success': True, 'accepted': len(owned)})
     except Exception as e:
-        logger.error(f"Error updating progress for book {book_id}: {str(e)}", exc_info=True)
-        return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
+        logger.error(f"Error staging progress batch: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Server error'}), 500
@@ -0,0 +1,233 @@
+from flask import current_app
+from bson import ObjectId
+from cryptography.fernet import Fernet
+from datetime import datetime, timedelta
+from io import BytesIO
+import logging
+import os
+import re
+
+from blueprints.rewards.services import RewardService
+from models import ActivityLogger, CatalogModel, PageTextModel, ReadingSessionModel
+from utils import text_fingerprint
+from utils.scheduler import run_blocking
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Optional: without pypdf uploaded books wait in the page text queue
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# Uploaded PDFs, and the page text extracted from them, are encrypted at rest
+ENCRYPTION_KEY = os.environ.get('UPLOAD_ENCRYPTION_KEY', Fernet.generate_key())
+fernet = Fernet(ENCRYPTION_KEY)
+
+
+class ProgressService:
+    """Coalesces page-turn progress from the PDF viewer into consolidated reading sessions.
+
+    Page updates are upserted into `progress_staging`, one document per (user, book),
+    keeping only the latest page. A staged buffer is flushed as a single reading
+    session, activity entry and points award once the reader has been idle for
+    IDLE_SECONDS or the buffer is older than MAX_BUFFER_SECONDS.
+    """
+
+    IDLE_SECONDS = 120
+    MAX_BUFFER_SECONDS = 15 * 60
+    FLUSH_INTERVAL = 30  # How often the scheduler looks for due buffers
+    MAX_POINTS_PER_SESSION = 20
+
+    @staticmethod
+    def record(user_id, book_id, page, at=None):
+        """Stage the latest page a user reached in a book"""
+        at = at or datetime.utcnow()
+        current_app.mongo.db.progress_staging.update_one(
+            {'user_id': ObjectId(user_id), 'book_id': ObjectId(book_id)},
+            {
+                '$set': {'page': page, 'last_at': at},
+                '$setOnInsert': {'first_at': at},
+                '$inc': {'updates': 1}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    def flush_due():
+        """Flush every staged buffer that is idle or has reached the max interval"""
+        now = datetime.utcnow()
+        due = current_app.mongo.db.progress_staging.find({
+            '$or': [
+                {'last_at': {'$lte': now - timedelta(seconds=ProgressService.IDLE_SECONDS)}},
+                {'first_at': {'$lte': now - timedelta(seconds=ProgressService.MAX_BUFFER_SECONDS)}}
+            ]
+        }, {'_id': 1})
+        flushed = sum(1 for staged in due if ProgressService._flush_one({'_id': staged['_id']}))
+        if flushed:
+            logger.info(f"Flushed {flushed} staged reading progress buffers")
+        return flushed
+
+    @staticmethod
+    def flush_user(user_id, book_id=None):
+        """Flush a user's staged progress right away, e.g. before showing their book"""
+        query = {'user_id': ObjectId(user_id)}
+        if book_id:
+            query['book_id'] = ObjectId(book_id)
+        staged_ids = [s['_id'] for s in current_app.mongo.db.progress_staging.find(query, {'_id': 1})]
+        return sum(1 for staged_id in staged_ids if ProgressService._flush_one({'_id': staged_id}))
+
+    @staticmethod
+    def _flush_one(query):
+        # Deleting the buffer is the claim: only one worker gets the document back
+        staged = current_app.mongo.db.progress_staging.find_one_and_delete(query)
+        if not staged:
+            return False
+        book = current_app.mongo.db.books.find_one({'_id': staged['book_id'], 'user_id': staged['user_id']})
+        if not book:
+            return False
+        duration_minutes = round((staged['last_at'] - staged['first_at']).total_seconds() / 60)
+        ProgressService.apply(
+            staged['user_id'],
+            book,
+            staged['page'],
+            duration_minutes=duration_minutes,
+            date=staged['last_at'],
+            metadata={'coalesced_updates': staged.get('updates', 1)}
+        )
+        return True
+
+    @staticmethod
+    def apply(user_id, book, current_page, duration_minutes=0, notes='', date=None, metadata=None):
+        """Move a book to `current_page` and record one reading session, activity entry and award.
+
+        Books never move backwards here: a page behind the book's current page (a staged
+        viewer page flushed after a later update, say) is skipped and nothing is recorded.
+        """
+        user_id = ObjectId(user_id)
+        date = date or datetime.utcnow()
+
+        update = {
+            'current_page': current_page,
+            'last_read': date
+        }
+        if book.get('page_count') and current_page >= book['page_count'] and book['status'] != 'finished':
+            update['status'] = 'finished'
+            update['finished_at'] = datetime.utcnow()
+        elif book.get('status') != 'finished':
+            update['status'] = 'reading'
+
+        previous = current_app.mongo.db.books.find_one_and_update(
+            {'_id': book['_id'], '$or': [
+                {'current_page': {'$lte': current_page}},
+                {'current_page': {'$exists': False}}
+            ]},
+            {'$set': update},
+            projection={'current_page': 1}
+        )
+        if previous is None:
+            return book.get('status')
+        old_page = previous.get('current_page') or 0
+        pages_read = max(0, current_page - old_page)
+        CatalogModel.status_changed(book.get('catalog_id'), book.get('status'), update.get('status', book.get('status')))
+
+        ReadingSessionModel.record(
+            user_id,
+            book['_id'],
+            pages_read,
+            start_page=old_page,
+            end_page=current_page,
+            duration_minutes=duration_minutes,
+            notes=notes,
+            date=date
+        )
+
+        ActivityLogger.log_activity(
+            user_id=user_id,
+            action='progress_update',
+            description=f'Updated progress for book: {book["title"]}',
+            metadata=dict(metadata or {}, book_id=str(book['_id']), current_page=current_page)
+        )
+
+        if pages_read > 0:
+            RewardService.award_points(
+                user_id=user_id,
+                points=min(pages_read, ProgressService.MAX_POINTS_PER_SESSION),
+                source='nook',
+                description=f'Read {pages_read} pages in {book["title"]}',
+                category='reading_progress',
+                reference_id=str(book['_id'])
+            )
+
+        if 'finished_at' in update:
+            RewardService.award_points(
+                user_id=user_id,
+                points=50,
+                source='nook',
+                description=f'Finished reading "{book["title"]}"',
+                category='book_completion',
+                reference_id=str(book['_id']),
+                goal_type='book_finished'
+            )
+
+        return update.get('status', book.get('status'))
+
+
+class PageTextService:
+    """Extracts the text of uploaded PDFs page by page, off the request path.
+
+    Uploads mark the book `page_text_status: pending`; the scheduled job claims books
+    one at a time, decrypts each PDF once, and stores every page's text (encrypted)
+    and trigram hashes through PageTextModel. Quotes already waiting on the book are
+    then matched, so moderators see where each quote was found without opening the PDF.
+    """
+
+    INDEX_INTERVAL = 60
+    BOOKS_PER_RUN = 3
+
+    @staticmethod
+    def index_pending():
+        """Scheduled job: index a few pending books; a no-op until pypdf is installed"""
+        if PdfReader is None:
+            return 0
+        indexed = 0
+        for _ in range(PageTextService.BOOKS_PER_RUN):
+            book = PageTextModel.claim_book()
+            if not book:
+                break
+            PageTextService.index_book(book)
+            indexed += 1
+        return indexed
+
+    @staticmethod
+    def index_book(book):
+        try:
+            with open(os.path.join(current_app.root_path, 'static', book['pdf_path']), 'rb') as f:
+                encrypted = f.read()
+            # pypdf is pure Python and slow on long books; keep it off the event loop
+            pages = run_blocking(PageTextService.extract_pages, encrypted)
+            PageTextModel.save_pages(book['_id'], pages)
+            PageTextModel.finish_book(book['_id'], 'indexed', len(pages))
+            matched = PageTextModel.match_pending_quotes(book['_id'])
+            logger.info(f"Indexed {len(pages)} pages of {book.get('title', book['_id'])}; matched {matched} pending quotes")
+        except Exception as e:
+            logger.error(f"Error indexing page text for book {book['_id']}: {str(e)}")
+            PageTextModel.finish_book(book['_id'], 'failed')
+
+    @staticmethod
+    def extract_pages(encrypted):
+        """(encrypted text, word grams) for each page of an encrypted PDF; safe off the app context"""
+        reader = PdfReader(BytesIO(fernet.decrypt(encrypted)))
+        pages = []
+        for page in reader.pages:
+            # Rejoin words hyphenated across line breaks before they are split into grams
+            text = re.sub(r'-\s*\n\s*(\w)', r'\1', page.extract_text() or '')
+            pages.append((fernet.encrypt(text.encode('utf-8')).decode('ascii'), text_fingerprint.word_grams(text)))
+        return pages
+
+    @staticmethod
+    def page_text(book_id, page):
+        """Decrypted text of one page, or None if the book has no indexed text for it"""
+        doc = PageTextModel.get_page(book_id, page)
+        if not doc:
+            return None
+        return fernet.decrypt(doc['text'].encode('ascii')).decode('utf-8')
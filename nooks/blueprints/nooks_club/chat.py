@@ -0,0 +1,214 @@
+from flask import current_app
+from bson import ObjectId
+from collections import deque
+from datetime import datetime
+from pymongo.errors import BulkWriteError, PyMongoError
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from models import ClubChatMessageModel
+from utils.pagination import decode_cursor, encode_cursor
+from utils.realtime import socketio
+
+logger = logging.getLogger(__name__)
+
+RING_SIZE = 200  # Recent messages kept in memory per club
+REFRESH_SECONDS = 10  # Reload from Mongo so messages posted on other workers show up
+PAGE_SIZE = 50
+WRITE_BATCH = 100
+WRITE_LINGER = 0.5  # Seconds the writer waits to fill a batch
+
+
+class ChatWriter:
+    """Persists chat messages in batches on a background thread.
+
+    Messages get their _id and timestamp when posted, so they can be broadcast and
+    referenced before they reach Mongo; the writer drains the queue with insert_many.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+        self._pending = {}
+
+    def submit(self, message):
+        with self._lock:
+            self._pending[message['_id']] = message
+            if not self._thread or not self._thread.is_alive():
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, name='nooks-chat-writer', daemon=True)
+                self._thread.start()
+        self._queue.put(message['_id'])
+
+    def discard(self, message_id):
+        """Drop a message that hasn't been written yet; returns True if it was pending"""
+        with self._lock:
+            return self._pending.pop(message_id, None) is not None
+
+    def pending(self, club_id):
+        with self._lock:
+            return [m for m in self._pending.values() if m['club_id'] == club_id]
+
+    def flush(self):
+        """Write everything queued so far; used at shutdown and by the writer thread"""
+        ids = []
+        while True:
+            try:
+                ids.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(ids)
+
+    def _run(self):
+        while True:
+            ids = [self._queue.get()]
+            deadline = time.time() + WRITE_LINGER
+            while len(ids) < WRITE_BATCH:
+                try:
+                    ids.append(self._queue.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            self._write(ids)
+
+    def _write(self, ids):
+        with self._lock:
+            messages = [self._pending[i] for i in ids if i in self._pending]
+        if not messages:
+            return
+        try:
+            with self._app.app_context():
+                ClubChatMessageModel.save_messages(messages)
+        except BulkWriteError as e:
+            # Duplicates mean an earlier attempt got through; anything else is lost
+            failed = [err for err in e.details.get('writeErrors', []) if err.get('code') != 11000]
+            if failed:
+                logger.error(f"Error saving {len(failed)} chat messages: {failed[0].get('errmsg')}")
+        except PyMongoError as e:
+            logger.error(f"Error saving {len(messages)} chat messages: {str(e)}")
+        with self._lock:
+            for message in messages:
+                self._pending.pop(message['_id'], None)
+
+
+class ChatBuffer:
+    """Per-process ring buffer of each club's most recent messages, newest last"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clubs = {}
+
+    def recent(self, club_id):
+        """Up to RING_SIZE recent messages for a club, loading from Mongo when cold or stale"""
+        with self._lock:
+            entry = self._clubs.get(club_id)
+        if entry and time.time() - entry['loaded_at'] < REFRESH_SECONDS:
+            with self._lock:
+                return list(entry['messages'])
+
+        messages, _, _ = ClubChatMessageModel.get_messages(club_id, limit=RING_SIZE)
+        messages = _with_usernames(messages)
+        # Keep messages this process posted that the writer hasn't saved yet
+        saved = {m['_id'] for m in messages}
+        messages.extend(m for m in chat_writer.pending(club_id) if m['_id'] not in saved)
+        messages.sort(key=lambda m: (m['timestamp'], m['_id']))
+        with self._lock:
+            self._clubs[club_id] = {'messages': deque(messages, maxlen=RING_SIZE), 'loaded_at': time.time()}
+            return list(self._clubs[club_id]['messages'])
+
+    def append(self, message):
+        with self._lock:
+            entry = self._clubs.get(message['club_id'])
+            if entry:
+                entry['messages'].append(message)
+
+    def remove(self, club_id, message_id):
+        with self._lock:
+            entry = self._clubs.get(club_id)
+            if entry:
+                entry['messages'] = deque(
+                    (m for m in entry['messages'] if m['_id'] != message_id), maxlen=RING_SIZE
+                )
+
+
+chat_writer = ChatWriter()
+chat_buffer = ChatBuffer()
+atexit.register(chat_writer.flush)
+
+
+def _with_usernames(messages):
+    """Fill in usernames for messages saved before they were denormalized, in one query"""
+    missing = {m['user_id'] for m in messages if not m.get('username')}
+    if missing:
+        ids = [ObjectId(u) for u in missing if ObjectId.is_valid(u)]
+        names = {str(u['_id']): u['username'] for u in current_app.mongo.db.users.find({'_id': {'$in': ids}}, {'username': 1})}
+        for m in messages:
+            if not m.get('username'):
+                m['username'] = names.get(m['user_id'], m['user_id'])
+    return messages
+
+
+def serialize_message(message):
+    return {
+        '_id': str(message['_id']),
+        'message_id': str(message['_id']),
+        'club_id': str(message['club_id']),
+        'user_id': message['user_id'],
+        'username': message.get('username') or message['user_id'],
+        'message': message['message'],
+        'timestamp': message['timestamp'].isoformat() + 'Z'
+    }
+
+
+def post_message(club_id, user_id, username, text):
+    """Broadcast a chat message right away and queue it for a batched write"""
+    now = datetime.utcnow()
+    message = {
+        '_id': ObjectId(),
+        'club_id': ObjectId(club_id),
+        'user_id': str(user_id),
+        'username': username,
+        'message': text,
+        'timestamp': now.replace(microsecond=now.microsecond // 1000 * 1000)  # Mongo stores milliseconds
+    }
+    chat_buffer.append(message)
+    chat_writer.submit(message)
+    try:
+        socketio.emit('chat_message', serialize_message(message), to=str(club_id))
+    except Exception as e:
+        logger.error(f"Error broadcasting chat message in club {club_id}: {str(e)}")
+    return message
+
+
+def delete_message(club_id, message_id):
+    """Delete a message whether or not it has been written yet"""
+    club_id, message_id = ObjectId(club_id), ObjectId(message_id)
+    chat_buffer.remove(club_id, message_id)
+    if chat_writer.discard(message_id):
+        return True
+    return current_app.mongo.db.club_chat_messages.delete_one({'_id': message_id, 'club_id': club_id}).deleted_count > 0
+
+
+def get_history(club_id, before=None, limit=PAGE_SIZE):
+    """A page of messages oldest first, plus a cursor for the page before it (None at the start)"""
+    club_id = ObjectId(club_id)
+    buffered = chat_buffer.recent(club_id)
+    # A buffer that isn't full holds the club's whole history
+    complete = len(buffered) < RING_SIZE
+    position = decode_cursor(before)
+    if position:
+        buffered = [m for m in buffered if (m['timestamp'], m['_id']) < position]
+
+    # Serve from the buffer unless the page reaches back past what it holds
+    if len(buffered) >= limit or complete:
+        page = buffered[-limit:]
+        has_older = len(buffered) > len(page) or not complete
+        older = encode_cursor(page[0], 'timestamp') if page and has_older else None
+        return page, older
+
+    messages, older, _ = ClubChatMessageModel.get_messages(club_id, limit=limit, before=before)
+    return list(reversed(_with_usernames(messages))), older
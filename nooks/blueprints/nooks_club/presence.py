@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+
+from utils.realtime import socketio, listen_to_queue
+
+logger = logging.getLogger(__name__)
+
+FLUSH_MS = 500  # Presence changes in a room go out at most this often
+HEARTBEAT_SECONDS = 25  # Clients send presence_heartbeat this often; processes sync as often
+EXPIRY_SECONDS = 60  # Sockets and other processes' members not refreshed in this long are dropped
+SYNC_ROOM = 'presence:sync'  # No socket joins it, so emits there only travel the message queue
+
+
+class PresenceTracker:
+    """Who is online in each club room, kept in memory.
+
+    Sockets on this process are tracked by sid. Members on other processes arrive as
+    presence_diff and presence_sync emits on the message queue, tagged with the host
+    they came from, and are dropped when that host stops refreshing them. Joins,
+    leaves, heartbeats and typing are a few dict operations each; changes collect per
+    room and go out as one presence_diff every FLUSH_MS instead of an event apiece.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sockets = {}  # sid -> {'user_id', 'username', 'clubs', 'seen'}
+        self._rooms = {}  # club_id -> {user_id: {'username', 'hosts': {host: expires_at or None}}}
+        self._local = {}  # (club_id, user_id) -> this process's sockets for the pair
+        self._dirty = {}  # club_id -> pending changes broadcast to every process
+        self._stale = {}  # club_id -> members of dead hosts, announced to local sockets only
+        self._host = None
+        self._task = None
+
+    def join(self, sid, club_id, user_id, username):
+        with self._lock:
+            self._start()
+            sock = self._sockets.setdefault(sid, {'user_id': user_id, 'username': username, 'clubs': set()})
+            sock['seen'] = time.time()
+            if club_id in sock['clubs']:
+                return
+            sock['clubs'].add(club_id)
+            key = (club_id, user_id)
+            self._local[key] = self._local.get(key, 0) + 1
+            if self._local[key] == 1:
+                self._add(club_id, user_id, username, self._host, None)
+
+    def leave(self, sid, club_id):
+        with self._lock:
+            sock = self._sockets.get(sid)
+            if sock and club_id in sock['clubs']:
+                sock['clubs'].discard(club_id)
+                self._release(club_id, sock['user_id'])
+
+    def disconnect(self, sid):
+        with self._lock:
+            sock = self._sockets.pop(sid, None)
+            for club_id in sock['clubs'] if sock else ():
+                self._release(club_id, sock['user_id'])
+
+    def heartbeat(self, sid):
+        with self._lock:
+            sock = self._sockets.get(sid)
+            if sock:
+                sock['seen'] = time.time()
+
+    def typing(self, sid, club_id, is_typing):
+        with self._lock:
+            sock = self._sockets.get(sid)
+            if sock and club_id in sock['clubs']:
+                self._changes(club_id)['typing'][sock['user_id']] = bool(is_typing)
+
+    def members(self, club_id):
+        """Everyone online in a club across all processes, from memory"""
+        now = time.time()
+        with self._lock:
+            room = self._rooms.get(club_id, {})
+            # Claims the sweep hasn't dropped yet still count as gone
+            return [
+                {'user_id': user_id, 'username': member['username']}
+                for user_id, member in room.items()
+                if any(expires_at is None or expires_at >= now for expires_at in member['hosts'].values())
+            ]
+
+    def apply_remote(self, event, data):
+        """Fold another process's presence changes into this process's view"""
+        if event not in ('presence_diff', 'presence_sync') or not isinstance(data, dict):
+            return
+        host = data.get('host')
+        expires_at = time.time() + EXPIRY_SECONDS
+        with self._lock:
+            # Remote members need sweeping even on a process with no sockets of its own
+            self._start()
+            if event == 'presence_sync':
+                for club_id, users in data.get('rooms', {}).items():
+                    for user_id, username in users:
+                        self._add(club_id, user_id, username, host, expires_at)
+                return
+            club_id = data.get('club_id')
+            for member in data.get('joined', []):
+                self._add(club_id, member['user_id'], member['username'], host, expires_at)
+            for user_id in data.get('left', []):
+                self._remove(club_id, user_id, host)
+
+    def _start(self):
+        if self._task is None:
+            self._host = getattr(socketio.server.manager, 'host_id', 'local')
+            self._task = socketio.start_background_task(self._run)
+
+    def _changes(self, club_id):
+        return self._dirty.setdefault(club_id, {'joined': {}, 'left': set(), 'typing': {}})
+
+    def _add(self, club_id, user_id, username, host, expires_at):
+        room = self._rooms.setdefault(club_id, {})
+        member = room.get(user_id)
+        if member:
+            new_claim = host not in member['hosts']
+            member['hosts'][host] = expires_at
+            # Other processes must learn of this host's claim now, not at the next sync,
+            # or one of them could announce the member as gone while they're still here
+            if new_claim and host == self._host:
+                self._changes(club_id)['joined'][user_id] = username
+            return
+        room[user_id] = {'username': username, 'hosts': {host: expires_at}}
+        if host == self._host:
+            changes = self._changes(club_id)
+            # A leave and rejoin inside one flush window cancel out
+            if user_id in changes['left']:
+                changes['left'].discard(user_id)
+            else:
+                changes['joined'][user_id] = username
+
+    def _remove(self, club_id, user_id, host):
+        """Drop one host's claim on a member; returns True if the member went offline"""
+        room = self._rooms.get(club_id, {})
+        member = room.get(user_id)
+        if not member or host not in member['hosts']:
+            return False
+        del member['hosts'][host]
+        if member['hosts']:
+            return False
+        del room[user_id]
+        if not room:
+            del self._rooms[club_id]
+        return True
+
+    def _release(self, club_id, user_id):
+        key = (club_id, user_id)
+        self._local[key] -= 1
+        if self._local[key]:
+            return
+        del self._local[key]
+        if self._remove(club_id, user_id, self._host):
+            changes = self._changes(club_id)
+            if changes['joined'].pop(user_id, None) is None:
+                changes['left'].add(user_id)
+            changes['typing'].pop(user_id, None)
+
+    def _sweep(self, now):
+        """Drop sockets that stopped sending heartbeats and members of hosts that stopped syncing"""
+        for sid in [sid for sid, sock in self._sockets.items() if now - sock['seen'] > EXPIRY_SECONDS]:
+            sock = self._sockets.pop(sid)
+            for club_id in sock['clubs']:
+                self._release(club_id, sock['user_id'])
+        for club_id, room in list(self._rooms.items()):
+            for user_id, member in list(room.items()):
+                for host, expires_at in list(member['hosts'].items()):
+                    if expires_at is not None and expires_at < now and self._remove(club_id, user_id, host):
+                        self._stale.setdefault(club_id, set()).add(user_id)
+
+    def _run(self):
+        last_sync = 0
+        while True:
+            socketio.sleep(FLUSH_MS / 1000)
+            try:
+                now = time.time()
+                sync = None
+                with self._lock:
+                    if now - last_sync >= HEARTBEAT_SECONDS:
+                        last_sync = now
+                        self._sweep(now)
+                        sync = self._snapshot()
+                    dirty, self._dirty = self._dirty, {}
+                    stale, self._stale = self._stale, {}
+                    online = {club_id: len(self._rooms.get(club_id, {})) for club_id in set(dirty) | set(stale)}
+                self._flush(dirty, stale, online)
+                if sync is not None:
+                    socketio.emit('presence_sync', sync, to=SYNC_ROOM)
+            except Exception as e:
+                logger.error(f"Error flushing presence: {str(e)}")
+
+    def _snapshot(self):
+        rooms = {}
+        for club_id, user_id in self._local:
+            rooms.setdefault(club_id, []).append([user_id, self._rooms[club_id][user_id]['username']])
+        return {'host': self._host, 'rooms': rooms}
+
+    def _flush(self, dirty, stale, online):
+        for club_id, changes in dirty.items():
+            typing = changes['typing']
+            socketio.emit('presence_diff', {
+                'club_id': club_id,
+                'host': self._host,
+                'joined': [{'user_id': u, 'username': n} for u, n in changes['joined'].items()],
+                'left': list(changes['left']),
+                'typing': [u for u, t in typing.items() if t],
+                'stopped_typing': [u for u, t in typing.items() if not t],
+                'online': online[club_id]
+            }, to=club_id)
+        # Every surviving process notices a dead host, so each tells only its own sockets
+        for club_id, users in stale.items():
+            socketio.emit('presence_diff', {
+                'club_id': club_id,
+                'host': self._host,
+                'joined': [],
+                'left': list(users),
+                'typing': [],
+                'stopped_typing': [],
+                'online': online[club_id]
+            }, to=club_id, ignore_queue=True)
+
+
+presence_tracker = PresenceTracker()
+listen_to_queue(presence_tracker.apply_remote)
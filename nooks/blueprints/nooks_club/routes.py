@@ -1,10 +1,14 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
 from bson import ObjectId
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-from models import QuizQuestionModel, ClubModel, ClubPostModel, ClubChatMessageModel, FlashcardModel, QuizAnswerModel, UserProgressModel, UserModel
+from models import QuizQuestionModel, ClubModel, ClubMembershipModel, ClubPostModel, FlashcardModel, QuizAnswerModel, QuizScoreModel, QuizSessionModel, UserModel
+from blueprints.nooks_club.chat import get_history, post_message, delete_message, serialize_message
+from blueprints.nooks_club.presence import presence_tracker
+from blueprints.nooks_club.services import DailyQuizService
+from blueprints.analytics import cache
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField
 from wtforms.validators import DataRequired, Length
@@ -22,7 +26,58 @@ class ClubForm(FlaskForm):
 
 # --- Helper: Check if user is club admin/moderator ---
 def is_club_admin(club, user_id):
-    return str(user_id) in [str(a) for a in club.get('admins', [])]
+    return ClubMembershipModel.is_admin(club['_id'], user_id)
+
+def is_club_member(club, user_id):
+    return ClubMembershipModel.is_member(club['_id'], user_id)
+
+QUIZ_TIME_LIMIT_SECONDS = 60
+
+FEED_CACHE_TTL = 15  # Seconds the first feed page of a club is served from cache
+
+def feed_cache_key(club_id):
+    return f'club_feed:{club_id}'
+
+def serialize_post(post):
+    return {
+        '_id': str(post['_id']),
+        'club_id': str(post['club_id']),
+        'user_id': str(post['user_id']),
+        'username': post.get('username') or str(post['user_id']),
+        'avatar_url': post.get('avatar_url'),
+        'content': post.get('content'),
+        'created_at': post['created_at'].isoformat() + 'Z',
+        'like_count': post.get('like_count', 0),
+        'comment_count': post.get('comment_count', 0)
+    }
+
+def serialize_flashcard(card):
+    return {
+        '_id': str(card['_id']),
+        'user_id': str(card['user_id']),
+        'front': card['front'],
+        'back': card['back'],
+        'tags': card.get('tags', []),
+        'review_count': card.get('review_count', 0),
+        'ease': card.get('ease'),
+        'interval': card.get('interval'),
+        'next_review_at': card['next_review_at'].isoformat() + 'Z' if card.get('next_review_at') else None,
+        'created_at': card['created_at'].isoformat() + 'Z' if card.get('created_at') else None
+    }
+
+def serialize_clubs(clubs, user_id):
+    """JSON-ready club list with the user's membership, using one query for creator names"""
+    roles = ClubMembershipModel.user_roles(user_id)
+    usernames = UserModel.get_usernames_by_ids(c['creator_id'] for c in clubs)
+    for c in clubs:
+        role = roles.get(c['_id'])
+        c['_id'] = str(c['_id'])
+        c['creator_id'] = str(c['creator_id'])
+        c['creator_username'] = usernames.get(c['creator_id']) or c['creator_id']
+        c['member_count'] = c.get('member_count', 0)
+        c['is_member'] = role is not None
+        c['is_admin'] = role == 'admin'
+    return clubs
 
 @nooks_club_bp.route('/')
 @login_required
@@ -69,7 +124,7 @@ def view_club(club_id):
             flash("Club not found.", "danger")
             return redirect(url_for('nooks_club.index'))
         is_admin = is_club_admin(club, current_user.id)
-        is_member = str(current_user.id) in [str(m) for m in club.get('members', [])]
+        is_member = is_club_member(club, current_user.id)
         creator_username = UserModel.get_username_by_id(club['creator_id']) or club['creator_id']
         club_name = club.get('name', 'Unknown Club')
         return render_template('nooks_club/club_detail.html', club=club, club_id=club_id, club_name=club_name, is_admin=is_admin, is_member=is_member, creator_username=creator_username, csrf_token=generate_csrf())
@@ -125,6 +180,7 @@ def create_post(club_id):
             return redirect(url_for('nooks_club.index'))
         content = request.form.get('post')
         ClubPostModel.create_post(club_id, str(current_user.id), content)
+        cache.delete(feed_cache_key(club_id))
         flash('Post created successfully!', 'success')
         return redirect(url_for('nooks_club.view_club', club_id=club_id))
     except Exception as e:
@@ -156,13 +212,7 @@ def club_chat(club_id):
 def api_get_clubs():
     try:
         logger.info(f"User {current_user.id} fetching all clubs")
-        clubs = ClubModel.get_all_clubs()
-        for c in clubs:
-            c['_id'] = str(c['_id'])
-            c['creator_id'] = str(c['creator_id'])
-            c['creator_username'] = UserModel.get_username_by_id(c['creator_id']) or c['creator_id']
-            c['members'] = [str(m) for m in c.get('members', [])]
-            c['is_admin'] = is_club_admin(c, current_user.id)
+        clubs = serialize_clubs(ClubModel.get_all_clubs(), current_user.id)
         return jsonify({'clubs': clubs})
     except Exception as e:
         logger.error(f"Error fetching clubs for user {current_user.id}: {str(e)}", exc_info=True)
@@ -191,13 +241,15 @@ def api_get_club(club_id):
         club = ClubModel.get_club(club_id)
         if not club:
             return jsonify({'error': 'Club not found'}), 404
+        club['is_admin'] = is_club_admin(club, current_user.id)
+        club['is_member'] = is_club_member(club, current_user.id)
+        club['admins'] = ClubMembershipModel.get_admins(club['_id'])
+        usernames = UserModel.get_usernames_by_ids(club['admins'] + [club['creator_id']])
+        club['admin_usernames'] = [usernames.get(a) or a for a in club['admins']]
         club['_id'] = str(club['_id'])
         club['creator_id'] = str(club['creator_id'])
-        club['creator_username'] = UserModel.get_username_by_id(club['creator_id']) or club['creator_id']
-        club['members'] = [str(m) for m in club.get('members', [])]
-        club['admins'] = [str(a) for a in club.get('admins', [])]
-        club['admin_usernames'] = [UserModel.get_username_by_id(a) or a for a in club['admins']]
-        club['is_admin'] = is_club_admin(club, current_user.id)
+        club['creator_username'] = usernames.get(club['creator_id']) or club['creator_id']
+        club['member_count'] = club.get('member_count', 0)
         return jsonify(club)
     except Exception as e:
         logger.error(f"Error fetching club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
@@ -217,18 +269,44 @@ def api_join_club(club_id):
         logger.error(f"Error joining club {club_id} via API for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
 
+@nooks_club_bp.route('/api/clubs/<club_id>/leave', methods=['POST'])
+@login_required
+def api_leave_club(club_id):
+    try:
+        club = ClubModel.get_club(club_id)
+        if not club:
+            return jsonify({'error': 'Club not found'}), 404
+        if is_club_admin(club, current_user.id) and club.get('admin_count', 0) <= 1:
+            return jsonify({'error': 'Promote another admin before leaving'}), 400
+        logger.info(f"User {current_user.id} leaving club {club_id} via API")
+        if not ClubMembershipModel.leave(club_id, current_user.id):
+            return jsonify({'error': 'Not a club member'}), 400
+        return jsonify({'message': f"Left {club.get('name', 'club')}"}), 200
+    except Exception as e:
+        logger.error(f"Error leaving club {club_id} via API for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
 @nooks_club_bp.route('/api/clubs/<club_id>/posts', methods=['GET'])
 @login_required
 def api_get_club_posts(club_id):
     try:
         logger.info(f"User {current_user.id} fetching posts for club {club_id}")
-        posts = ClubPostModel.get_posts(club_id)
-        for p in posts:
-            p['_id'] = str(p['_id'])
-            p['club_id'] = str(p['club_id'])
-            p['user_id'] = str(p['user_id'])
-            p['username'] = UserModel.get_username_by_id(p['user_id']) or p['user_id']
-        return jsonify({'posts': posts})
+        before = request.args.get('before')
+        after = request.args.get('after')
+        # The first page is shared by everyone opening the club, so busy clubs hit the cache
+        feed = cache.get(feed_cache_key(club_id)) if not before and not after else None
+        if feed is None:
+            posts, older_cursor, newer_cursor = ClubPostModel.get_feed(club_id, before=before, after=after)
+            feed = {
+                'posts': [serialize_post(p) for p in posts],
+                'older_cursor': older_cursor,
+                'newer_cursor': newer_cursor
+            }
+            if not before and not after:
+                cache.set(feed_cache_key(club_id), feed, timeout=FEED_CACHE_TTL)
+        liked = ClubPostModel.liked_post_ids(current_user.id, [ObjectId(p['_id']) for p in feed['posts']])
+        posts = [dict(p, liked=ObjectId(p['_id']) in liked) for p in feed['posts']]
+        return jsonify(dict(feed, posts=posts))
     except Exception as e:
         logger.error(f"Error fetching posts for club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -240,12 +318,13 @@ def api_create_club_post(club_id):
         club = ClubModel.get_club(club_id)
         if not club:
             return jsonify({'error': 'Club not found'}), 404
-        if str(current_user.id) not in [str(m) for m in club.get('members', [])]:
+        if not is_club_member(club, current_user.id):
             return jsonify({'error': 'Not a club member'}), 403
         data = request.json
         content = data.get('content')
         logger.info(f"User {current_user.id} creating post in club {club_id} via API")
         result = ClubPostModel.create_post(club_id, str(current_user.id), content)
+        cache.delete(feed_cache_key(club_id))
         return jsonify({'post_id': str(result.inserted_id)}), 201
     except Exception as e:
         logger.error(f"Error creating post in club {club_id} via API for user {current_user.id}: {str(e)}", exc_info=True)
@@ -256,17 +335,31 @@ def api_create_club_post(club_id):
 def api_get_club_chat(club_id):
     try:
         logger.info(f"User {current_user.id} fetching chat for club {club_id}")
-        messages = ClubChatMessageModel.get_messages(club_id)
-        for m in messages:
-            m['_id'] = str(m['_id'])
-            m['club_id'] = str(m['club_id'])
-            m['user_id'] = str(m['user_id'])
-            m['username'] = UserModel.get_username_by_id(m['user_id']) or m['user_id']
-        return jsonify({'messages': messages})
+        messages, older_cursor = get_history(club_id, before=request.args.get('before'))
+        return jsonify({
+            'messages': [serialize_message(m) for m in messages],
+            'older_cursor': older_cursor
+        })
     except Exception as e:
         logger.error(f"Error fetching chat for club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
 
+@nooks_club_bp.route('/api/clubs/<club_id>/presence', methods=['GET'])
+@login_required
+def api_get_club_presence(club_id):
+    try:
+        club = ClubModel.get_club(club_id)
+        if not club:
+            return jsonify({'error': 'Club not found'}), 404
+        if not is_club_member(club, current_user.id):
+            return jsonify({'error': 'Not a club member'}), 403
+        # Served from the Socket.IO process's memory
+        online = presence_tracker.members(club_id)
+        return jsonify({'club_id': club_id, 'online': online, 'count': len(online)})
+    except Exception as e:
+        logger.error(f"Error fetching presence for club {club_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
 @nooks_club_bp.route('/api/clubs/<club_id>/chat', methods=['POST'])
 @login_required
 def api_send_club_chat(club_id):
@@ -274,13 +367,14 @@ def api_send_club_chat(club_id):
         club = ClubModel.get_club(club_id)
         if not club:
             return jsonify({'error': 'Club not found'}), 404
-        if str(current_user.id) not in [str(m) for m in club.get('members', [])]:
+        if not is_club_member(club, current_user.id):
             return jsonify({'error': 'Not a club member'}), 403
         data = request.json
         message = data.get('message')
         logger.info(f"User {current_user.id} sending chat message in club {club_id}")
-        result = ClubChatMessageModel.send_message(club_id, str(current_user.id), message)
-        return jsonify({'message_id': str(result.inserted_id)}), 201
+        # Broadcast to the club room now; the write to Mongo is batched
+        posted = post_message(club_id, current_user.id, current_user.username, message)
+        return jsonify({'message_id': str(posted['_id'])}), 201
     except Exception as e:
         logger.error(f"Error sending chat message in club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -295,14 +389,75 @@ def api_delete_club_post(club_id, post_id):
         if not is_club_admin(club, current_user.id):
             return jsonify({'error': 'Only club admins can delete posts'}), 403
         logger.info(f"User {current_user.id} deleting post {post_id} in club {club_id}")
-        result = current_app.mongo.db.club_posts.delete_one({'_id': ObjectId(post_id) if len(post_id) == 24 else post_id})
-        if result.deleted_count:
+        if ObjectId.is_valid(post_id) and ClubPostModel.delete_post(club_id, post_id):
+            cache.delete(feed_cache_key(club_id))
             return jsonify({'message': 'Post deleted'})
         return jsonify({'error': 'Post not found'}), 404
     except Exception as e:
         logger.error(f"Error deleting post {post_id} in club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
 
+@nooks_club_bp.route('/api/clubs/<club_id>/posts/<post_id>/like', methods=['POST', 'DELETE'])
+@login_required
+def api_like_club_post(club_id, post_id):
+    try:
+        club = ClubModel.get_club(club_id)
+        if not club:
+            return jsonify({'error': 'Club not found'}), 404
+        if not is_club_member(club, current_user.id):
+            return jsonify({'error': 'Not a club member'}), 403
+        if not ObjectId.is_valid(post_id) or not ClubPostModel.get_post(club_id, post_id):
+            return jsonify({'error': 'Post not found'}), 404
+        liked = request.method == 'POST'
+        like_count = ClubPostModel.set_like(post_id, current_user.id, liked=liked)
+        return jsonify({'liked': liked, 'like_count': like_count})
+    except Exception as e:
+        logger.error(f"Error liking post {post_id} in club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
+@nooks_club_bp.route('/api/clubs/<club_id>/posts/<post_id>/comments', methods=['GET'])
+@login_required
+def api_get_post_comments(club_id, post_id):
+    try:
+        if not ObjectId.is_valid(post_id) or not ClubPostModel.get_post(club_id, post_id):
+            return jsonify({'error': 'Post not found'}), 404
+        comments, older_cursor, _ = ClubPostModel.get_comments(post_id, before=request.args.get('before'))
+        return jsonify({
+            'comments': [{
+                '_id': str(c['_id']),
+                'user_id': c['user_id'],
+                'username': c.get('username') or c['user_id'],
+                'avatar_url': c.get('avatar_url'),
+                'content': c['content'],
+                'created_at': c['created_at'].isoformat() + 'Z'
+            } for c in comments],
+            'older_cursor': older_cursor
+        })
+    except Exception as e:
+        logger.error(f"Error fetching comments for post {post_id} in club {club_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
+@nooks_club_bp.route('/api/clubs/<club_id>/posts/<post_id>/comments', methods=['POST'])
+@login_required
+def api_add_post_comment(club_id, post_id):
+    try:
+        club = ClubModel.get_club(club_id)
+        if not club:
+            return jsonify({'error': 'Club not found'}), 404
+        if not is_club_member(club, current_user.id):
+            return jsonify({'error': 'Not a club member'}), 403
+        if not ObjectId.is_valid(post_id) or not ClubPostModel.get_post(club_id, post_id):
+            return jsonify({'error': 'Post not found'}), 404
+        content = (request.json or {}).get('content', '').strip()
+        if not content:
+            return jsonify({'error': 'Comment cannot be empty'}), 400
+        logger.info(f"User {current_user.id} commenting on post {post_id} in club {club_id}")
+        comment = ClubPostModel.add_comment(club_id, post_id, current_user.id, content)
+        return jsonify({'comment_id': str(comment['_id'])}), 201
+    except Exception as e:
+        logger.error(f"Error commenting on post {post_id} in club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
 @nooks_club_bp.route('/api/clubs/<club_id>/chat/<message_id>', methods=['DELETE'])
 @login_required
 def api_delete_club_message(club_id, message_id):
@@ -313,8 +468,7 @@ def api_delete_club_message(club_id, message_id):
         if not is_club_admin(club, current_user.id):
             return jsonify({'error': 'Only club admins can delete messages'}), 403
         logger.info(f"User {current_user.id} deleting message {message_id} in club {club_id}")
-        result = current_app.mongo.db.club_chat_messages.delete_one({'_id': ObjectId(message_id) if len(message_id) == 24 else message_id})
-        if result.deleted_count:
+        if ObjectId.is_valid(message_id) and delete_message(club_id, message_id):
             return jsonify({'message': 'Message deleted'})
         return jsonify({'error': 'Message not found'}), 404
     except Exception as e:
@@ -349,11 +503,11 @@ def api_remove_club_admin(club_id, user_id):
             return jsonify({'error': 'Club not found'}), 404
         if not is_club_admin(club, current_user.id):
             return jsonify({'error': 'Only club admins can demote others'}), 403
-        if len(club.get('admins', [])) <= 1:
+        if club.get('admin_count', 0) <= 1:
             return jsonify({'error': 'Cannot remove last admin'}), 400
         username = UserModel.get_username_by_id(user_id) or user_id
         logger.info(f"User {current_user.id} demoting user {user_id} from admin in club {club_id}")
-        current_app.mongo.db.clubs.update_one({'_id': club['_id']}, {'$pull': {'admins': user_id}})
+        ClubMembershipModel.set_role(club_id, user_id, 'member')
         return jsonify({'message': f"{username} demoted from admin"})
     except Exception as e:
         logger.error(f"Error demoting admin {user_id} in club {club_id} for user {current_user.id}: {str(e)}", exc_info=True)
@@ -365,13 +519,7 @@ def api_my_clubs():
     try:
         logger.info(f"User {current_user.id} fetching their joined clubs")
         clubs = ClubModel.get_user_clubs(str(current_user.id))
-        for c in clubs:
-            c['_id'] = str(c['_id'])
-            c['creator_id'] = str(c['creator_id'])
-            c['creator_username'] = UserModel.get_username_by_id(c['creator_id']) or c['creator_id']
-            c['members'] = [str(m) for m in c.get('members', [])]
-            c['is_admin'] = is_club_admin(c, current_user.id)
-        return jsonify({'clubs': clubs})
+        return jsonify({'clubs': serialize_clubs(clubs, current_user.id)})
     except Exception as e:
         logger.error(f"Error fetching joined clubs for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -382,13 +530,7 @@ def api_created_clubs():
     try:
         logger.info(f"User {current_user.id} fetching their created clubs")
         clubs = ClubModel.get_created_clubs(str(current_user.id))
-        for c in clubs:
-            c['_id'] = str(c['_id'])
-            c['creator_id'] = str(c['creator_id'])
-            c['creator_username'] = UserModel.get_username_by_id(c['creator_id']) or c['creator_id']
-            c['members'] = [str(m) for m in c.get('members', [])]
-            c['is_admin'] = is_club_admin(c, current_user.id)
-        return jsonify({'clubs': clubs})
+        return jsonify({'clubs': serialize_clubs(clubs, current_user.id)})
     except Exception as e:
         logger.error(f"Error fetching created clubs for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -398,15 +540,56 @@ def api_created_clubs():
 def api_get_flashcards():
     try:
         logger.info(f"User {current_user.id} fetching flashcards")
-        cards = FlashcardModel.get_user_flashcards(str(current_user.id))
-        for c in cards:
-            c['_id'] = str(c['_id'])
-            c['user_id'] = str(c['user_id'])
-        return jsonify({'flashcards': cards})
+        cards, older_cursor, _ = FlashcardModel.get_user_flashcards(str(current_user.id), before=request.args.get('before'))
+        return jsonify({'flashcards': [serialize_flashcard(c) for c in cards], 'older_cursor': older_cursor})
     except Exception as e:
         logger.error(f"Error fetching flashcards for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
 
+@nooks_club_bp.route('/api/flashcards/due', methods=['GET'])
+@login_required
+def api_get_due_flashcards():
+    try:
+        limit = min(max(request.args.get('limit', FlashcardModel.DUE_BATCH, type=int), 1), 100)
+        logger.info(f"User {current_user.id} fetching due flashcards")
+        cards, has_more = FlashcardModel.get_due(str(current_user.id), limit=limit)
+        return jsonify({'flashcards': [serialize_flashcard(c) for c in cards], 'has_more': has_more})
+    except Exception as e:
+        logger.error(f"Error fetching due flashcards for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
+@nooks_club_bp.route('/api/flashcards/<card_id>/review', methods=['POST'])
+@login_required
+def api_review_flashcard(card_id):
+    try:
+        quality = (request.get_json(silent=True) or {}).get('quality')
+        if not isinstance(quality, int) or isinstance(quality, bool) or not 0 <= quality <= 5:
+            return jsonify({'error': 'quality must be an integer from 0 to 5'}), 400
+        if not ObjectId.is_valid(card_id):
+            return jsonify({'error': 'Flashcard not found'}), 404
+        logger.info(f"User {current_user.id} reviewing flashcard {card_id} with quality {quality}")
+        card = FlashcardModel.review(card_id, str(current_user.id), quality)
+        if not card:
+            return jsonify({'error': 'Flashcard not found'}), 404
+        return jsonify({'flashcard': serialize_flashcard(card)})
+    except Exception as e:
+        logger.error(f"Error reviewing flashcard {card_id} for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
+@nooks_club_bp.route('/api/flashcards/import', methods=['POST'])
+@login_required
+def api_import_flashcards():
+    try:
+        book_id = (request.get_json(silent=True) or {}).get('book_id')
+        if book_id and not ObjectId.is_valid(book_id):
+            return jsonify({'error': 'Book not found'}), 404
+        logger.info(f"User {current_user.id} importing flashcards from {book_id or 'all books'}")
+        created = FlashcardModel.import_from_books(current_user.id, book_id)
+        return jsonify({'imported': created}), 201
+    except Exception as e:
+        logger.error(f"Error importing flashcards for user {current_user.id}: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An error occurred'}), 500
+
 @nooks_club_bp.route('/api/flashcards', methods=['POST'])
 @login_required
 def api_create_flashcard():
@@ -426,28 +609,19 @@ def api_create_flashcard():
 @login_required
 def api_quiz_leaderboard():
     try:
-        logger.info(f"User {current_user.id} fetching quiz leaderboard")
-        pipeline = [
-            {'$group': {
-                '_id': '$user_id',
-                'score': {'$sum': {'$cond': ['$is_correct', 1, 0]}},
-                'attempts': {'$sum': 1}
-            }},
-            {'$sort': {'score': -1}},
-            {'$limit': 50}
-        ]
-        leaderboard_data = list(current_app.mongo.db.quiz_answers.aggregate(pipeline))
-        leaderboard = []
-        for entry in leaderboard_data:
-            user = current_app.mongo.db.users.find_one({'_id': ObjectId(entry['_id'])})
-            if user:
-                leaderboard.append({
-                    'username': user.get('username', 'User'),
-                    'score': entry['score'],
-                    'attempts': entry['attempts'],
-                    'is_current_user': str(entry['_id']) == str(current_user.id)
-                })
-        return jsonify({'leaderboard': leaderboard})
+        # ?day=today or ?day=YYYY-MM-DD ranks one day's daily set; the default is all time
+        day = request.args.get('day')
+        period = DailyQuizService.today() if day == 'today' else (day or QuizScoreModel.ALL_TIME)
+        logger.info(f"User {current_user.id} fetching quiz leaderboard for {period}")
+        entries = QuizScoreModel.leaderboard(period)
+        usernames = UserModel.get_usernames_by_ids(e['user_id'] for e in entries)
+        leaderboard = [{
+            'username': usernames[entry['user_id']],
+            'score': entry['correct'],
+            'attempts': entry['attempts'],
+            'is_current_user': entry['user_id'] == str(current_user.id)
+        } for entry in entries if entry['user_id'] in usernames]
+        return jsonify({'leaderboard': leaderboard, 'period': period})
     except Exception as e:
         logger.error(f"Error fetching quiz leaderboard for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -456,11 +630,16 @@ def api_quiz_leaderboard():
 @login_required
 def api_quiz_review():
     try:
-        logger.info(f"User {current_user.id} fetching quiz review")
-        answers = QuizAnswerModel.get_user_answers(str(current_user.id))
+        # ?incorrect_only=1 is revision mode; ?before=<cursor> pages to older answers
+        incorrect_only = request.args.get('incorrect_only', '').lower() in ('1', 'true', 'yes')
+        logger.info(f"User {current_user.id} fetching quiz review (incorrect only: {incorrect_only})")
+        answers, older_cursor, _ = QuizAnswerModel.get_answers_page(
+            str(current_user.id), before=request.args.get('before'), incorrect_only=incorrect_only
+        )
+        questions = QuizQuestionModel.get_questions_cached(ans['question_id'] for ans in answers)
         review = []
         for ans in answers:
-            q = QuizQuestionModel.get_question_by_id(str(ans['question_id']))
+            q = questions.get(ans['question_id'])
             review.append({
                 'question': q['question'] if q else '',
                 'your_answer': ans['answer'],
@@ -468,7 +647,7 @@ def api_quiz_review():
                 'is_correct': ans['is_correct'],
                 'answered_at': ans['submitted_at']
             })
-        return jsonify({'review': review})
+        return jsonify({'review': review, 'older_cursor': older_cursor})
     except Exception as e:
         logger.error(f"Error fetching quiz review for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -478,18 +657,17 @@ def api_quiz_review():
 def api_quiz_analytics():
     try:
         logger.info(f"User {current_user.id} fetching quiz analytics")
-        user_id = str(current_user.id)
-        total_attempts = current_app.mongo.db.quiz_answers.count_documents({'user_id': user_id})
-        correct = current_app.mongo.db.quiz_answers.count_documents({'user_id': user_id, 'is_correct': True})
+        scores = QuizScoreModel.get_scores(current_user.id)
+        total_attempts = scores.get('attempts', 0)
+        correct = scores.get('correct', 0)
         accuracy = (correct / total_attempts) * 100 if total_attempts else 0
-        last_10 = list(current_app.mongo.db.quiz_answers.find({'user_id': user_id}).sort('submitted_at', -1).limit(10))
-        streak = 0
-        for ans in last_10:
-            if ans['is_correct']:
-                streak += 1
-            else:
-                break
-        return jsonify({'total_attempts': total_attempts, 'correct': correct, 'accuracy': accuracy, 'current_streak': streak})
+        return jsonify({
+            'total_attempts': total_attempts,
+            'correct': correct,
+            'accuracy': accuracy,
+            'current_streak': scores.get('current_streak', 0),
+            'best_streak': scores.get('best_streak', 0)
+        })
     except Exception as e:
         logger.error(f"Error fetching quiz analytics for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -498,16 +676,31 @@ def api_quiz_analytics():
 @login_required
 def api_start_quiz():
     try:
-        logger.info(f"User {current_user.id} starting quiz")
-        now = datetime.utcnow()
-        UserProgressModel.update_progress(str(current_user.id), 'quiz', {'start_time': now, 'score': 0, 'completed': False})
-        questions = QuizQuestionModel.get_daily_questions()
-        for q in questions:
-            q['_id'] = str(q['_id'])
-            q['creator_id'] = str(q['creator_id'])
-            q['creator_username'] = UserModel.get_username_by_id(q['creator_id']) or q['creator_id']
-            q.pop('answer', None)
-        return jsonify({'questions': questions, 'start_time': now.isoformat(), 'time_limit': QUIZ_TIME_LIMIT_SECONDS})
+        data = request.get_json(silent=True) or {}
+        tag = (data.get('tag') or request.args.get('tag') or '').strip() or None
+        logger.info(f"User {current_user.id} starting quiz (tag: {tag or 'none'})")
+        day = DailyQuizService.today()
+        # Everyone gets the same set for the day, so scores are comparable
+        questions = DailyQuizService.get(tag=tag, day=day)
+        # One scored session per user per daily set; starting again resumes it
+        quiz_session = QuizSessionModel.start(current_user.id, [q['_id'] for q in questions], QUIZ_TIME_LIMIT_SECONDS, day=day, tag=tag)
+        if quiz_session['status'] != 'active':
+            return jsonify({
+                'error': "You've already taken today's quiz",
+                'score': quiz_session['score'],
+                'day': day,
+                'tag': tag
+            }), 409
+        return jsonify({
+            'session_id': str(quiz_session['_id']),
+            'questions': [q for q in questions if quiz_session['answers'].get(q['_id']) is None],
+            'score': quiz_session['score'],
+            'day': day,
+            'tag': tag,
+            'start_time': quiz_session['started_at'].isoformat(),
+            'time_limit': QUIZ_TIME_LIMIT_SECONDS,
+            'time_remaining': max(0, (quiz_session['deadline'] - datetime.utcnow()).total_seconds())
+        })
     except Exception as e:
         logger.error(f"Error starting quiz for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -520,17 +713,21 @@ def api_submit_quiz_answer():
         question_id = data.get('question_id')
         answer = data.get('answer')
         logger.info(f"User {current_user.id} submitting quiz answer for question {question_id}")
+        session_id = data.get('session_id')
+        if not session_id:
+            quiz_session = QuizSessionModel.find_active(current_user.id)
+            session_id = quiz_session['_id'] if quiz_session else None
+        if not session_id or not ObjectId.is_valid(str(session_id)):
+            return jsonify({'error': 'No quiz in progress'}), 404
         question = QuizQuestionModel.get_question_by_id(question_id)
         is_correct = False
         if question and answer:
             is_correct = (answer == question.get('answer'))
-        result = QuizAnswerModel.submit_answer(str(current_user.id), question_id, answer, is_correct)
-        progress = UserProgressModel.get_progress(str(current_user.id), 'quiz') or {}
-        score = progress.get('data', {}).get('score', 0)
-        if is_correct:
-            score += 1
-        UserProgressModel.update_progress(str(current_user.id), 'quiz', {'score': score, 'last_answered': datetime.utcnow()})
-        return jsonify({'answer_id': str(result.inserted_id), 'is_correct': is_correct, 'score': score}), 201
+        # One conditional update scores the answer; the write to quiz_answers waits for finish
+        score, error = QuizSessionModel.answer(session_id, current_user.id, question_id, answer, is_correct)
+        if error:
+            return jsonify({'error': error}), 409
+        return jsonify({'is_correct': is_correct, 'score': score}), 201
     except Exception as e:
         logger.error(f"Error submitting quiz answer for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
@@ -540,25 +737,20 @@ def api_submit_quiz_answer():
 def api_finish_quiz():
     try:
         logger.info(f"User {current_user.id} finishing quiz")
-        progress = UserProgressModel.get_progress(str(current_user.id), 'quiz') or {}
-        score = progress.get('data', {}).get('score', 0)
-        start_time = progress.get('data', {}).get('start_time')
-        completed = False
-        if start_time:
-            if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time)
-            elapsed = (datetime.utcnow() - start_time).total_seconds()
-            if elapsed <= QUIZ_TIME_LIMIT_SECONDS:
-                completed = True
-        UserProgressModel.update_progress(str(current_user.id), 'quiz', {'score': score, 'completed': completed, 'finished_at': datetime.utcnow()})
-        return jsonify({'score': score, 'completed': completed})
+        session_id = (request.get_json(silent=True) or {}).get('session_id')
+        if session_id and not ObjectId.is_valid(session_id):
+            return jsonify({'error': 'No quiz in progress'}), 404
+        quiz_session = QuizSessionModel.finish(current_user.id, session_id)
+        if not quiz_session:
+            return jsonify({'error': 'No quiz in progress'}), 404
+        return jsonify({'score': quiz_session['score'], 'completed': quiz_session.get('completed', False)})
     except Exception as e:
         logger.error(f"Error finishing quiz for user {current_user.id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An error occurred'}), 500
 
 def get_question_by_id(question_id):
     try:
-        return current_app.mongo.db.quiz_questions.find_one({'_id': ObjectId(question_id)})
+        return QuizQuestionModel.get_questions_cached([question_id]).get(ObjectId(question_id))
     except Exception as e:
         logger.error(f"Error fetching question {question_id}: {str(e)}", exc_info=True)
         return None
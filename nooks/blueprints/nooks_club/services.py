@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import logging
+import random
+import threading
+
+from models import QuizQuestionModel, UserModel
+
+logger = logging.getLogger(__name__)
+
+
+class DailyQuizService:
+    """One quiz question set per day (and per tag), shared by every player.
+
+    Sets are materialized into `quiz_daily_sets` by a scheduled job, picking questions
+    with a Random seeded by the day and tag so any worker builds the same set. Each
+    stored question carries its creator's username, and the set is kept in process
+    once loaded, so starting a quiz is a dict lookup.
+    """
+
+    SET_SIZE = 5
+    BUILD_INTERVAL = 60 * 60  # The job builds today's and tomorrow's sets if missing
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def today():
+        return datetime.utcnow().strftime('%Y-%m-%d')
+
+    @staticmethod
+    def get(tag=None, day=None):
+        """Questions (without answers) in the day's set, building it on first use"""
+        day = day or DailyQuizService.today()
+        key = (day, tag or None)
+        questions = DailyQuizService._cache.get(key)
+        if questions is None:
+            daily_set = QuizQuestionModel.get_daily_set(day, tag) or DailyQuizService.build(day, tag)
+            if not daily_set:
+                return []
+            questions = daily_set['questions']
+            with DailyQuizService._lock:
+                # Only today's and tomorrow's sets are worth keeping
+                for old in [k for k in DailyQuizService._cache if k[0] < day]:
+                    del DailyQuizService._cache[old]
+                DailyQuizService._cache[key] = questions
+        return questions
+
+    @staticmethod
+    def build(day, tag=None):
+        """Materialize the set for a day; returns the stored set, or None if no questions match"""
+        question_ids = QuizQuestionModel.get_question_ids(tag)
+        if not question_ids:
+            return None
+        picked = random.Random(f"{day}:{tag or ''}").sample(question_ids, min(DailyQuizService.SET_SIZE, len(question_ids)))
+        by_id = {q['_id']: q for q in QuizQuestionModel.get_questions_by_ids(picked)}
+        usernames = UserModel.get_usernames_by_ids(q['creator_id'] for q in by_id.values())
+        questions = [{
+            '_id': str(q['_id']),
+            'question': q['question'],
+            'options': q['options'],
+            'tags': q.get('tags', []),
+            'creator_id': str(q['creator_id']),
+            'creator_username': usernames.get(str(q['creator_id'])) or str(q['creator_id'])
+        } for q in (by_id[i] for i in picked if i in by_id)]
+        daily_set = QuizQuestionModel.save_daily_set(day, tag, questions)
+        logger.info(f"Built daily quiz set for {day} (tag: {tag or 'none'}) with {len(questions)} questions")
+        return daily_set
+
+    @staticmethod
+    def build_upcoming():
+        """Scheduled job: make sure today's and tomorrow's sets exist for every tag in use today"""
+        today = DailyQuizService.today()
+        tomorrow = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%d')
+        for tag in [None] + QuizQuestionModel.get_daily_set_tags(today):
+            for day in (today, tomorrow):
+                if not QuizQuestionModel.get_daily_set(day, tag):
+                    DailyQuizService.build(day, tag)
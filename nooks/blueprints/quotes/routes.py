@@ -10,6 +10,7 @@ from models import QuoteModel, TransactionModel, BookModel, GoogleBooksAPI, User
 
 # Import decorators
 from utils.decorators import admin_required
+from blueprints.nook.services import PageTextService
 
 quotes_bp = Blueprint('quotes', __name__, template_folder='templates')
 logger = logging.getLogger(__name__)
@@ -250,10 +251,15 @@ def transactions():
 def admin_pending():
     """Admin page to view and verify pending quotes"""
     try:
-        page = request.args.get('page', 1, type=int)
-        
-        # Get pending quotes
-        quotes, total_pending = QuoteModel.get_pending_quotes(page=page, per_page=20)
+        after = request.args.get('after')
+        
+        # Get pending quotes, oldest first, from the position in `after`
+        quotes, total_pending, next_cursor = QuoteModel.get_pending_quotes(
+            after=after,
+            per_page=20,
+            admin_id=str(current_user.id),
+            available_only=request.args.get('available') == '1'
+        )
         
         # Get system-wide quote statistics
         stats = QuoteModel.get_quote_statistics()
@@ -262,13 +268,105 @@ def admin_pending():
                              quotes=quotes,
                              total_pending=total_pending,
                              stats=stats,
-                             current_page=page)
+                             next_cursor=next_cursor,
+                             is_first_page=not after,
+                             admin_id=current_user.id,
+                             now=datetime.utcnow())
         
     except Exception as e:
         logger.error(f"Error loading admin pending quotes: {str(e)}")
         flash('An error occurred while loading pending quotes.', 'error')
         return redirect(url_for('admin.dashboard'))
 
+@quotes_bp.route('/admin/queue')
+@admin_required
+def admin_queue():
+    """Admin API for the moderation queue, paged with the `after` cursor"""
+    try:
+        admin_id = str(current_user.id)
+        quotes, total_pending, next_cursor = QuoteModel.get_pending_quotes(
+            after=request.args.get('after'),
+            per_page=min(request.args.get('per_page', 20, type=int), 100),
+            admin_id=admin_id,
+            available_only=request.args.get('available') == '1'
+        )
+        return jsonify({
+            'quotes': [{
+                'id': str(q['_id']),
+                'quote_text': q['quote_text'],
+                'page_number': q['page_number'],
+                'submitted_at': q['submitted_at'].isoformat(),
+                'username': q['user'].get('username'),
+                'book_title': q['book'].get('title'),
+                'book_total_pages': q['book'].get('total_pages'),
+                'claimed_by_me': str(q.get('claimed_by')) == admin_id,
+                'claim_expires_at': q['claim_expires_at'].isoformat() if q.get('claim_expires_at') else None,
+                'similar_quote': {
+                    'quote_id': str(q['similar_quote']['quote_id']),
+                    'similarity': q['similar_quote']['similarity'],
+                    'status': q['similar_quote']['status'],
+                    'same_user': q['similar_quote']['same_user']
+                } if q.get('similar_quote') else None,
+                'page_match': q.get('page_match')
+            } for q in quotes],
+            'total_pending': total_pending,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        logger.error(f"Error loading moderation queue: {str(e)}")
+        return jsonify({'error': 'Failed to load queue'}), 500
+
+@quotes_bp.route('/admin/claim', methods=['POST'])
+@admin_required
+def admin_claim_quotes():
+    """Admin endpoint to claim the next batch of unclaimed quotes"""
+    try:
+        limit = min(max((request.get_json(silent=True) or {}).get('limit', 10), 1), 50)
+        claimed = QuoteModel.claim_quotes(str(current_user.id), limit=limit)
+        return jsonify({
+            'success': True,
+            'quote_ids': [str(q) for q in claimed],
+            'claim_minutes': QuoteModel.CLAIM_MINUTES
+        })
+    except Exception as e:
+        logger.error(f"Error claiming quotes: {str(e)}")
+        return jsonify({'error': 'Failed to claim quotes'}), 500
+
+@quotes_bp.route('/admin/release', methods=['POST'])
+@admin_required
+def admin_release_quotes():
+    """Admin endpoint to hand claimed quotes back to the queue"""
+    try:
+        quote_ids = (request.get_json(silent=True) or {}).get('quote_ids')
+        if quote_ids is not None:
+            quote_ids = [q for q in quote_ids if ObjectId.is_valid(q)]
+            if not quote_ids:
+                return jsonify({'success': True, 'released': 0})
+        released = QuoteModel.release_claims(str(current_user.id), quote_ids)
+        return jsonify({'success': True, 'released': released})
+    except Exception as e:
+        logger.error(f"Error releasing quotes: {str(e)}")
+        return jsonify({'error': 'Failed to release quotes'}), 500
+
+@quotes_bp.route('/admin/page-text/<quote_id>')
+@admin_required
+def admin_page_text(quote_id):
+    """Admin API for the extracted text of the page a quote was found on (or claims)"""
+    try:
+        quote = current_app.mongo.db.quotes.find_one(
+            {'_id': ObjectId(quote_id)}, {'book_id': 1, 'page_number': 1, 'page_match': 1}
+        )
+        if not quote:
+            return jsonify({'error': 'Quote not found'}), 404
+        page = (quote.get('page_match') or {}).get('page') or quote['page_number']
+        text = PageTextService.page_text(quote['book_id'], page)
+        if text is None:
+            return jsonify({'error': 'No extracted text for this page'}), 404
+        return jsonify({'page': page, 'text': text})
+    except Exception as e:
+        logger.error(f"Error loading page text for quote {quote_id}: {str(e)}")
+        return jsonify({'error': 'Failed to load page text'}), 500
+
 @quotes_bp.route('/admin/verify/<quote_id>', methods=['POST'])
 @admin_required
 def admin_verify_quote(quote_id):
@@ -313,28 +411,25 @@ def admin_bulk_verify():
             return jsonify({'error': 'Invalid request'}), 400
         
         approved = action == 'approve'
-        success_count = 0
-        error_count = 0
-        
-        for quote_id in quote_ids:
-            success, error = QuoteModel.verify_quote(
-                quote_id=quote_id,
-                admin_id=admin_id,
-                approved=approved,
-                rejection_reason=rejection_reason if not approved else None
-            )
-            
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
+        results = QuoteModel.bulk_verify(
+            quote_ids=quote_ids,
+            admin_id=admin_id,
+            approved=approved,
+            rejection_reason=rejection_reason if not approved else None
+        )
+        
+        success_count = sum(1 for success, _ in results.values() if success)
+        error_count = len(results) - success_count
+        for quote_id, (success, error) in results.items():
+            if not success:
                 logger.error(f"Failed to verify quote {quote_id}: {error}")
         
         return jsonify({
             'success': True,
             'message': f'Processed {success_count} quotes successfully. {error_count} failed.',
             'success_count': success_count,
-            'error_count': error_count
+            'error_count': error_count,
+            'results': {quote_id: {'success': success, 'error': error} for quote_id, (success, error) in results.items()}
         })
         
     except Exception as e:
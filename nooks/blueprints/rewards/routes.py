@@ -2,7 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from bson import ObjectId
 from datetime import datetime, timedelta
-from .services import RewardService
+from .services import RewardService, RewardCompactionService
+from utils.pagination import keyset_page
 
 rewards_bp = Blueprint('rewards', __name__, template_folder='templates')
 
@@ -46,7 +47,8 @@ def history():
     source_filter = request.args.get('source', 'all')
     category_filter = request.args.get('category', 'all')
     date_filter = request.args.get('date', 'all')
-    page = int(request.args.get('page', 1))
+    before = request.args.get('before')
+    after = request.args.get('after')
     per_page = 50
     
     # Build query
@@ -67,24 +69,44 @@ def history():
             start_date = datetime.now() - timedelta(days=30)
             query['date'] = {'$gte': start_date}
     
-    # Get rewards with pagination
-    skip = (page - 1) * per_page
-    rewards = list(current_app.mongo.db.rewards.find(query)
-                  .sort('date', -1)
-                  .skip(skip)
-                  .limit(per_page))
-    
-    # Get filter options
-    all_rewards = list(current_app.mongo.db.rewards.find({'user_id': user_id}))
-    sources = list(set([reward.get('source', '') for reward in all_rewards]))
-    categories = list(set([reward.get('category', '') for reward in all_rewards]))
+    # Get rewards a page at a time on the (user_id, date, _id) index
+    rewards, older_cursor, newer_cursor = keyset_page(
+        current_app.mongo.db.rewards, query, 'date', per_page, before=before, after=after
+    )
     
-    # Calculate totals
-    total_points = sum([reward['points'] for reward in current_app.mongo.db.rewards.find(query)])
-    total_rewards = current_app.mongo.db.rewards.count_documents(query)
+    # Filter options and all-time totals come from the user's facet summary
+    facets = RewardService.get_facets(user_id)
+    sources = sorted(facets['sources'])
+    categories = sorted(facets['categories'])
+    
+    # Totals are always the points and count of the listed rewards, never net of spending
+    if 'date' in query or (source_filter != 'all' and category_filter != 'all'):
+        # Facets are all-time and keep sources and categories apart, so these are summed
+        totals = RewardService.reward_totals(
+            user_id=user_id,
+            source=query.get('source'),
+            category=query.get('category'),
+            since=query['date']['$gte'] if 'date' in query else None
+        )
+        totals = totals[0] if totals else {'total_points': 0, 'count': 0}
+        total_points, total_rewards = totals['total_points'], totals['count']
+    else:
+        if source_filter != 'all':
+            facet = facets['sources'].get(source_filter, {})
+        elif category_filter != 'all':
+            facet = facets['categories'].get(category_filter, {})
+        else:
+            facet = facets
+        total_points, total_rewards = facet.get('points', 0), facet.get('count', 0)
+    
+    # Months old enough to be compacted follow the last page of individual rewards
+    summaries = []
+    if date_filter == 'all' and not older_cursor:
+        summaries = RewardCompactionService.monthly_summaries(user_id, query.get('source'), query.get('category'))
     
     return render_template('rewards/history.html',
                          rewards=rewards,
+                         summaries=summaries,
                          sources=sources,
                          categories=categories,
                          current_source=source_filter,
@@ -92,8 +114,8 @@ def history():
                          current_date=date_filter,
                          total_points=total_points,
                          total_rewards=total_rewards,
-                         page=page,
-                         has_next=len(rewards) == per_page)
+                         older_cursor=older_cursor,
+                         newer_cursor=newer_cursor)
 
 @rewards_bp.route('/badges')
 @login_required
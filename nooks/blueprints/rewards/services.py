@@ -1,9 +1,23 @@
 from flask import current_app
-from bson import ObjectId
+from bson import ObjectId, json_util
 from datetime import datetime, timedelta
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+import gzip
+import logging
 import math
+import os
 import random
 
+from models import PointsLedgerModel
+
+logger = logging.getLogger(__name__)
+
+
+def _field_key(name, default):
+    """A source or category name made safe to use in a field path"""
+    return str(name or default).replace('.', '_').replace('$', '_')
+
 class RewardService:
     """Service class for handling rewards, points, badges, and achievements"""
     
@@ -51,36 +65,13 @@ class RewardService:
         
         # Insert reward record
         current_app.mongo.db.rewards.insert_one(reward_data)
+        RewardService._record_facets(user_id, [reward_data])
         
-        # Update user's total points
-        current_app.mongo.db.users.update_one(
-            {'_id': user_id},
-            {'$inc': {'total_points': points}}
-        )
+        # Update user's total points through the ledger
+        PointsLedgerModel.record(user_id, [RewardService._ledger_entry(reward_data)])
         
         # Check for level up
-        total_points = RewardService.get_user_total_points(user_id)
-        new_level = RewardService.calculate_level(total_points)
-        
-        # Update user level if changed
-        user = current_app.mongo.db.users.find_one({'_id': user_id})
-        current_level = user.get('level', 1)
-        
-        if new_level > current_level:
-            current_app.mongo.db.users.update_one(
-                {'_id': user_id},
-                {'$set': {'level': new_level}}
-            )
-            
-            # Award level up bonus (increased)
-            level_bonus = new_level * 25
-            RewardService.award_points(
-                user_id=user_id,
-                points=level_bonus,
-                source='system',
-                description=f'Level {new_level} reached!',
-                category='level_up'
-            )
+        RewardService._level_up(user_id)
         
         # Check for new badges and goals
         RewardService.check_and_award_badges(user_id)
@@ -88,6 +79,167 @@ class RewardService:
         
         return reward_data
     
+    @staticmethod
+    def award_many(user_id, awards, session=None):
+        """Write several rewards in one bulk write with a single points update.
+
+        Each award is a dict of award_points arguments plus an optional `award_key`.
+        Keyed awards are upserted on (user_id, award_key), so an award that was already
+        made is skipped. Returns the reward documents actually written; call
+        finish_awards afterwards (outside any transaction) for level-ups, badges and goals.
+        """
+        now = datetime.utcnow()
+        rewards = []
+        operations = []
+        for award in awards:
+            points = award['points']
+            description = award['description']
+            goal_type = award.get('goal_type')
+            if goal_type and goal_type in RewardService.GOAL_REWARDS:
+                bonus_points = RewardService.GOAL_REWARDS[goal_type]
+                points += bonus_points
+                description += f" (Goal bonus: +{bonus_points})"
+            
+            reward_data = {
+                'user_id': user_id,
+                'points': points,
+                'source': award['source'],
+                'description': description,
+                'category': award.get('category', 'general'),
+                'date': now,
+                'reference_id': award.get('reference_id'),
+                'goal_type': goal_type,
+                'is_goal_reward': goal_type is not None
+            }
+            if award.get('award_key'):
+                reward_data['award_key'] = award['award_key']
+                operations.append(UpdateOne(
+                    {'user_id': user_id, 'award_key': award['award_key']},
+                    {'$setOnInsert': reward_data},
+                    upsert=True
+                ))
+            else:
+                operations.append(InsertOne(reward_data))
+            rewards.append(reward_data)
+        
+        if not operations:
+            return []
+        
+        result = current_app.mongo.db.rewards.bulk_write(operations, session=session)
+        written = [
+            reward for i, reward in enumerate(rewards)
+            if 'award_key' not in reward or i in result.upserted_ids
+        ]
+        
+        RewardService._record_facets(user_id, written, session=session)
+        PointsLedgerModel.record(
+            user_id, [RewardService._ledger_entry(reward) for reward in written if reward['points']], session=session
+        )
+        return written
+    
+    @staticmethod
+    def _record_facets(user_id, rewards, session=None):
+        """Fold new rewards into the user's reward_facets document: counts and points
+        overall, per source and per category"""
+        inc = {}
+        for reward in rewards:
+            for prefix in ('', f"sources.{_field_key(reward.get('source'), 'unknown')}.",
+                           f"categories.{_field_key(reward.get('category'), 'general')}."):
+                inc[f'{prefix}count'] = inc.get(f'{prefix}count', 0) + 1
+                inc[f'{prefix}points'] = inc.get(f'{prefix}points', 0) + reward['points']
+        if inc:
+            current_app.mongo.db.reward_facets.update_one({'_id': user_id}, {'$inc': inc}, upsert=True, session=session)
+    
+    @staticmethod
+    def get_facets(user_id):
+        """The user's reward counts and points overall and per source and category, from one document"""
+        facets = current_app.mongo.db.reward_facets.find_one({'_id': user_id}) or {}
+        return {
+            'count': facets.get('count', 0),
+            'points': facets.get('points', 0),
+            'sources': facets.get('sources', {}),
+            'categories': facets.get('categories', {})
+        }
+    
+    @staticmethod
+    def rebuild_facets(user_ids=None):
+        """Recompute facet documents from raw and compacted rewards; returns the number of users"""
+        match = {} if user_ids is None else {'user_id': {'$in': list(user_ids)}}
+        facets = {}
+        for total in current_app.mongo.db.rewards.aggregate([
+            {'$match': match},
+            {'$project': {'user_id': 1, 'source': 1, 'category': 1, 'points': 1, 'count': {'$literal': 1}}},
+            {'$unionWith': {'coll': 'reward_summaries', 'pipeline': [{'$match': match}] + RewardCompactionService.FLATTEN}},
+            {'$group': {
+                '_id': {'user_id': '$user_id', 'source': '$source', 'category': '$category'},
+                'points': {'$sum': '$points'},
+                'count': {'$sum': '$count'}
+            }}
+        ], allowDiskUse=True):
+            key = total['_id']
+            doc = facets.setdefault(key['user_id'], {'count': 0, 'points': 0, 'sources': {}, 'categories': {}})
+            for bucket in (
+                doc,
+                doc['sources'].setdefault(_field_key(key.get('source'), 'unknown'), {'count': 0, 'points': 0}),
+                doc['categories'].setdefault(_field_key(key.get('category'), 'general'), {'count': 0, 'points': 0})
+            ):
+                bucket['count'] += total['count']
+                bucket['points'] += total['points']
+        
+        operations = [ReplaceOne({'_id': user_id}, doc, upsert=True) for user_id, doc in facets.items()]
+        # Users whose rewards are all gone keep no facets
+        if user_ids is not None:
+            current_app.mongo.db.reward_facets.delete_many({'_id': {'$in': [u for u in user_ids if u not in facets]}})
+        if operations:
+            current_app.mongo.db.reward_facets.bulk_write(operations, ordered=False)
+        return len(operations)
+    
+    @staticmethod
+    def _ledger_entry(reward):
+        return {
+            'amount': reward['points'],
+            'source': reward['source'],
+            'category': reward['category'],
+            'description': reward['description'],
+            'reference_id': reward.get('reference_id')
+        }
+    
+    @staticmethod
+    def finish_awards(user_id):
+        """Level-ups followed by a single badge and goal pass"""
+        RewardService._level_up(user_id)
+        RewardService.check_and_award_badges(user_id)
+        RewardService.check_goal_completions(user_id)
+    
+    @staticmethod
+    def _level_up(user_id):
+        """Raise the user's level to match their points, paying level * 25 for every level
+        crossed. Bonuses can cross further levels, so this repeats until the level settles.
+
+        Paying every level, rather than only the one landed on, makes the bonuses depend
+        only on the points earned, not on how the awards were batched.
+        """
+        user = current_app.mongo.db.users.find_one({'_id': user_id}, {'total_points': 1, 'level': 1}) or {}
+        level = user.get('level', 1)
+        new_level = RewardService.calculate_level(user.get('total_points', 0))
+        
+        while new_level > level:
+            # Conditional on the level just read, so concurrent awards pay each level once
+            claimed = current_app.mongo.db.users.update_one(
+                {'_id': user_id, 'level': {'$in': [level, None]} if level == 1 else level},
+                {'$set': {'level': new_level}}
+            ).modified_count
+            if not claimed:
+                return
+            RewardService.award_many(user_id, [{
+                'points': reached * 25,
+                'source': 'system',
+                'description': f'Level {reached} reached!',
+                'category': 'level_up'
+            } for reached in range(level + 1, new_level + 1)])
+            level = new_level
+            new_level = RewardService.calculate_level(RewardService.get_user_total_points(user_id))
+    
     @staticmethod
     def get_user_total_points(user_id):
         """Get user's total points"""
@@ -311,6 +463,13 @@ class RewardService:
     @staticmethod
     def _calculate_productivity_streak(user_id):
         """Calculate current productivity streak"""
+        # Maintained incrementally by TaskCompletionService; scan only for users without it
+        user = current_app.mongo.db.users.find_one({'_id': user_id}, {'task_streak': 1}) or {}
+        state = user.get('task_streak')
+        if state:
+            today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            return state['current'] if state['last_day'] == today else 0
+        
         tasks = list(current_app.mongo.db.completed_tasks.find({
             'user_id': user_id
         }).sort('completed_at', -1))
@@ -426,29 +585,33 @@ class RewardService:
         return badges
     
     @staticmethod
-    def get_reward_statistics(user_id):
-        """Get reward statistics for user"""
-        # Points by source
+    def reward_totals(group_by=None, user_id=None, source=None, category=None, since=None):
+        """Points and counts of rewards grouped by 'source', 'category' or nothing (one row),
+        across both the raw rewards and the monthly summaries older ones are compacted into"""
+        match = {} if user_id is None else {'user_id': user_id}
+        filters = {key: value for key, value in (('source', source), ('category', category)) if value is not None}
+        summary_match = dict(match, month={'$gte': since}) if since else match
         pipeline = [
-            {'$match': {'user_id': user_id}},
-            {'$group': {
-                '_id': '$source',
-                'total_points': {'$sum': '$points'},
-                'count': {'$sum': 1}
-            }}
-        ]
-        points_by_source = list(current_app.mongo.db.rewards.aggregate(pipeline))
-        
-        # Points by category
-        pipeline = [
-            {'$match': {'user_id': user_id}},
+            {'$match': dict(match, date={'$gte': since}, **filters) if since else dict(match, **filters)},
+            {'$project': {'source': 1, 'category': 1, 'points': 1, 'count': {'$literal': 1}}},
+            {'$unionWith': {
+                'coll': 'reward_summaries',
+                'pipeline': [{'$match': summary_match}] + RewardCompactionService.FLATTEN + ([{'$match': filters}] if filters else [])
+            }},
             {'$group': {
-                '_id': '$category',
+                '_id': f'${group_by}' if group_by else None,
                 'total_points': {'$sum': '$points'},
-                'count': {'$sum': 1}
+                'count': {'$sum': '$count'}
             }}
         ]
-        points_by_category = list(current_app.mongo.db.rewards.aggregate(pipeline))
+        return list(current_app.mongo.db.rewards.aggregate(pipeline))
+    
+    @staticmethod
+    def get_reward_statistics(user_id):
+        """Get reward statistics for user"""
+        # Points by source and by category, including compacted months
+        points_by_source = RewardService.reward_totals('source', user_id=user_id)
+        points_by_category = RewardService.reward_totals('category', user_id=user_id)
         
         # Recent activity (last 30 days)
         thirty_days_ago = datetime.now() - timedelta(days=30)
@@ -716,10 +879,13 @@ class RewardService:
                 return False, "Item already owned"
         
         # Deduct points
-        current_app.mongo.db.users.update_one(
-            {'_id': user_id},
-            {'$inc': {'total_points': -item['cost']}}
-        )
+        PointsLedgerModel.record(user_id, [{
+            'amount': -item['cost'],
+            'source': 'shop',
+            'category': 'purchase',
+            'description': f'Purchased: {item["name"]}',
+            'reference_id': item_id
+        }])
         
         # Record purchase
         purchase_data = {
@@ -740,7 +906,7 @@ class RewardService:
         current_app.mongo.db.user_purchases.insert_one(purchase_data)
         
         # Log the purchase
-        current_app.mongo.db.rewards.insert_one({
+        purchase_reward = {
             'user_id': user_id,
             'points': -item['cost'],
             'source': 'shop',
@@ -748,7 +914,9 @@ class RewardService:
             'category': 'purchase',
             'date': datetime.utcnow(),
             'reference_id': str(purchase_data['_id'])
-        })
+        }
+        current_app.mongo.db.rewards.insert_one(purchase_reward)
+        RewardService._record_facets(user_id, [purchase_reward])
         
         return True, "Purchase successful"
     
@@ -907,3 +1075,154 @@ class RewardService:
             'achievements': RewardService.get_user_achievements(user_id),
             'goal_rewards': goal_rewards
         }
+
+
+class RewardCompactionService:
+    """Rolls rewards older than RETAIN_MONTHS into per-user monthly summaries.
+
+    Each batch of old rows is tagged with a batch id, archived (gzipped NDJSON files
+    under REWARD_ARCHIVE_DIR, or the rewards_archive collection when that isn't set),
+    folded into `reward_summaries` as points and counts per source and category, and
+    deleted. Every step is keyed by the batch, so a run that dies part way is finished
+    by a later one without double counting.
+    """
+
+    RETAIN_MONTHS = 6
+    COMPACT_INTERVAL = 24 * 60 * 60
+    BATCH_SIZE = 5000
+    ABANDONED_MINUTES = 30  # Tagged batches this old are finished by whichever run finds them
+
+    # Stages turning summary documents into reward-shaped rows of source, category, points and count
+    FLATTEN = [
+        {'$project': {'user_id': 1, 'month': 1, 'sources': {'$objectToArray': '$totals'}}},
+        {'$unwind': '$sources'},
+        {'$project': {
+            'user_id': 1, 'month': 1, 'source': '$sources.k',
+            'categories': {'$objectToArray': '$sources.v'}
+        }},
+        {'$unwind': '$categories'},
+        {'$project': {
+            'user_id': 1, 'month': 1, 'source': 1,
+            'category': '$categories.k',
+            'points': '$categories.v.points',
+            'count': '$categories.v.count'
+        }}
+    ]
+
+    @staticmethod
+    def cutoff(now=None):
+        """Start of the oldest month kept as raw rewards"""
+        now = now or datetime.utcnow()
+        month = now.year * 12 + now.month - 1 - RewardCompactionService.RETAIN_MONTHS
+        return datetime(month // 12, month % 12 + 1, 1)
+
+    @staticmethod
+    def compact():
+        """Scheduled job: compact every reward older than the cutoff; returns rows removed"""
+        db = current_app.mongo.db
+        compacted = 0
+        try:
+            abandoned = datetime.utcnow() - timedelta(minutes=RewardCompactionService.ABANDONED_MINUTES)
+            for batch_id in db.rewards.distinct('compact_batch'):
+                if ObjectId(batch_id).generation_time.replace(tzinfo=None) < abandoned:
+                    compacted += RewardCompactionService._finish_batch(batch_id)
+            
+            old = {'date': {'$lt': RewardCompactionService.cutoff()}, 'compact_batch': {'$exists': False}}
+            while True:
+                ids = [r['_id'] for r in db.rewards.find(old, {'_id': 1}).sort('date', 1).limit(RewardCompactionService.BATCH_SIZE)]
+                if not ids:
+                    break
+                batch_id = str(ObjectId())
+                db.rewards.update_many({'_id': {'$in': ids}, 'compact_batch': {'$exists': False}}, {'$set': {'compact_batch': batch_id}})
+                compacted += RewardCompactionService._finish_batch(batch_id)
+            
+            if compacted:
+                logger.info(f"Compacted {compacted} rewards into monthly summaries")
+        except Exception as e:
+            logger.error(f"Error compacting rewards: {str(e)}")
+        return compacted
+
+    @staticmethod
+    def _finish_batch(batch_id):
+        db = current_app.mongo.db
+        rows = {'compact_batch': batch_id}
+        RewardCompactionService._archive(batch_id)
+        
+        summaries = {}
+        for total in db.rewards.aggregate([
+            {'$match': rows},
+            {'$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'month': {'$dateFromParts': {'year': {'$year': '$date'}, 'month': {'$month': '$date'}}},
+                    'source': '$source',
+                    'category': '$category'
+                },
+                'points': {'$sum': '$points'},
+                'count': {'$sum': 1}
+            }}
+        ]):
+            key = total['_id']
+            inc = summaries.setdefault((key['user_id'], key['month']), {'points': 0, 'count': 0})
+            prefix = f"totals.{_field_key(key.get('source'), 'unknown')}.{_field_key(key.get('category'), 'general')}"
+            for field in ('points', 'count'):
+                inc[field] += total[field]
+                inc[f'{prefix}.{field}'] = inc.get(f'{prefix}.{field}', 0) + total[field]
+        
+        operations = [
+            # A summary that already lists the batch fails the filter and its upsert hits
+            # the unique index, which is how a re-run skips it
+            UpdateOne(
+                {'user_id': user_id, 'month': month, 'batches': {'$ne': batch_id}},
+                {'$inc': inc, '$push': {'batches': batch_id}},
+                upsert=True
+            )
+            for (user_id, month), inc in summaries.items()
+        ]
+        if operations:
+            try:
+                db.reward_summaries.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                    raise
+        return db.rewards.delete_many(rows).deleted_count
+
+    @staticmethod
+    def _archive(batch_id):
+        db = current_app.mongo.db
+        cursor = db.rewards.find({'compact_batch': batch_id}).sort('_id', 1)
+        archive_dir = current_app.config.get('REWARD_ARCHIVE_DIR')
+        if not archive_dir:
+            try:
+                db.rewards_archive.insert_many(list(cursor), ordered=False)
+            except BulkWriteError as e:
+                if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                    raise
+            return
+        
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f'rewards-{batch_id}.ndjson.gz')
+        if os.path.exists(path):
+            return
+        # Written aside and renamed, so a file that exists is always complete
+        partial = f'{path}.{os.getpid()}.tmp'
+        with gzip.open(partial, 'wt', encoding='utf-8') as f:
+            for reward in cursor:
+                f.write(json_util.dumps(reward) + '\n')
+        os.replace(partial, path)
+
+    @staticmethod
+    def monthly_summaries(user_id, source=None, category=None):
+        """A user's compacted months, newest first, as {'month', 'points', 'count'}"""
+        filters = {key: value for key, value in (('source', source), ('category', category)) if value is not None}
+        return [
+            {'month': s['_id'], 'points': s['points'], 'count': s['count']}
+            for s in current_app.mongo.db.reward_summaries.aggregate(
+                [{'$match': {'user_id': user_id}}] + RewardCompactionService.FLATTEN
+                + ([{'$match': filters}] if filters else [])
+                + [
+                    {'$group': {'_id': '$month', 'points': {'$sum': '$points'}, 'count': {'$sum': '$count'}}},
+                    {'$sort': {'_id': -1}}
+                ]
+            )
+        ]
@@ -5,7 +5,15 @@ from datetime import datetime, timedelta
 from bson import ObjectId
 import os
 import logging
+import re
 import requests
+import urllib.parse
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.book_index import BookIndex
+from utils.pagination import decode_cursor, encode_cursor, keyset_page
+from utils.membership_cache import membership_cache, MISS
+from utils import text_fingerprint
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -51,6 +59,16 @@ class DatabaseManager:
             # Initialize default data and migrations
             DatabaseManager._create_default_admin()
             DatabaseManager._migrate_user_avatars()  # New migration for avatar preferences
+            DatabaseManager._migrate_books_to_catalog()
+            DatabaseManager._migrate_reading_sessions_to_buckets()
+            DatabaseManager._migrate_club_memberships()
+            DatabaseManager._migrate_club_post_engagement()
+            DatabaseManager._migrate_quiz_scores()
+            DatabaseManager._migrate_flashcard_schedule()
+            DatabaseManager._migrate_quote_fingerprints()
+            DatabaseManager._migrate_page_text_status()
+            DatabaseManager._migrate_points_ledger()
+            DatabaseManager._migrate_reward_facets()
             DatabaseManager._initialize_default_data()
             
             logger.info("Database initialization completed successfully")
@@ -70,7 +88,12 @@ class DatabaseManager:
             'quotes', 'transactions', 'user_purchases',
             'clubs', 'club_posts', 'club_chat_messages',
             'flashcards', 'quiz_questions', 'quiz_answers', 'user_progress',
-            'donations', 'testimonials'  # Added new collections
+            'donations', 'testimonials',  # Added new collections
+            'catalog', 'progress_staging', 'active_timers', 'task_daily_rollups',
+            'club_memberships', 'club_post_likes', 'club_post_comments', 'quiz_daily_sets',
+            'quiz_scores', 'quiz_sessions', 'book_page_texts',
+            'points_ledger', 'points_snapshots', 'points_reconciliations',
+            'reward_summaries', 'rewards_archive', 'reward_facets'
         ]
         existing_collections = current_app.mongo.db.list_collection_names()
         
@@ -134,6 +157,71 @@ class DatabaseManager:
             if 'pdf_path_1' not in indexes:
                 current_app.mongo.db.books.create_index("pdf_path", sparse=True)
                 logger.info("Created sparse index on books.pdf_path")
+            if 'added_at_-1' not in indexes:
+                current_app.mongo.db.books.create_index([("added_at", -1)])
+                logger.info("Created index on books.added_at")
+            if 'catalog_id_1' not in indexes:
+                current_app.mongo.db.books.create_index("catalog_id", sparse=True)
+                logger.info("Created sparse index on books.catalog_id")
+            if 'page_text_status_1' not in indexes:
+                current_app.mongo.db.books.create_index("page_text_status", sparse=True)
+                logger.info("Created sparse index on books.page_text_status")
+
+            # Catalog collection indexes
+            indexes = current_app.mongo.db.catalog.index_information()
+            if 'catalog_key_1' not in indexes:
+                current_app.mongo.db.catalog.create_index("catalog_key", unique=True)
+                logger.info("Created unique index on catalog.catalog_key")
+            if 'google_books_id_1' not in indexes:
+                current_app.mongo.db.catalog.create_index("google_books_id", sparse=True)
+                logger.info("Created sparse index on catalog.google_books_id")
+            if 'isbn_1' not in indexes:
+                current_app.mongo.db.catalog.create_index("isbn", sparse=True)
+                logger.info("Created sparse index on catalog.isbn")
+            if 'title_key_1' not in indexes:
+                current_app.mongo.db.catalog.create_index("title_key")
+                logger.info("Created index on catalog.title_key")
+            if 'library_count_-1' not in indexes:
+                current_app.mongo.db.catalog.create_index([("library_count", -1)])
+                logger.info("Created index on catalog.library_count")
+
+            # Progress staging indexes
+            indexes = current_app.mongo.db.progress_staging.index_information()
+            if 'user_id_1_book_id_1' not in indexes:
+                current_app.mongo.db.progress_staging.create_index([("user_id", 1), ("book_id", 1)], unique=True)
+                logger.info("Created unique index on progress_staging.user_id_book_id")
+            if 'last_at_1' not in indexes:
+                current_app.mongo.db.progress_staging.create_index("last_at")
+                logger.info("Created index on progress_staging.last_at")
+            if 'first_at_1' not in indexes:
+                current_app.mongo.db.progress_staging.create_index("first_at")
+                logger.info("Created index on progress_staging.first_at")
+
+            # Active timers indexes
+            indexes = current_app.mongo.db.active_timers.index_information()
+            if 'user_id_1' not in indexes:
+                try:
+                    # Keep only the newest timer per user before enforcing one timer per user
+                    duplicates = current_app.mongo.db.active_timers.aggregate([
+                        {'$sort': {'start_time': -1}},
+                        {'$group': {'_id': '$user_id', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+                        {'$match': {'count': {'$gt': 1}}}
+                    ])
+                    for duplicate in duplicates:
+                        current_app.mongo.db.active_timers.delete_many({'_id': {'$in': duplicate['ids'][1:]}})
+                        logger.info(f"Removed {len(duplicate['ids']) - 1} duplicate active timers for user_id: {duplicate['_id']}")
+                    current_app.mongo.db.active_timers.create_index("user_id", unique=True)
+                    logger.info("Created unique index on active_timers.user_id")
+                except Exception as e:
+                    logger.error(f"Error creating active_timers.user_id index: {str(e)}")
+            if 'expires_at_1' not in indexes:
+                current_app.mongo.db.active_timers.update_many(
+                    {'expires_at': {'$exists': False}},
+                    [{'$set': {'expires_at': '$end_time'}}]
+                )
+                # Backstop for timers the sweeper job never got to: dropped 6 hours after expiring
+                current_app.mongo.db.active_timers.create_index("expires_at", expireAfterSeconds=6 * 60 * 60)
+                logger.info("Created TTL index on active_timers.expires_at")
 
             # Reading sessions indexes
             indexes = current_app.mongo.db.reading_sessions.index_information()
@@ -143,6 +231,14 @@ class DatabaseManager:
             if 'user_id_1_book_id_1' not in indexes:
                 current_app.mongo.db.reading_sessions.create_index([("user_id", 1), ("book_id", 1)])
                 logger.info("Created index on reading_sessions.user_id_book_id")
+            if 'user_id_1_book_id_1_day_1' not in indexes:
+                # Partial so legacy per-event documents (no `day`) don't collide while migrating
+                current_app.mongo.db.reading_sessions.create_index(
+                    [("user_id", 1), ("book_id", 1), ("day", 1)],
+                    unique=True,
+                    partialFilterExpression={'day': {'$exists': True}}
+                )
+                logger.info("Created unique index on reading_sessions.user_id_book_id_day")
 
             # Completed tasks indexes
             indexes = current_app.mongo.db.completed_tasks.index_information()
@@ -152,6 +248,21 @@ class DatabaseManager:
             if 'user_id_1_category_1' not in indexes:
                 current_app.mongo.db.completed_tasks.create_index([("user_id", 1), ("category", 1)])
                 logger.info("Created index on completed_tasks.user_id_category")
+            # Keyset pagination of history orders by (completed_at, _id), with or without a category
+            if 'user_id_1_completed_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.completed_tasks.create_index([("user_id", 1), ("completed_at", -1), ("_id", -1)])
+                logger.info("Created index on completed_tasks.user_id_completed_at_id")
+            if 'user_id_1_category_1_completed_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.completed_tasks.create_index(
+                    [("user_id", 1), ("category", 1), ("completed_at", -1), ("_id", -1)]
+                )
+                logger.info("Created index on completed_tasks.user_id_category_completed_at_id")
+
+            # Task daily rollups: one document per user per day, maintained on completion
+            indexes = current_app.mongo.db.task_daily_rollups.index_information()
+            if 'user_id_1_day_1' not in indexes:
+                current_app.mongo.db.task_daily_rollups.create_index([("user_id", 1), ("day", 1)], unique=True)
+                logger.info("Created unique index on task_daily_rollups.user_id_day")
 
             # Rewards collection indexes
             indexes = current_app.mongo.db.rewards.index_information()
@@ -164,6 +275,40 @@ class DatabaseManager:
             if 'user_id_1_category_1' not in indexes:
                 current_app.mongo.db.rewards.create_index([("user_id", 1), ("category", 1)])
                 logger.info("Created index on rewards.user_id_category")
+            if 'user_id_1_award_key_1' not in indexes:
+                # Keyed awards (e.g. one Daily Champion per day) can only be made once
+                current_app.mongo.db.rewards.create_index(
+                    [("user_id", 1), ("award_key", 1)],
+                    unique=True,
+                    partialFilterExpression={'award_key': {'$exists': True}}
+                )
+                logger.info("Created unique index on rewards.user_id_award_key")
+            if 'date_1' not in indexes:
+                current_app.mongo.db.rewards.create_index("date")
+                logger.info("Created index on rewards.date for compaction")
+            if 'user_id_1_date_-1__id_-1' not in indexes:
+                current_app.mongo.db.rewards.create_index([("user_id", 1), ("date", -1), ("_id", -1)])
+                logger.info("Created index on rewards.user_id_date_id for keyset history pages")
+            if 'compact_batch_1' not in indexes:
+                current_app.mongo.db.rewards.create_index("compact_batch", sparse=True)
+                logger.info("Created sparse index on rewards.compact_batch")
+            indexes = current_app.mongo.db.reward_summaries.index_information()
+            if 'user_id_1_month_1' not in indexes:
+                current_app.mongo.db.reward_summaries.create_index([("user_id", 1), ("month", 1)], unique=True)
+                logger.info("Created unique index on reward_summaries.user_id_month")
+
+            # Points ledger indexes
+            indexes = current_app.mongo.db.points_ledger.index_information()
+            if 'user_id_1_seq_1' not in indexes:
+                current_app.mongo.db.points_ledger.create_index([("user_id", 1), ("seq", 1)], unique=True)
+                logger.info("Created unique index on points_ledger.user_id_seq")
+            if 'date_1' not in indexes:
+                current_app.mongo.db.points_ledger.create_index("date")
+                logger.info("Created index on points_ledger.date")
+            indexes = current_app.mongo.db.points_snapshots.index_information()
+            if 'user_id_1_day_1' not in indexes:
+                current_app.mongo.db.points_snapshots.create_index([("user_id", 1), ("day", 1)], unique=True)
+                logger.info("Created unique index on points_snapshots.user_id_day")
 
             # User badges indexes
             indexes = current_app.mongo.db.user_badges.index_information()
@@ -224,6 +369,18 @@ class DatabaseManager:
             if 'submitted_at_1' not in indexes:
                 current_app.mongo.db.quotes.create_index("submitted_at")
                 logger.info("Created index on quotes.submitted_at")
+            if 'status_1_submitted_at_1__id_1' not in indexes:
+                current_app.mongo.db.quotes.create_index([("status", 1), ("submitted_at", 1), ("_id", 1)])
+                logger.info("Created index on quotes.status_submitted_at for the moderation queue")
+            if 'work_id_1_lsh_buckets_1' not in indexes:
+                current_app.mongo.db.quotes.create_index([("work_id", 1), ("lsh_buckets", 1)])
+                logger.info("Created index on quotes.work_id_lsh_buckets for near-duplicate lookups")
+
+            # Book page texts collection indexes
+            indexes = current_app.mongo.db.book_page_texts.index_information()
+            if 'book_id_1_page_1' not in indexes:
+                current_app.mongo.db.book_page_texts.create_index([("book_id", 1), ("page", 1)], unique=True)
+                logger.info("Created unique index on book_page_texts.book_id_page")
 
             # Transactions collection indexes
             indexes = current_app.mongo.db.transactions.index_information()
@@ -267,6 +424,94 @@ class DatabaseManager:
                 current_app.mongo.db.testimonials.create_index("created_at")
                 logger.info("Created index on testimonials.created_at")
 
+            # Club memberships: role lookups by club, and a user's clubs
+            indexes = current_app.mongo.db.club_memberships.index_information()
+            if 'club_id_1_user_id_1' not in indexes:
+                current_app.mongo.db.club_memberships.create_index([("club_id", 1), ("user_id", 1)], unique=True)
+                logger.info("Created unique index on club_memberships.club_id_user_id")
+            if 'user_id_1_club_id_1' not in indexes:
+                current_app.mongo.db.club_memberships.create_index([("user_id", 1), ("club_id", 1)])
+                logger.info("Created index on club_memberships.user_id_club_id")
+            if 'club_id_1_role_1' not in indexes:
+                current_app.mongo.db.club_memberships.create_index([("club_id", 1), ("role", 1)])
+                logger.info("Created index on club_memberships.club_id_role")
+
+            # Club feed: keyset pages per club, likes and comments per post
+            indexes = current_app.mongo.db.club_posts.index_information()
+            if 'club_id_1_created_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.club_posts.create_index([("club_id", 1), ("created_at", -1), ("_id", -1)])
+                logger.info("Created index on club_posts.club_id_created_at")
+            indexes = current_app.mongo.db.club_post_likes.index_information()
+            if 'post_id_1_user_id_1' not in indexes:
+                current_app.mongo.db.club_post_likes.create_index([("post_id", 1), ("user_id", 1)], unique=True)
+                logger.info("Created unique index on club_post_likes.post_id_user_id")
+            indexes = current_app.mongo.db.club_post_comments.index_information()
+            if 'post_id_1_created_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.club_post_comments.create_index([("post_id", 1), ("created_at", -1), ("_id", -1)])
+                logger.info("Created index on club_post_comments.post_id_created_at")
+
+            # Club chat: recent history and "load older" pages per club
+            indexes = current_app.mongo.db.club_chat_messages.index_information()
+            if 'club_id_1_timestamp_-1__id_-1' not in indexes:
+                current_app.mongo.db.club_chat_messages.create_index([("club_id", 1), ("timestamp", -1), ("_id", -1)])
+                logger.info("Created index on club_chat_messages.club_id_timestamp")
+
+            # Quiz: tag-based daily sets pick from questions carrying the tag
+            indexes = current_app.mongo.db.quiz_questions.index_information()
+            if 'tags_1' not in indexes:
+                current_app.mongo.db.quiz_questions.create_index("tags")
+                logger.info("Created index on quiz_questions.tags")
+            # Quiz review pages (all answers, or incorrect only) and the scoreboard rebuild
+            indexes = current_app.mongo.db.quiz_answers.index_information()
+            if 'user_id_1_submitted_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.quiz_answers.create_index([("user_id", 1), ("submitted_at", -1), ("_id", -1)])
+                logger.info("Created index on quiz_answers.user_id_submitted_at")
+            if 'user_id_1_is_correct_1_submitted_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.quiz_answers.create_index([("user_id", 1), ("is_correct", 1), ("submitted_at", -1), ("_id", -1)])
+                logger.info("Created index on quiz_answers.user_id_is_correct_submitted_at")
+
+            # Flashcards: the due queue per user, newest-first listing and import dedupe
+            indexes = current_app.mongo.db.flashcards.index_information()
+            if 'user_id_1_next_review_at_1' not in indexes:
+                current_app.mongo.db.flashcards.create_index([("user_id", 1), ("next_review_at", 1)])
+                logger.info("Created index on flashcards.user_id_next_review_at")
+            if 'user_id_1_created_at_-1__id_-1' not in indexes:
+                current_app.mongo.db.flashcards.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+                logger.info("Created index on flashcards.user_id_created_at")
+            if 'user_id_1_source.item_id_1' not in indexes:
+                current_app.mongo.db.flashcards.create_index(
+                    [("user_id", 1), ("source.item_id", 1)],
+                    unique=True,
+                    partialFilterExpression={'source.item_id': {'$exists': True}}
+                )
+                logger.info("Created unique index on flashcards.user_id_source_item_id")
+
+            # Quiz sessions: the user's active session, and the expiry job's sweep
+            indexes = current_app.mongo.db.quiz_sessions.index_information()
+            if 'user_id_1_status_1_started_at_-1' not in indexes:
+                current_app.mongo.db.quiz_sessions.create_index([("user_id", 1), ("status", 1), ("started_at", -1)])
+                logger.info("Created index on quiz_sessions.user_id_status_started_at")
+            if 'status_1_deadline_1' not in indexes:
+                current_app.mongo.db.quiz_sessions.create_index([("status", 1), ("deadline", 1)])
+                logger.info("Created index on quiz_sessions.status_deadline")
+            if 'daily_key_1' not in indexes:
+                # Partial, so sessions started before daily keys existed don't collide
+                current_app.mongo.db.quiz_sessions.create_index(
+                    "daily_key",
+                    unique=True,
+                    partialFilterExpression={'daily_key': {'$type': 'string'}}
+                )
+                logger.info("Created unique index on quiz_sessions.daily_key")
+
+            # Quiz scoreboard: one document per user for all time and per user per day
+            indexes = current_app.mongo.db.quiz_scores.index_information()
+            if 'user_id_1_period_1' not in indexes:
+                current_app.mongo.db.quiz_scores.create_index([("user_id", 1), ("period", 1)], unique=True)
+                logger.info("Created unique index on quiz_scores.user_id_period")
+            if 'period_1_correct_-1' not in indexes:
+                current_app.mongo.db.quiz_scores.create_index([("period", 1), ("correct", -1)])
+                logger.info("Created index on quiz_scores.period_correct")
+
             logger.info("Database indexes created successfully")
 
         except Exception as e:
@@ -397,6 +642,370 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Error during avatar migration: {str(e)}")
     
+    @staticmethod
+    def _migrate_books_to_catalog(batch_size=500):
+        """Link existing per-user books to shared catalog entries and rebuild catalog counters"""
+        try:
+            unlinked = {'catalog_id': {'$exists': False}}
+            if not current_app.mongo.db.books.find_one(unlinked, {'_id': 1}):
+                return
+            logger.info("Starting books to catalog migration...")
+            linked_count = 0
+            
+            while True:
+                batch = list(current_app.mongo.db.books.find(unlinked).limit(batch_size))
+                if not batch:
+                    break
+                operations = []
+                for book, entry in zip(batch, CatalogModel.find_or_create_many(batch)):
+                    update = {'$set': {'catalog_id': entry['_id']}}
+                    # Shared metadata now lives on the catalog entry; a description the user
+                    # edited away from the catalog's copy stays on their entry as an override
+                    entry_description = entry.get('description') or ''
+                    unset = {field: '' for field in CatalogModel.SHARED_FIELDS if field in book}
+                    if book.get('description') and book['description'] != entry_description:
+                        unset.pop('description', None)
+                    if unset:
+                        update['$unset'] = unset
+                    operations.append(UpdateOne({'_id': book['_id']}, update))
+                current_app.mongo.db.books.bulk_write(operations, ordered=False)
+                linked_count += len(operations)
+                logger.info(f"Linked {linked_count} books to the catalog")
+            
+            # Counters are rebuilt from scratch so partially migrated runs converge
+            counters = current_app.mongo.db.books.aggregate([
+                {'$group': {
+                    '_id': '$catalog_id',
+                    'library_count': {'$sum': 1},
+                    'finished_count': {'$sum': {'$cond': [{'$eq': ['$status', 'finished']}, 1, 0]}},
+                    'rating_sum': {'$sum': {'$ifNull': ['$rating', 0]}},
+                    'rating_count': {'$sum': {'$cond': [{'$gt': ['$rating', 0]}, 1, 0]}}
+                }}
+            ], allowDiskUse=True)
+            operations = []
+            for counter in counters:
+                catalog_id = counter.pop('_id')
+                operations.append(UpdateOne({'_id': catalog_id}, {'$set': counter}))
+                if len(operations) >= batch_size:
+                    current_app.mongo.db.catalog.bulk_write(operations, ordered=False)
+                    operations = []
+            if operations:
+                current_app.mongo.db.catalog.bulk_write(operations, ordered=False)
+            
+            logger.info(f"Catalog migration completed: Linked {linked_count} books")
+            
+        except Exception as e:
+            logger.error(f"Error during catalog migration: {str(e)}")
+    
+    @staticmethod
+    def _migrate_club_memberships(batch_size=500):
+        """Move members/admins arrays off club documents into club_memberships"""
+        try:
+            legacy = {'$or': [{'members': {'$exists': True}}, {'admins': {'$exists': True}}]}
+            if not current_app.mongo.db.clubs.find_one(legacy, {'_id': 1}):
+                return
+            logger.info("Starting club memberships migration...")
+            migrated = 0
+            
+            for club in current_app.mongo.db.clubs.find(legacy, {'members': 1, 'admins': 1, 'created_at': 1}):
+                admins = {str(a) for a in club.get('admins', [])}
+                members = {str(m) for m in club.get('members', [])} | admins
+                joined_at = club.get('created_at') or datetime.utcnow()
+                operations = [
+                    UpdateOne(
+                        {'club_id': club['_id'], 'user_id': user_id},
+                        {'$setOnInsert': {
+                            'role': 'admin' if user_id in admins else 'member',
+                            'joined_at': joined_at
+                        }},
+                        upsert=True
+                    )
+                    for user_id in members
+                ]
+                for i in range(0, len(operations), batch_size):
+                    current_app.mongo.db.club_memberships.bulk_write(operations[i:i + batch_size], ordered=False)
+                
+                # Counts come from the collection so re-runs converge
+                current_app.mongo.db.clubs.update_one(
+                    {'_id': club['_id']},
+                    {
+                        '$set': {
+                            'member_count': current_app.mongo.db.club_memberships.count_documents({'club_id': club['_id']}),
+                            'admin_count': current_app.mongo.db.club_memberships.count_documents(
+                                {'club_id': club['_id'], 'role': 'admin'}
+                            )
+                        },
+                        '$unset': {'members': '', 'admins': ''}
+                    }
+                )
+                migrated += 1
+            
+            logger.info(f"Club memberships migration completed: Migrated {migrated} clubs")
+            
+        except Exception as e:
+            logger.error(f"Error during club memberships migration: {str(e)}")
+    
+    @staticmethod
+    def _migrate_club_post_engagement(batch_size=500):
+        """Move embedded likes/comments arrays into their own collections and add author fields"""
+        try:
+            legacy = {'$or': [
+                {'likes': {'$exists': True}},
+                {'comments': {'$exists': True}},
+                {'username': {'$exists': False}}
+            ]}
+            if not current_app.mongo.db.club_posts.find_one(legacy, {'_id': 1}):
+                return
+            logger.info("Starting club post engagement migration...")
+            migrated = 0
+            
+            while True:
+                batch = list(current_app.mongo.db.club_posts.find(legacy).limit(batch_size))
+                if not batch:
+                    break
+                authors = UserModel.get_authors_by_ids(p['user_id'] for p in batch)
+                likes = []
+                comments = []
+                operations = []
+                for post in batch:
+                    for user_id in post.get('likes', []):
+                        likes.append(UpdateOne(
+                            {'post_id': post['_id'], 'user_id': str(user_id)},
+                            {'$setOnInsert': {'club_id': post['club_id'], 'created_at': post['created_at']}},
+                            upsert=True
+                        ))
+                    for index, comment in enumerate(post.get('comments', [])):
+                        if not isinstance(comment, dict):
+                            comment = {'content': str(comment)}
+                        comment_author = authors.get(str(comment.get('user_id')), {})
+                        comments.append(UpdateOne(
+                            {'post_id': post['_id'], 'legacy_index': index},
+                            {'$setOnInsert': {
+                                'club_id': post['club_id'],
+                                'user_id': str(comment.get('user_id', '')),
+                                'username': comment.get('username') or comment_author.get('username'),
+                                'avatar_url': comment_author.get('avatar_url'),
+                                'content': comment.get('content') or comment.get('text', ''),
+                                'created_at': comment.get('created_at') or post['created_at']
+                            }},
+                            upsert=True
+                        ))
+                    author = authors.get(str(post['user_id']), {})
+                    operations.append(UpdateOne({'_id': post['_id']}, {
+                        '$set': {
+                            'username': author.get('username') or str(post['user_id']),
+                            'avatar_url': author.get('avatar_url'),
+                            'like_count': len(set(map(str, post.get('likes', [])))),
+                            'comment_count': len(post.get('comments', []))
+                        },
+                        '$unset': {'likes': '', 'comments': ''}
+                    }))
+                if likes:
+                    current_app.mongo.db.club_post_likes.bulk_write(likes, ordered=False)
+                if comments:
+                    current_app.mongo.db.club_post_comments.bulk_write(comments, ordered=False)
+                current_app.mongo.db.club_posts.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+            
+            logger.info(f"Club post engagement migration completed: Migrated {migrated} posts")
+            
+        except Exception as e:
+            logger.error(f"Error during club post engagement migration: {str(e)}")
+    
+    @staticmethod
+    def _migrate_flashcard_schedule():
+        """Give cards created before scheduling existed an SM-2 starting point, due now"""
+        try:
+            result = current_app.mongo.db.flashcards.update_many(
+                {'next_review_at': {'$exists': False}},
+                [{'$set': {
+                    'ease': FlashcardModel.DEFAULT_EASE,
+                    'interval': 0,
+                    'repetitions': 0,
+                    'next_review_at': {'$ifNull': ['$created_at', '$$NOW']}
+                }}]
+            )
+            if result.modified_count:
+                logger.info(f"Flashcard schedule migration completed: Scheduled {result.modified_count} cards")
+        except Exception as e:
+            logger.error(f"Error during flashcard schedule migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_quote_fingerprints(batch_size=500):
+        """Fingerprint quotes submitted before near-duplicate detection existed"""
+        try:
+            legacy = {'lsh_buckets': {'$exists': False}}
+            if not current_app.mongo.db.quotes.find_one(legacy, {'_id': 1}):
+                return
+            logger.info("Starting quote fingerprint migration...")
+            migrated = 0
+            
+            while True:
+                batch = list(current_app.mongo.db.quotes.find(legacy, {'book_id': 1, 'quote_text': 1}).limit(batch_size))
+                if not batch:
+                    break
+                catalog_ids = {
+                    b['_id']: b.get('catalog_id') for b in current_app.mongo.db.books.find(
+                        {'_id': {'$in': list({q['book_id'] for q in batch})}}, {'catalog_id': 1}
+                    )
+                }
+                operations = [
+                    UpdateOne({'_id': q['_id']}, {'$set': {
+                        'work_id': catalog_ids.get(q['book_id']) or q['book_id'],
+                        **text_fingerprint.fingerprint(q.get('quote_text', ''))
+                    }})
+                    for q in batch
+                ]
+                current_app.mongo.db.quotes.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+            
+            logger.info(f"Quote fingerprint migration completed: Fingerprinted {migrated} quotes")
+            
+        except Exception as e:
+            logger.error(f"Error during quote fingerprint migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_page_text_status():
+        """Queue PDFs uploaded before page text indexing existed for the indexing job"""
+        try:
+            result = current_app.mongo.db.books.update_many(
+                {'pdf_path': {'$ne': None}, 'page_text_status': {'$exists': False}},
+                {'$set': {'page_text_status': 'pending'}}
+            )
+            if result.modified_count:
+                logger.info(f"Page text migration completed: Queued {result.modified_count} books")
+        except Exception as e:
+            logger.error(f"Error during page text migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_points_ledger(batch_size=500):
+        """Open the points ledger for existing users with their current total_points"""
+        try:
+            legacy = {'ledger_seq': {'$exists': False}}
+            if not current_app.mongo.db.users.find_one(legacy, {'_id': 1}):
+                return
+            logger.info("Starting points ledger migration...")
+            opened = 0
+            
+            while True:
+                batch = list(current_app.mongo.db.users.find(legacy, {'_id': 1}).limit(batch_size))
+                if not batch:
+                    break
+                operations = []
+                for user in batch:
+                    # Claiming ledger_seq and reading the balance in one update keeps
+                    # awards made meanwhile on the right side of the opening entry
+                    user = current_app.mongo.db.users.find_one_and_update(
+                        {'_id': user['_id'], **legacy},
+                        {'$set': {'ledger_seq': 0}},
+                        projection={'total_points': 1}
+                    )
+                    if user and user.get('total_points'):
+                        operations.append(PointsLedgerModel.opening_entry(user['_id'], user['total_points']))
+                if operations:
+                    current_app.mongo.db.points_ledger.bulk_write(operations, ordered=False)
+                opened += len(operations)
+            
+            logger.info(f"Points ledger migration completed: Opened {opened} balances")
+            
+        except Exception as e:
+            logger.error(f"Error during points ledger migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_reward_facets():
+        """Build reward facet summaries from existing rewards the first time they are empty"""
+        try:
+            if current_app.mongo.db.reward_facets.find_one({}, {'_id': 1}):
+                return
+            if not current_app.mongo.db.rewards.find_one({}, {'_id': 1}):
+                return
+            logger.info("Starting reward facets migration...")
+            from blueprints.rewards.services import RewardService
+            users = RewardService.rebuild_facets()
+            logger.info(f"Reward facets migration completed: Summarized {users} users")
+        except Exception as e:
+            logger.error(f"Error during reward facets migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_quiz_scores():
+        """Build the quiz scoreboard from existing answers the first time it is empty"""
+        try:
+            if current_app.mongo.db.quiz_scores.find_one({}, {'_id': 1}):
+                return
+            if not current_app.mongo.db.quiz_answers.find_one({}, {'_id': 1}):
+                return
+            logger.info("Starting quiz scores migration...")
+            users = QuizScoreModel.rebuild()
+            logger.info(f"Quiz scores migration completed: Scored {users} users")
+        except Exception as e:
+            logger.error(f"Error during quiz scores migration: {str(e)}")
+
+    @staticmethod
+    def _migrate_reading_sessions_to_buckets(batch_size=1000):
+        """Fold legacy per-event reading sessions into per-user, per-book, per-day buckets"""
+        try:
+            legacy = {'day': {'$exists': False}}
+            if not current_app.mongo.db.reading_sessions.find_one(legacy, {'_id': 1}):
+                return
+            logger.info("Starting reading sessions bucket migration...")
+            migrated_count = 0
+            
+            while True:
+                batch = list(current_app.mongo.db.reading_sessions.find(legacy).sort('_id', 1).limit(batch_size))
+                if not batch:
+                    break
+                operations = []
+                for doc in batch:
+                    date = doc.get('date') or doc['_id'].generation_time.replace(tzinfo=None)
+                    duration_minutes = doc.get('duration_minutes', doc.get('duration', 0)) or 0
+                    pages_read = doc.get('pages_read', 0) or 0
+                    event = {
+                        'date': date,
+                        'pages_read': pages_read,
+                        'start_page': doc.get('start_page'),
+                        'end_page': doc.get('end_page'),
+                        'duration_minutes': duration_minutes,
+                        'notes': doc.get('notes') or '',
+                        'legacy_id': doc['_id']
+                    }
+                    bucket_min = {'first_at': date}
+                    bucket_max = {'date': date}
+                    if doc.get('start_page') is not None:
+                        bucket_min['start_page'] = doc['start_page']
+                    if doc.get('end_page') is not None:
+                        bucket_max['end_page'] = doc['end_page']
+                    # Matching on the legacy id makes a re-run after a crash skip events that were
+                    # already folded in: the filter misses, the upsert hits the unique index and fails
+                    operations.append(UpdateOne(
+                        {
+                            'user_id': doc['user_id'],
+                            'book_id': doc.get('book_id'),
+                            'day': ReadingSessionModel._day(date),
+                            'events.legacy_id': {'$ne': doc['_id']}
+                        },
+                        {
+                            '$inc': {'pages_read': pages_read, 'duration_minutes': duration_minutes, 'session_count': 1},
+                            '$min': bucket_min,
+                            '$max': bucket_max,
+                            '$push': {'events': {'$each': [event], '$sort': {'date': 1}, '$slice': -ReadingSessionModel.MAX_EVENTS_PER_BUCKET}},
+                            '$setOnInsert': {'created_at': datetime.utcnow()}
+                        },
+                        upsert=True
+                    ))
+                try:
+                    current_app.mongo.db.reading_sessions.bulk_write(operations, ordered=False)
+                except BulkWriteError as e:
+                    if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                        raise
+                current_app.mongo.db.reading_sessions.delete_many({'_id': {'$in': [doc['_id'] for doc in batch]}})
+                migrated_count += len(batch)
+                logger.info(f"Folded {migrated_count} reading sessions into day buckets")
+            
+            logger.info(f"Reading sessions migration completed: Folded {migrated_count} sessions")
+            
+        except Exception as e:
+            logger.error(f"Error during reading sessions migration: {str(e)}")
+    
     @staticmethod
     def _initialize_default_data():
         """Initialize default application data"""
@@ -459,23 +1068,25 @@ class ClubModel:
             'description': description,
             'topic': topic,
             'creator_id': creator_id,
-            'members': [creator_id],
+            'member_count': 0,  # Maintained by ClubMembershipModel
+            'admin_count': 0,
             'created_at': datetime.utcnow(),
-            'admins': [creator_id],
             'goals': [],
             'shared_quotes': [],
             'is_active': True,
             **kwargs
         }
-        return current_app.mongo.db.clubs.insert_one(club)
+        result = current_app.mongo.db.clubs.insert_one(club)
+        ClubMembershipModel.join(result.inserted_id, creator_id, role='admin')
+        return result
 
     @staticmethod
     def add_member(club_id, user_id):
-        return current_app.mongo.db.clubs.update_one({'_id': ObjectId(club_id)}, {'$addToSet': {'members': user_id}})
+        return ClubMembershipModel.join(club_id, user_id)
 
     @staticmethod
     def add_admin(club_id, user_id):
-        return current_app.mongo.db.clubs.update_one({'_id': ObjectId(club_id)}, {'$addToSet': {'admins': user_id}})
+        return ClubMembershipModel.set_role(club_id, user_id, 'admin')
 
     @staticmethod
     def get_club(club_id):
@@ -487,8 +1098,9 @@ class ClubModel:
 
     @staticmethod
     def get_user_clubs(user_id):
+        club_ids = list(ClubMembershipModel.user_roles(user_id))
         return list(current_app.mongo.db.clubs.find({
-            'members': user_id,
+            '_id': {'$in': club_ids},
             'is_active': True
         }))
 
@@ -499,22 +1111,214 @@ class ClubModel:
             'is_active': True
         }))
 
+class ClubMembershipModel:
+    """One document per (club, user) with the user's role; counts live on the club.
+
+    Role checks go through a per-process cache, so authorization is a dict lookup
+    however many members a club has.
+    """
+    
+    ROLES = ('member', 'admin')
+    
+    @staticmethod
+    def join(club_id, user_id, role='member'):
+        """Add a user to a club; returns False if they were already a member"""
+        club_id, user_id = ObjectId(club_id), str(user_id)
+        result = current_app.mongo.db.club_memberships.update_one(
+            {'club_id': club_id, 'user_id': user_id},
+            {'$setOnInsert': {'role': role, 'joined_at': datetime.utcnow()}},
+            upsert=True
+        )
+        membership_cache.invalidate(club_id, user_id)
+        if not result.upserted_id:
+            return False
+        current_app.mongo.db.clubs.update_one(
+            {'_id': club_id},
+            {'$inc': {'member_count': 1, 'admin_count': 1 if role == 'admin' else 0}}
+        )
+        return True
+    
+    @staticmethod
+    def leave(club_id, user_id):
+        """Remove a user from a club; returns False if they weren't a member"""
+        club_id, user_id = ObjectId(club_id), str(user_id)
+        membership = current_app.mongo.db.club_memberships.find_one_and_delete(
+            {'club_id': club_id, 'user_id': user_id}
+        )
+        membership_cache.invalidate(club_id, user_id)
+        if not membership:
+            return False
+        current_app.mongo.db.clubs.update_one(
+            {'_id': club_id},
+            {'$inc': {'member_count': -1, 'admin_count': -1 if membership['role'] == 'admin' else 0}}
+        )
+        return True
+    
+    @staticmethod
+    def set_role(club_id, user_id, role):
+        """Promote or demote a user, adding them as a member first if needed"""
+        if role not in ClubMembershipModel.ROLES:
+            raise ValueError(f"Unknown club role: {role}")
+        club_id, user_id = ObjectId(club_id), str(user_id)
+        if ClubMembershipModel.join(club_id, user_id, role=role):
+            return True
+        previous = current_app.mongo.db.club_memberships.find_one_and_update(
+            {'club_id': club_id, 'user_id': user_id, 'role': {'$ne': role}},
+            {'$set': {'role': role}}
+        )
+        membership_cache.invalidate(club_id, user_id)
+        if not previous:
+            return False
+        current_app.mongo.db.clubs.update_one(
+            {'_id': club_id},
+            {'$inc': {'admin_count': 1 if role == 'admin' else -1}}
+        )
+        return True
+    
+    @staticmethod
+    def get_role(club_id, user_id):
+        """The user's role in the club, or None if they aren't a member"""
+        role = membership_cache.get(club_id, user_id)
+        if role is MISS:
+            membership = current_app.mongo.db.club_memberships.find_one(
+                {'club_id': ObjectId(club_id), 'user_id': str(user_id)}, {'role': 1}
+            )
+            role = membership['role'] if membership else None
+            membership_cache.set(club_id, user_id, role)
+        return role
+    
+    @staticmethod
+    def is_member(club_id, user_id):
+        return ClubMembershipModel.get_role(club_id, user_id) is not None
+    
+    @staticmethod
+    def is_admin(club_id, user_id):
+        return ClubMembershipModel.get_role(club_id, user_id) == 'admin'
+    
+    @staticmethod
+    def user_roles(user_id):
+        """Map of club_id to role for every club the user belongs to, warming the cache"""
+        roles = {
+            m['club_id']: m['role']
+            for m in current_app.mongo.db.club_memberships.find({'user_id': str(user_id)}, {'club_id': 1, 'role': 1})
+        }
+        for club_id, role in roles.items():
+            membership_cache.set(club_id, user_id, role)
+        return roles
+    
+    @staticmethod
+    def get_admins(club_id):
+        """User ids of the club's admins"""
+        return [
+            m['user_id'] for m in current_app.mongo.db.club_memberships.find(
+                {'club_id': ObjectId(club_id), 'role': 'admin'}, {'user_id': 1}
+            ).sort('joined_at', 1)
+        ]
+
 class ClubPostModel:
+    """Club feed posts with author fields copied in at write time.
+
+    Likes and comments live in club_post_likes / club_post_comments; the post keeps
+    like_count and comment_count so the feed never reads them.
+    """
+    
+    FEED_PAGE_SIZE = 20
+    
     @staticmethod
     def create_post(club_id, user_id, content):
+        author = UserModel.get_authors_by_ids([user_id]).get(str(user_id), {})
         post = {
             'club_id': ObjectId(club_id),
             'user_id': user_id,
+            'username': author.get('username') or str(user_id),
+            'avatar_url': author.get('avatar_url'),
             'content': content,
             'created_at': datetime.utcnow(),
-            'comments': [],
-            'likes': []
+            'like_count': 0,
+            'comment_count': 0
         }
         return current_app.mongo.db.club_posts.insert_one(post)
 
     @staticmethod
-    def get_posts(club_id):
-        return list(current_app.mongo.db.club_posts.find({'club_id': ObjectId(club_id)}).sort('created_at', -1))
+    def get_feed(club_id, before=None, after=None, limit=None):
+        """Newest-first page of a club's posts; returns (posts, older_cursor, newer_cursor)"""
+        return keyset_page(
+            current_app.mongo.db.club_posts,
+            {'club_id': ObjectId(club_id)},
+            'created_at',
+            limit or ClubPostModel.FEED_PAGE_SIZE,
+            before=before,
+            after=after
+        )
+
+    @staticmethod
+    def get_post(club_id, post_id):
+        return current_app.mongo.db.club_posts.find_one({'_id': ObjectId(post_id), 'club_id': ObjectId(club_id)})
+
+    @staticmethod
+    def delete_post(club_id, post_id):
+        """Delete a post with its likes and comments; returns False if it didn't exist"""
+        post_id = ObjectId(post_id)
+        result = current_app.mongo.db.club_posts.delete_one({'_id': post_id, 'club_id': ObjectId(club_id)})
+        if not result.deleted_count:
+            return False
+        current_app.mongo.db.club_post_likes.delete_many({'post_id': post_id})
+        current_app.mongo.db.club_post_comments.delete_many({'post_id': post_id})
+        return True
+
+    @staticmethod
+    def set_like(post_id, user_id, liked=True):
+        """Like or unlike a post; returns the post's like count afterwards"""
+        post_id, user_id = ObjectId(post_id), str(user_id)
+        if liked:
+            result = current_app.mongo.db.club_post_likes.update_one(
+                {'post_id': post_id, 'user_id': user_id},
+                {'$setOnInsert': {'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+            changed = 1 if result.upserted_id else 0
+        else:
+            changed = -current_app.mongo.db.club_post_likes.delete_one({'post_id': post_id, 'user_id': user_id}).deleted_count
+        if changed:
+            current_app.mongo.db.club_posts.update_one({'_id': post_id}, {'$inc': {'like_count': changed}})
+        post = current_app.mongo.db.club_posts.find_one({'_id': post_id}, {'like_count': 1}) or {}
+        return post.get('like_count', 0)
+
+    @staticmethod
+    def liked_post_ids(user_id, post_ids):
+        """Which of the given posts the user has liked, in one query"""
+        return {
+            like['post_id'] for like in current_app.mongo.db.club_post_likes.find(
+                {'post_id': {'$in': list(post_ids)}, 'user_id': str(user_id)}, {'post_id': 1}
+            )
+        }
+
+    @staticmethod
+    def add_comment(club_id, post_id, user_id, content):
+        author = UserModel.get_authors_by_ids([user_id]).get(str(user_id), {})
+        comment = {
+            'post_id': ObjectId(post_id),
+            'club_id': ObjectId(club_id),
+            'user_id': str(user_id),
+            'username': author.get('username') or str(user_id),
+            'avatar_url': author.get('avatar_url'),
+            'content': content,
+            'created_at': datetime.utcnow()
+        }
+        current_app.mongo.db.club_post_comments.insert_one(comment)
+        current_app.mongo.db.club_posts.update_one({'_id': comment['post_id']}, {'$inc': {'comment_count': 1}})
+        return comment
+
+    @staticmethod
+    def get_comments(post_id, before=None, limit=20):
+        """Newest-first page of a post's comments; returns (comments, older_cursor, newer_cursor)"""
+        return keyset_page(
+            current_app.mongo.db.club_post_comments,
+            {'post_id': ObjectId(post_id)},
+            'created_at',
+            limit,
+            before=before
+        )
 
 class ClubChatMessageModel:
     @staticmethod
@@ -528,27 +1332,165 @@ class ClubChatMessageModel:
         return current_app.mongo.db.club_chat_messages.insert_one(msg)
 
     @staticmethod
-    def get_messages(club_id, limit=50):
-        return list(current_app.mongo.db.club_chat_messages.find({'club_id': ObjectId(club_id)}).sort('timestamp', -1).limit(limit))
+    def save_messages(messages):
+        """Insert a batch of messages that already carry their _id and timestamp"""
+        return current_app.mongo.db.club_chat_messages.insert_many(messages, ordered=False)
+
+    @staticmethod
+    def get_messages(club_id, limit=50, before=None):
+        """Newest-first page of a club's messages; returns (messages, older_cursor, newer_cursor)"""
+        return keyset_page(
+            current_app.mongo.db.club_chat_messages,
+            {'club_id': ObjectId(club_id)},
+            'timestamp',
+            limit,
+            before=before
+        )
 
 class FlashcardModel:
+    """Flashcards scheduled with SM-2: each card keeps an ease factor, an interval in days
+    and `next_review_at`, so the due queue is an indexed range read per user."""
+
+    DEFAULT_EASE = 2.5
+    MIN_EASE = 1.3
+    DUE_BATCH = 20
+    IMPORT_BATCH = 500
+
     @staticmethod
-    def create_flashcard(user_id, front, back, tags=None):
+    def _new_card(user_id, front, back, tags=None, source=None):
+        now = datetime.utcnow()
         card = {
             'user_id': user_id,
             'front': front,
             'back': back,
             'tags': tags or [],
-            'created_at': datetime.utcnow(),
-            'review_count': 0
+            'created_at': now,
+            'review_count': 0,
+            'ease': FlashcardModel.DEFAULT_EASE,
+            'interval': 0,
+            'repetitions': 0,
+            'next_review_at': now  # New cards are due straight away
         }
-        return current_app.mongo.db.flashcards.insert_one(card)
+        if source:
+            card['source'] = source
+        return card
+
+    @staticmethod
+    def create_flashcard(user_id, front, back, tags=None):
+        return current_app.mongo.db.flashcards.insert_one(FlashcardModel._new_card(user_id, front, back, tags))
+
+    @staticmethod
+    def get_user_flashcards(user_id, before=None, limit=50):
+        """Newest-first page of a user's cards; returns (cards, older_cursor, newer_cursor)"""
+        return keyset_page(current_app.mongo.db.flashcards, {'user_id': user_id}, 'created_at', limit, before=before)
 
     @staticmethod
-    def get_user_flashcards(user_id):
-        return list(current_app.mongo.db.flashcards.find({'user_id': user_id}))
+    def get_due(user_id, limit=DUE_BATCH, now=None):
+        """The next cards due for review, most overdue first; returns (cards, has_more)"""
+        cards = list(current_app.mongo.db.flashcards.find(
+            {'user_id': user_id, 'next_review_at': {'$lte': now or datetime.utcnow()}}
+        ).sort('next_review_at', 1).limit(limit + 1))
+        return cards[:limit], len(cards) > limit
+
+    @staticmethod
+    def review(card_id, user_id, quality):
+        """Apply an SM-2 review graded 0-5 in one atomic update; returns the updated card or None"""
+        now = datetime.utcnow()
+        repetitions = {'$ifNull': ['$repetitions', 0]}
+        ease = {'$ifNull': ['$ease', FlashcardModel.DEFAULT_EASE]}
+        if quality >= 3:
+            interval = {'$switch': {
+                'branches': [
+                    {'case': {'$eq': [repetitions, 0]}, 'then': 1},
+                    {'case': {'$eq': [repetitions, 1]}, 'then': 6}
+                ],
+                'default': {'$round': [{'$multiply': [{'$ifNull': ['$interval', 1]}, ease]}, 0]}
+            }}
+            next_repetitions = {'$add': [repetitions, 1]}
+        else:
+            # A lapse starts the card over without touching how far its ease has dropped
+            interval = 1
+            next_repetitions = 0
+        ease_change = 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        return current_app.mongo.db.flashcards.find_one_and_update(
+            {'_id': ObjectId(card_id), 'user_id': user_id},
+            [
+                {'$set': {'interval': interval}},
+                {'$set': {
+                    'repetitions': next_repetitions,
+                    'ease': {'$max': [FlashcardModel.MIN_EASE, {'$add': [ease, ease_change]}]},
+                    'review_count': {'$add': [{'$ifNull': ['$review_count', 0]}, 1]},
+                    'last_quality': quality,
+                    'last_reviewed_at': now,
+                    'next_review_at': {'$add': [now, {'$multiply': ['$interval', 24 * 60 * 60 * 1000]}]}
+                }}
+            ],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def import_from_books(user_id, book_id=None):
+        """Turn a user's book quotes and takeaways into cards, skipping ones already imported.
+
+        Cards are upserted IMPORT_BATCH at a time on (user_id, source.item_id); returns
+        the number of new cards.
+        """
+        query = {'user_id': ObjectId(user_id)}
+        if book_id:
+            query['_id'] = ObjectId(book_id)
+        created = 0
+        operations = []
+
+        def flush():
+            nonlocal created
+            if operations:
+                created += current_app.mongo.db.flashcards.bulk_write(operations, ordered=False).upserted_count
+                operations.clear()
+
+        def add(front, back, item_type, book, item):
+            source = {'type': item_type, 'book_id': book['_id'], 'item_id': item.get('id')}
+            card = FlashcardModel._new_card(str(user_id), front, back, [item_type], source)
+            operations.append(UpdateOne(
+                {'user_id': card['user_id'], 'source.item_id': source['item_id']},
+                {'$setOnInsert': card},
+                upsert=True
+            ))
+            if len(operations) >= FlashcardModel.IMPORT_BATCH:
+                flush()
+
+        books = current_app.mongo.db.books.find(query, {'title': 1, 'author': 1, 'quotes': 1, 'key_takeaways': 1})
+        for book in books:
+            title = book.get('title', 'Untitled')
+            for quote in book.get('quotes', []):
+                if quote.get('id') and quote.get('text'):
+                    page = f", p. {quote['page']}" if quote.get('page') else ''
+                    add(quote['text'], f"{title}{page}", 'quote', book, quote)
+            for takeaway in book.get('key_takeaways', []):
+                if takeaway.get('id') and takeaway.get('text'):
+                    page = f" (p. {takeaway['page_reference']})" if takeaway.get('page_reference') else ''
+                    add(f"Key takeaway from {title}{page}", takeaway['text'], 'takeaway', book, takeaway)
+        flush()
+        return created
 
 class QuizQuestionModel:
+    CACHE_SIZE = 5000  # Questions are never edited, so cached copies don't go stale
+    _cache = {}
+
+    @staticmethod
+    def get_questions_cached(question_ids):
+        """Map of ObjectId to question, fetching the ones not cached in one $in query"""
+        question_ids = {ObjectId(q) for q in question_ids}
+        found = {q: QuizQuestionModel._cache[q] for q in question_ids if q in QuizQuestionModel._cache}
+        missing = question_ids - found.keys()
+        if missing:
+            if len(QuizQuestionModel._cache) + len(missing) > QuizQuestionModel.CACHE_SIZE:
+                QuizQuestionModel._cache.clear()
+            for q in current_app.mongo.db.quiz_questions.find(
+                {'_id': {'$in': list(missing)}}, {'question': 1, 'options': 1, 'answer': 1, 'tags': 1}
+            ):
+                QuizQuestionModel._cache[q['_id']] = found[q['_id']] = q
+        return found
+
     @staticmethod
     def create_question(question, options, answer, creator_id, tags=None):
         q = {
@@ -562,8 +1504,38 @@ class QuizQuestionModel:
         return current_app.mongo.db.quiz_questions.insert_one(q)
 
     @staticmethod
-    def get_daily_questions(limit=5):
-        return list(current_app.mongo.db.quiz_questions.aggregate([{'$sample': {'size': limit}}]))
+    def get_question_ids(tag=None):
+        """Ids of every question, or of those with a tag, in a stable order"""
+        query = {'tags': tag} if tag else {}
+        return [q['_id'] for q in current_app.mongo.db.quiz_questions.find(query, {'_id': 1}).sort('_id', 1)]
+
+    @staticmethod
+    def get_questions_by_ids(question_ids):
+        return list(current_app.mongo.db.quiz_questions.find({'_id': {'$in': list(question_ids)}}))
+
+    @staticmethod
+    def get_daily_set(day, tag=None):
+        return current_app.mongo.db.quiz_daily_sets.find_one({'_id': f"{day}:{tag or ''}"})
+
+    @staticmethod
+    def save_daily_set(day, tag, questions):
+        """Store a day's set unless one exists; returns whichever set is stored"""
+        set_id = f"{day}:{tag or ''}"
+        try:
+            return current_app.mongo.db.quiz_daily_sets.find_one_and_update(
+                {'_id': set_id},
+                {'$setOnInsert': {'day': day, 'tag': tag, 'questions': questions, 'created_at': datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker inserted it first
+            return current_app.mongo.db.quiz_daily_sets.find_one({'_id': set_id})
+
+    @staticmethod
+    def get_daily_set_tags(day):
+        """Tags that have a set for the day, so the next day's can be built ahead"""
+        return [t for t in current_app.mongo.db.quiz_daily_sets.distinct('tag', {'day': day}) if t]
 
 class QuizAnswerModel:
     @staticmethod
@@ -575,11 +1547,301 @@ class QuizAnswerModel:
             'is_correct': is_correct,
             'submitted_at': datetime.utcnow()
         }
-        return current_app.mongo.db.quiz_answers.insert_one(ans)
+        result = current_app.mongo.db.quiz_answers.insert_one(ans)
+        QuizScoreModel.record_many(user_id, [ans])
+        return result
+
+    @staticmethod
+    def submit_answers(user_id, answers):
+        """Insert a finished quiz session's answers and score them, oldest first, in two writes"""
+        answers = sorted(answers, key=lambda a: a['submitted_at'])
+        if not answers:
+            return
+        current_app.mongo.db.quiz_answers.insert_many(answers, ordered=False)
+        QuizScoreModel.record_many(user_id, answers)
+
+    @staticmethod
+    def get_answers_page(user_id, before=None, incorrect_only=False, limit=20):
+        """Newest-first page of a user's answers; returns (answers, older_cursor, newer_cursor)"""
+        query = {'user_id': user_id}
+        if incorrect_only:
+            query['is_correct'] = False
+        return keyset_page(current_app.mongo.db.quiz_answers, query, 'submitted_at', limit, before=before)
+
+class QuizScoreModel:
+    """Running quiz totals in `quiz_scores`, kept in step with every submitted answer.
+
+    Each user has an 'all' document (attempts, correct, current and best streak) and
+    one per UTC day (attempts, correct) under `period`, so leaderboards and analytics
+    read a few indexed documents instead of aggregating `quiz_answers`.
+    """
+
+    ALL_TIME = 'all'
+    REBUILD_INTERVAL = 24 * 60 * 60  # Daily safety net against drift; live updates keep it current
+
+    @staticmethod
+    def day_of(at):
+        return at.strftime('%Y-%m-%d')
+
+    @staticmethod
+    def record_many(user_id, answers):
+        """Count answers, oldest first, in the user's all-time and daily totals with one bulk_write"""
+        user_id, now = str(user_id), datetime.utcnow()
+        operations = []
+        days = {}
+        for ans in answers:
+            hit = 1 if ans['is_correct'] else 0
+            operations.append(UpdateOne({'user_id': user_id, 'period': QuizScoreModel.ALL_TIME}, [
+                {'$set': {
+                    'attempts': {'$add': [{'$ifNull': ['$attempts', 0]}, 1]},
+                    'correct': {'$add': [{'$ifNull': ['$correct', 0]}, hit]},
+                    'current_streak': {'$add': [{'$ifNull': ['$current_streak', 0]}, 1]} if hit else 0,
+                    'updated_at': now
+                }},
+                {'$set': {'best_streak': {'$max': [{'$ifNull': ['$best_streak', 0]}, '$current_streak']}}}
+            ], upsert=True))
+            counts = days.setdefault(QuizScoreModel.day_of(ans['submitted_at']), {'attempts': 0, 'correct': 0})
+            counts['attempts'] += 1
+            counts['correct'] += hit
+        for day, counts in days.items():
+            operations.append(UpdateOne(
+                {'user_id': user_id, 'period': day},
+                {'$inc': counts, '$set': {'updated_at': now}},
+                upsert=True
+            ))
+        if operations:
+            # Ordered, so streaks advance in answer order
+            current_app.mongo.db.quiz_scores.bulk_write(operations)
+
+    @staticmethod
+    def get_scores(user_id, period=ALL_TIME):
+        return current_app.mongo.db.quiz_scores.find_one({'user_id': str(user_id), 'period': period}) or {}
+
+    @staticmethod
+    def leaderboard(period=ALL_TIME, limit=50):
+        """Top scores for all time or a day, read from the (period, correct) index"""
+        return list(current_app.mongo.db.quiz_scores.find(
+            {'period': period}, {'user_id': 1, 'correct': 1, 'attempts': 1}
+        ).sort('correct', -1).limit(limit))
+
+    @staticmethod
+    def rebuild(batch_size=500):
+        """Recompute every user's totals from quiz_answers; returns the number of users scored.
+
+        Walks answers newest first per user on the (user_id, submitted_at) index. A user
+        who answers while the rebuild runs keeps their live totals, since those already
+        include the new answer and the recomputed ones don't.
+        """
+        cutoff = datetime.utcnow()
+        operations = []
+        users = 0
+
+        def flush():
+            try:
+                current_app.mongo.db.quiz_scores.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Duplicates are users updated live after the cutoff, skipped on purpose
+                failed = [err for err in e.details.get('writeErrors', []) if err.get('code') != 11000]
+                if failed:
+                    raise
+            operations.clear()
+
+        def score(user_id, totals, days):
+            unchanged = {'$or': [{'updated_at': {'$lte': cutoff}}, {'updated_at': {'$exists': False}}]}
+            operations.append(UpdateOne(
+                {'user_id': user_id, 'period': QuizScoreModel.ALL_TIME, **unchanged},
+                {'$set': totals},
+                upsert=True
+            ))
+            for day, counts in days.items():
+                operations.append(UpdateOne(
+                    {'user_id': user_id, 'period': day, **unchanged},
+                    {'$set': counts},
+                    upsert=True
+                ))
+            if len(operations) >= batch_size:
+                flush()
+
+        answers = current_app.mongo.db.quiz_answers.find(
+            {'submitted_at': {'$lte': cutoff}},
+            {'user_id': 1, 'is_correct': 1, 'submitted_at': 1}
+        ).sort([('user_id', 1), ('submitted_at', -1)])
+
+        user_id = None
+        for ans in answers:
+            if ans['user_id'] != user_id:
+                if user_id is not None:
+                    score(user_id, totals, days)
+                    users += 1
+                user_id = ans['user_id']
+                totals = {'attempts': 0, 'correct': 0, 'current_streak': 0, 'best_streak': 0,
+                          'updated_at': ans['submitted_at']}
+                days = {}
+                run = 0
+                leading = True
+            hit = 1 if ans['is_correct'] else 0
+            totals['attempts'] += 1
+            totals['correct'] += hit
+            # Newest first: the leading run of correct answers is the current streak
+            run = run + 1 if hit else 0
+            if leading:
+                if hit:
+                    totals['current_streak'] = run
+                else:
+                    leading = False
+            totals['best_streak'] = max(totals['best_streak'], run)
+            day = days.setdefault(QuizScoreModel.day_of(ans['submitted_at']),
+                                  {'attempts': 0, 'correct': 0, 'updated_at': ans['submitted_at']})
+            day['attempts'] += 1
+            day['correct'] += hit
+        if user_id is not None:
+            score(user_id, totals, days)
+            users += 1
+        if operations:
+            flush()
+        return users
+
+class QuizSessionModel:
+    """A quiz in progress in `quiz_sessions`: its questions, an answer slot per question and a deadline.
+
+    Each answer fills its slot and bumps the score in one conditional update, so double
+    submits and late answers are rejected without a read first. Answers reach
+    `quiz_answers` in one batch when the session finishes, or when the expiry job
+    finds it past its deadline.
+    """
+
+    GRACE_SECONDS = 3  # Slack for answers sent just before the deadline
+    EXPIRE_AFTER_SECONDS = 5 * 60  # Unfinished sessions are closed this long after their deadline
+    EXPIRE_INTERVAL = 60
+
+    @staticmethod
+    def start(user_id, question_ids, time_limit, day=None, tag=None):
+        """Start a quiz session. A daily set (`day` given) gets one session per user: starting
+        it again returns the existing session, active or finished, so the set's known
+        questions can't be replayed for a higher score."""
+        now = datetime.utcnow()
+        session = {
+            'user_id': str(user_id),
+            'question_ids': [str(q) for q in question_ids],
+            'answers': {str(q): None for q in question_ids},
+            'score': 0,
+            'status': 'active',
+            'day': day,
+            'tag': tag,
+            'started_at': now,
+            'deadline': now + timedelta(seconds=time_limit)
+        }
+        if not day:
+            current_app.mongo.db.quiz_sessions.insert_one(session)
+            return session
+        session['daily_key'] = f"{user_id}:{day}:{tag or ''}"
+        try:
+            return current_app.mongo.db.quiz_sessions.find_one_and_update(
+                {'daily_key': session['daily_key']},
+                {'$setOnInsert': session},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two starts raced to create it; the other one won
+            return current_app.mongo.db.quiz_sessions.find_one({'daily_key': session['daily_key']})
+
+    @staticmethod
+    def find_active(user_id, session_id=None):
+        query = {'user_id': str(user_id), 'status': 'active'}
+        if session_id:
+            query['_id'] = ObjectId(session_id)
+        return current_app.mongo.db.quiz_sessions.find_one(query, sort=[('started_at', -1)])
+
+    @staticmethod
+    def answer(session_id, user_id, question_id, answer, is_correct):
+        """Fill a question's slot; returns (score, None), or (None, reason) if it was rejected"""
+        now = datetime.utcnow()
+        question_id = str(question_id)
+        session = current_app.mongo.db.quiz_sessions.find_one_and_update(
+            {
+                '_id': ObjectId(session_id),
+                'user_id': str(user_id),
+                'status': 'active',
+                'question_ids': question_id,
+                f'answers.{question_id}': None,
+                'deadline': {'$gte': now - timedelta(seconds=QuizSessionModel.GRACE_SECONDS)}
+            },
+            {
+                '$set': {f'answers.{question_id}': {'answer': answer, 'is_correct': is_correct, 'submitted_at': now}},
+                '$inc': {'score': 1 if is_correct else 0}
+            },
+            projection={'score': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if session:
+            return session['score'], None
+        # Rejected: read once to say why
+        session = current_app.mongo.db.quiz_sessions.find_one({'_id': ObjectId(session_id), 'user_id': str(user_id)})
+        if not session or session['status'] != 'active':
+            return None, 'No quiz in progress'
+        if question_id not in session['question_ids']:
+            return None, 'Question is not part of this quiz'
+        if session['answers'].get(question_id) is not None:
+            return None, 'Question already answered'
+        return None, 'Time is up'
+
+    @staticmethod
+    def finish(user_id, session_id=None):
+        """Close the user's active session and batch its answers into quiz_answers.
+
+        Returns the finished session, or the most recent one if none was active.
+        """
+        query = {'user_id': str(user_id), 'status': 'active'}
+        if session_id:
+            query['_id'] = ObjectId(session_id)
+        now = datetime.utcnow()
+        session = current_app.mongo.db.quiz_sessions.find_one_and_update(
+            query,
+            [{'$set': {
+                'status': 'finished',
+                'finished_at': now,
+                'completed': {'$lte': [now, {'$add': ['$deadline', QuizSessionModel.GRACE_SECONDS * 1000]}]}
+            }}],
+            sort=[('started_at', -1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not session:
+            query.pop('status')
+            return current_app.mongo.db.quiz_sessions.find_one(query, sort=[('started_at', -1)])
+        QuizSessionModel._save_answers(session)
+        return session
+
+    @staticmethod
+    def finish_expired():
+        """Scheduled job: close sessions abandoned past their deadline; safe to run on every worker"""
+        cutoff = datetime.utcnow() - timedelta(seconds=QuizSessionModel.EXPIRE_AFTER_SECONDS)
+        finished = 0
+        while True:
+            # Claiming with find_one_and_update means each session is closed by one worker
+            session = current_app.mongo.db.quiz_sessions.find_one_and_update(
+                {'status': 'active', 'deadline': {'$lt': cutoff}},
+                {'$set': {'status': 'expired', 'finished_at': datetime.utcnow(), 'completed': False}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not session:
+                break
+            QuizSessionModel._save_answers(session)
+            finished += 1
+        if finished:
+            logger.info(f"Closed {finished} expired quiz sessions")
 
     @staticmethod
-    def get_user_answers(user_id):
-        return list(current_app.mongo.db.quiz_answers.find({'user_id': user_id}))
+    def _save_answers(session):
+        answers = [{
+            'user_id': session['user_id'],
+            'question_id': ObjectId(question_id),
+            'answer': slot['answer'],
+            'is_correct': slot['is_correct'],
+            'submitted_at': slot['submitted_at'],
+            'session_id': session['_id']
+        } for question_id, slot in session['answers'].items() if slot]
+        QuizAnswerModel.submit_answers(session['user_id'], answers)
 
 class UserProgressModel:
     @staticmethod
@@ -965,6 +2227,42 @@ class UserModel:
             logger.error(f"Error getting username for user_id {user_id}: {str(e)}")
             return None
     
+    @staticmethod
+    def avatar_url(user):
+        """DiceBear URL for a user document's avatar preferences, or their uploaded avatar"""
+        uploaded = user.get('profile', {}).get('avatar_url')
+        if uploaded:
+            return uploaded
+        avatar = user.get('preferences', {}).get('avatar') or {}
+        params = {'seed': str(user['_id'])}
+        params.update(avatar.get('options', {}))
+        query_string = urllib.parse.urlencode(params, doseq=True)
+        return f"https://api.dicebear.com/9.x/{avatar.get('style', 'avataaars')}/svg?{query_string}"
+    
+    @staticmethod
+    def get_authors_by_ids(user_ids):
+        """Map of user id string to {'username', 'avatar_url'} for denormalizing into content"""
+        ids = [ObjectId(u) for u in set(map(str, user_ids)) if ObjectId.is_valid(u)]
+        if not ids:
+            return {}
+        return {
+            str(user['_id']): {'username': user.get('username'), 'avatar_url': UserModel.avatar_url(user)}
+            for user in current_app.mongo.db.users.find(
+                {'_id': {'$in': ids}}, {'username': 1, 'profile.avatar_url': 1, 'preferences.avatar': 1}
+            )
+        }
+    
+    @staticmethod
+    def get_usernames_by_ids(user_ids):
+        """Map of user id string to username for many users in one query"""
+        ids = [ObjectId(u) for u in set(map(str, user_ids)) if ObjectId.is_valid(u)]
+        if not ids:
+            return {}
+        return {
+            str(user['_id']): user.get('username')
+            for user in current_app.mongo.db.users.find({'_id': {'$in': ids}}, {'username': 1})
+        }
+    
     @staticmethod
     def update_user(user_id, update_data):
         """Update user data"""
@@ -1048,8 +2346,12 @@ class BookModel:
                 'is_encrypted': kwargs.get('is_encrypted', False)
             }
             
+            shared = CatalogModel.attach(book_data)
             result = current_app.mongo.db.books.insert_one(book_data)
             
+            from utils.book_index import book_index
+            book_index.add_book(dict(book_data, **shared))
+            
             ActivityLogger.log_activity(
                 user_id=ObjectId(user_id),
                 action='book_added',
@@ -1072,7 +2374,10 @@ class BookModel:
                 'updated_at': datetime.utcnow()
             }
             
-            if status == 'reading' and not current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)}).get('started_at'):
+            book = current_app.mongo.db.books.find_one(
+                {'_id': ObjectId(book_id)}, {'started_at': 1, 'status': 1, 'catalog_id': 1}
+            ) or {}
+            if status == 'reading' and not book.get('started_at'):
                 update_data['started_at'] = datetime.utcnow()
             elif status == 'finished':
                 update_data['finished_at'] = datetime.utcnow()
@@ -1083,6 +2388,7 @@ class BookModel:
             )
             
             if result.modified_count > 0:
+                CatalogModel.status_changed(book.get('catalog_id'), book.get('status'), status)
                 if status == 'finished':
                     from blueprints.rewards.services import RewardService
                     book = current_app.mongo.db.books.find_one({'_id': ObjectId(book_id)})
@@ -1110,6 +2416,280 @@ class BookModel:
             logger.error(f"Error updating book status: {str(e)}")
             return False
 
+class CatalogModel:
+    """Shared book metadata referenced by per-user library entries through `catalog_id`"""
+    
+    # Metadata that lives only on the catalog entry; per-user entries keep title, authors,
+    # cover and page count for list views, sorting and filtering
+    SHARED_FIELDS = ('google_books_id', 'isbn', 'published_date', 'description')
+    
+    @staticmethod
+    def normalize_isbn(isbn):
+        """Strip separators so ISBN-10/13 values compare equal however they were typed"""
+        return re.sub(r'[^0-9Xx]', '', isbn or '').upper() or None
+    
+    @staticmethod
+    def _metadata(book):
+        """Extract catalog metadata from a per-user book document or form data"""
+        authors = book.get('authors') or []
+        if isinstance(authors, str):
+            authors = [a.strip() for a in authors.split(',') if a.strip()]
+        return {
+            'google_books_id': book.get('google_books_id') or None,
+            'isbn': CatalogModel.normalize_isbn(book.get('isbn')),
+            'title': (book.get('title') or '').strip(),
+            'authors': authors,
+            'title_key': BookIndex.entry_key(book.get('title'), authors),
+            'description': book.get('description') or '',
+            'cover_image': book.get('cover_image') or book.get('cover_url') or '',
+            'page_count': book.get('page_count') or book.get('total_pages') or 0,
+            'genre': book.get('genre') or '',
+            'published_date': book.get('published_date') or ''
+        }
+    
+    @staticmethod
+    def find_or_create(book):
+        """Return the catalog _id matching a book by Google Books ID, ISBN or normalized title+authors"""
+        metadata = CatalogModel._metadata(book)
+        clauses = []
+        if metadata['google_books_id']:
+            clauses.append({'google_books_id': metadata['google_books_id']})
+        if metadata['isbn']:
+            clauses.append({'isbn': metadata['isbn']})
+        clauses.append({'title_key': metadata['title_key']})
+        
+        entry = current_app.mongo.db.catalog.find_one({'$or': clauses})
+        if entry:
+            # Fill in whatever the first contributor of this entry didn't have
+            missing = {field: value for field, value in metadata.items() if value and not entry.get(field)}
+            if missing:
+                current_app.mongo.db.catalog.update_one({'_id': entry['_id']}, {'$set': missing})
+            return entry['_id']
+        
+        catalog_key = CatalogModel._catalog_key(metadata)
+        entry = CatalogModel._new_entry(metadata, catalog_key)
+        try:
+            return current_app.mongo.db.catalog.insert_one(entry).inserted_id
+        except DuplicateKeyError:
+            # Another request created the same entry between our lookup and insert
+            return current_app.mongo.db.catalog.find_one({'catalog_key': catalog_key}, {'_id': 1})['_id']
+    
+    @staticmethod
+    def find_or_create_many(books):
+        """find_or_create for a batch: one $in lookup and one bulk_write of fills and new
+        entries, plus a read of the new entries' ids. Returns the matching catalog entry
+        (with _id and description) for each book, in order."""
+        metadata = [CatalogModel._metadata(book) for book in books]
+        google_ids = {m['google_books_id'] for m in metadata if m['google_books_id']}
+        isbns = {m['isbn'] for m in metadata if m['isbn']}
+        existing = current_app.mongo.db.catalog.find({'$or': [
+            {'google_books_id': {'$in': list(google_ids)}},
+            {'isbn': {'$in': list(isbns)}},
+            {'title_key': {'$in': list({m['title_key'] for m in metadata})}}
+        ]}, {field: 1 for field in metadata[0]} if metadata else None)
+        
+        by_field = {'google_books_id': {}, 'isbn': {}, 'title_key': {}}
+        
+        def index(entry):
+            for field, entries in by_field.items():
+                if entry.get(field):
+                    entries.setdefault(entry[field], entry)
+        
+        for entry in existing:
+            index(entry)
+        
+        resolved = []
+        fills = {}  # Existing entry _id -> fields to fill in
+        created = {}  # catalog_key -> new entry, written with the batch
+        for meta in metadata:
+            entry = next((by_field[field][meta[field]] for field in by_field
+                          if meta[field] and meta[field] in by_field[field]), None)
+            if entry is None:
+                catalog_key = CatalogModel._catalog_key(meta)
+                entry = created.get(catalog_key)
+                if entry is None:
+                    entry = created[catalog_key] = CatalogModel._new_entry(meta, catalog_key)
+            else:
+                # Fill in whatever the first contributor of this entry didn't have
+                missing = {field: value for field, value in meta.items() if value and not entry.get(field)}
+                if missing:
+                    entry.update(missing)
+                    if '_id' in entry:
+                        fills.setdefault(entry['_id'], {}).update(missing)
+            index(entry)
+            resolved.append(entry)
+        
+        operations = [UpdateOne({'_id': entry_id}, {'$set': missing}) for entry_id, missing in fills.items()]
+        # Upserting on catalog_key lets a concurrent writer's entry win instead of failing
+        operations += [
+            UpdateOne({'catalog_key': catalog_key}, {'$setOnInsert': entry}, upsert=True)
+            for catalog_key, entry in created.items()
+        ]
+        if operations:
+            current_app.mongo.db.catalog.bulk_write(operations, ordered=False)
+        if created:
+            for entry in current_app.mongo.db.catalog.find(
+                {'catalog_key': {'$in': list(created)}}, {'catalog_key': 1, 'description': 1}
+            ):
+                created[entry['catalog_key']].update(entry)
+        return resolved
+    
+    @staticmethod
+    def _catalog_key(metadata):
+        if metadata['google_books_id']:
+            return f"gb:{metadata['google_books_id']}"
+        if metadata['isbn']:
+            return f"isbn:{metadata['isbn']}"
+        return f"title:{metadata['title_key']}"
+    
+    @staticmethod
+    def _new_entry(metadata, catalog_key):
+        return dict(
+            metadata,
+            catalog_key=catalog_key,
+            library_count=0,
+            finished_count=0,
+            rating_sum=0,
+            rating_count=0,
+            created_at=datetime.utcnow()
+        )
+    
+    @staticmethod
+    def attach(book_data):
+        """Link a new per-user book to its catalog entry before insert.
+        
+        Sets `catalog_id`, moves shared metadata off the per-user document and counts the
+        new library entry. Returns the shared fields that were removed.
+        """
+        catalog_id = CatalogModel.find_or_create(book_data)
+        book_data['catalog_id'] = catalog_id
+        shared = {field: book_data.pop(field) for field in CatalogModel.SHARED_FIELDS if field in book_data}
+        CatalogModel.adjust_counters(
+            catalog_id,
+            library=1,
+            finished=int(book_data.get('status') == 'finished'),
+            rating_sum=book_data.get('rating') or 0,
+            rating_count=int(bool(book_data.get('rating')))
+        )
+        return shared
+    
+    @staticmethod
+    def adjust_counters(catalog_id, library=0, finished=0, rating_sum=0, rating_count=0):
+        """Apply popularity counter deltas to a catalog entry"""
+        if not catalog_id:
+            return
+        inc = {
+            'library_count': library,
+            'finished_count': finished,
+            'rating_sum': rating_sum,
+            'rating_count': rating_count
+        }
+        inc = {field: delta for field, delta in inc.items() if delta}
+        if inc:
+            current_app.mongo.db.catalog.update_one({'_id': ObjectId(catalog_id)}, {'$inc': inc})
+    
+    @staticmethod
+    def book_removed(book):
+        """Take a deleted per-user book out of its catalog entry's counters"""
+        rating = book.get('rating') or 0
+        CatalogModel.adjust_counters(
+            book.get('catalog_id'),
+            library=-1,
+            finished=-int(book.get('status') == 'finished'),
+            rating_sum=-rating,
+            rating_count=-int(bool(rating))
+        )
+    
+    @staticmethod
+    def remove_books(query):
+        """Delete per-user books matching a query and take them out of the catalog counters"""
+        deltas = current_app.mongo.db.books.aggregate([
+            {'$match': dict(query, catalog_id={'$exists': True})},
+            {'$group': {
+                '_id': '$catalog_id',
+                'library_count': {'$sum': -1},
+                'finished_count': {'$sum': {'$cond': [{'$eq': ['$status', 'finished']}, -1, 0]}},
+                'rating_sum': {'$sum': {'$multiply': [{'$ifNull': ['$rating', 0]}, -1]}},
+                'rating_count': {'$sum': {'$cond': [{'$gt': ['$rating', 0]}, -1, 0]}}
+            }}
+        ])
+        operations = [UpdateOne({'_id': delta.pop('_id')}, {'$inc': delta}) for delta in deltas]
+        result = current_app.mongo.db.books.delete_many(query)
+        if operations:
+            current_app.mongo.db.catalog.bulk_write(operations, ordered=False)
+        return result
+    
+    @staticmethod
+    def status_changed(catalog_id, old_status, new_status):
+        """Keep finished_count in step with a per-user status change"""
+        if old_status == new_status:
+            return
+        if new_status == 'finished':
+            CatalogModel.adjust_counters(catalog_id, finished=1)
+        elif old_status == 'finished':
+            CatalogModel.adjust_counters(catalog_id, finished=-1)
+    
+    @staticmethod
+    def rating_changed(catalog_id, old_rating, new_rating):
+        """Keep the rating aggregate in step with a per-user rating change"""
+        old_rating = old_rating or 0
+        new_rating = new_rating or 0
+        CatalogModel.adjust_counters(
+            catalog_id,
+            rating_sum=new_rating - old_rating,
+            rating_count=int(bool(new_rating)) - int(bool(old_rating))
+        )
+    
+    @staticmethod
+    def with_metadata(book):
+        """Fill a per-user book's missing shared fields from its catalog entry for detail views"""
+        if not book or not book.get('catalog_id'):
+            return book
+        entry = current_app.mongo.db.catalog.find_one({'_id': book['catalog_id']})
+        if entry:
+            for field in CatalogModel.SHARED_FIELDS + ('genre', 'cover_image', 'page_count'):
+                if not book.get(field) and entry.get(field):
+                    book[field] = entry[field]
+        return book
+    
+    @staticmethod
+    def get_popular(limit=20):
+        """Most added catalog entries, read from the library_count index"""
+        entries = current_app.mongo.db.catalog.find(
+            {'library_count': {'$gt': 0}},
+            {'title': 1, 'authors': 1, 'library_count': 1, 'finished_count': 1, 'rating_sum': 1, 'rating_count': 1}
+        ).sort('library_count', -1).limit(limit)
+        popular = []
+        for entry in entries:
+            rating_count = entry.get('rating_count', 0)
+            popular.append({
+                '_id': {'title': entry.get('title'), 'authors': entry.get('authors', [])},
+                'catalog_id': entry['_id'],
+                'user_count': entry.get('library_count', 0),
+                'finished_count': entry.get('finished_count', 0),
+                'avg_rating': entry.get('rating_sum', 0) / rating_count if rating_count else 0
+            })
+        return popular
+    
+    @staticmethod
+    def get_popular_authors(limit=10):
+        """Authors ranked by how many library entries reference their books"""
+        return list(current_app.mongo.db.catalog.aggregate([
+            {'$match': {'library_count': {'$gt': 0}}},
+            {'$unwind': '$authors'},
+            {'$group': {'_id': '$authors', 'count': {'$sum': '$library_count'}}},
+            {'$sort': {'count': -1}},
+            {'$limit': limit}
+        ]))
+    
+    @staticmethod
+    def get_statistics():
+        """Catalog-wide title and author counts"""
+        return {
+            'unique_titles': current_app.mongo.db.catalog.count_documents({'library_count': {'$gt': 0}}),
+            'total_authors': len(current_app.mongo.db.catalog.distinct('authors', {'library_count': {'$gt': 0}}))
+        }
+
 class TaskModel:
     """Task model for productivity tracking"""
     
@@ -1145,23 +2725,65 @@ class TaskModel:
             return None
 
 class ReadingSessionModel:
-    """Reading session model"""
+    """Reading session model.
+    
+    Sessions are stored as one bucket document per user, book and UTC day. Each bucket keeps
+    pre-summed totals (pages_read, duration_minutes, session_count) next to a capped array of
+    the individual events. `date` holds the latest event time, so date-range queries and
+    `$sum: '$pages_read'` aggregations work the same on buckets and on legacy per-event documents.
+    """
+    
+    MAX_EVENTS_PER_BUCKET = 200
+    
+    @staticmethod
+    def _day(date):
+        return datetime(date.year, date.month, date.day)
+    
+    @staticmethod
+    def record(user_id, book_id, pages_read, start_page=None, end_page=None, duration_minutes=0, notes='', date=None):
+        """Add one reading event to the user's bucket for that book and day"""
+        date = date or datetime.utcnow()
+        event = {
+            'date': date,
+            'pages_read': pages_read,
+            'start_page': start_page,
+            'end_page': end_page,
+            'duration_minutes': duration_minutes or 0,
+            'notes': notes or ''
+        }
+        update = {
+            '$inc': {'pages_read': pages_read, 'duration_minutes': duration_minutes or 0, 'session_count': 1},
+            '$max': {'date': date},
+            '$min': {'first_at': date},
+            '$push': {'events': {'$each': [event], '$slice': -ReadingSessionModel.MAX_EVENTS_PER_BUCKET}},
+            '$setOnInsert': {'created_at': datetime.utcnow()}
+        }
+        if start_page is not None:
+            update['$min']['start_page'] = start_page
+        if end_page is not None:
+            update['$max']['end_page'] = end_page
+        return current_app.mongo.db.reading_sessions.update_one(
+            {
+                'user_id': ObjectId(user_id),
+                'book_id': ObjectId(book_id) if book_id else None,
+                'day': ReadingSessionModel._day(date)
+            },
+            update,
+            upsert=True
+        )
     
     @staticmethod
     def create_session(user_id, book_id, pages_read, **kwargs):
         """Create a reading session record"""
         try:
-            session_data = {
-                'user_id': ObjectId(user_id),
-                'book_id': ObjectId(book_id) if book_id else None,
-                'pages_read': pages_read,
-                'duration': kwargs.get('duration', 0),
-                'notes': kwargs.get('notes', ''),
-                'date': kwargs.get('date', datetime.utcnow()),
-                'created_at': datetime.utcnow()
-            }
-            
-            result = current_app.mongo.db.reading_sessions.insert_one(session_data)
+            ReadingSessionModel.record(
+                user_id,
+                book_id,
+                pages_read,
+                duration_minutes=kwargs.get('duration_minutes', kwargs.get('duration', 0)),
+                notes=kwargs.get('notes', ''),
+                date=kwargs.get('date')
+            )
             
             if book_id:
                 current_app.mongo.db.books.update_one(
@@ -1173,36 +2795,83 @@ class ReadingSessionModel:
                 user_id=ObjectId(user_id),
                 action='reading_session',
                 description=f'Read {pages_read} pages',
-                metadata={'session_id': str(result.inserted_id), 'pages': pages_read}
+                metadata={'book_id': str(book_id) if book_id else None, 'pages': pages_read}
             )
             
-            return result.inserted_id
+            return True
             
         except Exception as e:
             logger.error(f"Error creating reading session: {str(e)}")
             return None
+    
+    @staticmethod
+    def get_sessions(user_id, book_id=None, since=None, limit=None):
+        """Return individual sessions, newest first, expanding buckets and passing legacy documents through"""
+        query = {'user_id': ObjectId(user_id)}
+        if book_id:
+            query['book_id'] = ObjectId(book_id)
+        if since:
+            query['date'] = {'$gte': since}
+        cursor = current_app.mongo.db.reading_sessions.find(query).sort('date', -1)
+        
+        sessions = []
+        for doc in cursor:
+            if limit and len(sessions) >= limit:
+                # Documents arrive ordered by their latest event; stop once the next one
+                # can't contain anything newer than the oldest session we would keep
+                sessions.sort(key=lambda s: s['date'], reverse=True)
+                del sessions[limit:]
+                if doc['date'] <= sessions[-1]['date']:
+                    break
+            if 'events' not in doc:
+                sessions.append(doc)
+            else:
+                for event in doc['events']:
+                    if since and event['date'] < since:
+                        continue
+                    sessions.append(dict(event, user_id=doc['user_id'], book_id=doc.get('book_id')))
+        sessions.sort(key=lambda s: s['date'], reverse=True)
+        return sessions[:limit] if limit else sessions
+    
+    @staticmethod
+    def session_count(doc):
+        """Number of sessions a stored document represents (1 for legacy per-event documents)"""
+        return doc.get('session_count', 1)
 
 class ActivityLogger:
     """Activity logging utility"""
     
+    @staticmethod
+    def build_activity(user_id, action, description, metadata=None):
+        """Activity log document, for callers that write many at once"""
+        return {
+            'user_id': ObjectId(user_id),
+            'action': action,
+            'description': description,
+            'metadata': metadata or {},
+            'timestamp': datetime.utcnow(),
+            'ip_address': None,
+            'user_agent': None
+        }
+    
     @staticmethod
     def log_activity(user_id, action, description, metadata=None):
         """Log user activity"""
         try:
-            activity_data = {
-                'user_id': ObjectId(user_id),
-                'action': action,
-                'description': description,
-                'metadata': metadata or {},
-                'timestamp': datetime.utcnow(),
-                'ip_address': None,
-                'user_agent': None
-            }
-            
+            activity_data = ActivityLogger.build_activity(user_id, action, description, metadata)
             current_app.mongo.db.activity_log.insert_one(activity_data)
             
         except Exception as e:
             logger.error(f"Error logging activity: {str(e)}")
+    
+    @staticmethod
+    def log_activities(activities):
+        """Log many activities built with build_activity in one insert"""
+        try:
+            if activities:
+                current_app.mongo.db.activity_log.insert_many(activities, ordered=False)
+        except Exception as e:
+            logger.error(f"Error logging {len(activities)} activities: {str(e)}")
 
 class AdminUtils:
     """Admin utilities for user and data management"""
@@ -1270,14 +2939,24 @@ class AdminUtils:
             
             if reset_type in ['all', 'rewards']:
                 current_app.mongo.db.rewards.delete_many({'user_id': user_id})
+                current_app.mongo.db.reward_summaries.delete_many({'user_id': user_id})
+                current_app.mongo.db.reward_facets.delete_one({'_id': user_id})
                 current_app.mongo.db.user_badges.delete_many({'user_id': user_id})
+                user = current_app.mongo.db.users.find_one({'_id': user_id}, {'total_points': 1}) or {}
+                if user.get('total_points'):
+                    PointsLedgerModel.record(user_id, [{
+                        'amount': -user['total_points'],
+                        'source': 'admin',
+                        'category': 'reset',
+                        'description': 'Points reset by admin'
+                    }])
                 current_app.mongo.db.users.update_one(
                     {'_id': user_id},
-                    {'$set': {'total_points': 0, 'level': 1}}
+                    {'$set': {'level': 1}}
                 )
             
             if reset_type in ['all', 'books']:
-                current_app.mongo.db.books.delete_many({'user_id': user_id})
+                CatalogModel.remove_books({'user_id': user_id})
                 current_app.mongo.db.reading_sessions.delete_many({'user_id': user_id})
             
             if reset_type in ['all', 'tasks']:
@@ -1320,6 +2999,8 @@ class AdminUtils:
     def get_system_statistics():
         """Get system-wide statistics"""
         try:
+            from blueprints.rewards.services import RewardService
+            reward_totals = (RewardService.reward_totals() or [{'total_points': 0, 'count': 0}])[0]
             stats = {
                 'users': {
                     'total': current_app.mongo.db.users.count_documents({}),
@@ -1341,10 +3022,8 @@ class AdminUtils:
                     })
                 },
                 'rewards': {
-                    'total_points': list(current_app.mongo.db.rewards.aggregate([
-                        {'$group': {'_id': None, 'total': {'$sum': '$points'}}}
-                    ]))[0].get('total', 0),
-                    'total_rewards': current_app.mongo.db.rewards.count_documents({}),
+                    'total_points': reward_totals['total_points'],
+                    'total_rewards': reward_totals['count'],
                     'badges_earned': current_app.mongo.db.user_badges.count_documents({})
                 }
             }
@@ -1511,19 +3190,22 @@ class QuoteModel:
             if book.get('total_pages', 0) > 0 and page_number > book['total_pages']:
                 return None, f"Page number {page_number} exceeds book's total pages ({book['total_pages']})"
             
-            existing_quote = current_app.mongo.db.quotes.find_one({
-                'user_id': ObjectId(user_id),
-                'book_id': ObjectId(book_id),
-                'quote_text': quote_text.strip(),
-                'status': {'$in': ['pending', 'verified']}
-            })
+            # Copies of the same catalog book share a work, so matches span users
+            work_id = book.get('catalog_id') or book['_id']
+            fingerprint = text_fingerprint.fingerprint(quote_text)
+            own, others = QuoteModel.find_similar(user_id, work_id, fingerprint)
             
-            if existing_quote:
+            if own and own[0] >= QuoteModel.NEAR_DUPLICATE:
                 return None, "This quote has already been submitted"
             
+            closest = max(own + others, key=lambda match: match[0], default=None)
+            page_match = None
+            if book.get('page_text_status') == 'indexed':
+                page_match = PageTextModel.match(book['_id'], quote_text, page_number)
             quote_data = {
                 'user_id': ObjectId(user_id),
                 'book_id': ObjectId(book_id),
+                'work_id': work_id,
                 'quote_text': quote_text.strip(),
                 'page_number': page_number,
                 'status': 'pending',
@@ -1531,7 +3213,15 @@ class QuoteModel:
                 'verified_at': None,
                 'verified_by': None,
                 'rejection_reason': None,
-                'reward_amount': 10
+                'reward_amount': 10,
+                'similar_quote': {
+                    'quote_id': closest[1]['_id'],
+                    'similarity': round(closest[0], 2),
+                    'status': closest[1]['status'],
+                    'same_user': closest[1]['user_id'] == ObjectId(user_id)
+                } if closest and closest[0] >= QuoteModel.SIMILAR else None,
+                'page_match': page_match,
+                **fingerprint
             }
             
             result = current_app.mongo.db.quotes.insert_one(quote_data)
@@ -1555,61 +3245,186 @@ class QuoteModel:
             logger.error(f"Error submitting quote: {str(e)}")
             return None, str(e)
     
+    NEAR_DUPLICATE = 0.8  # A user's own quotes from the same work this similar count as re-submissions
+    SIMILAR = 0.5  # Closest match at or above this is shown to moderators
+    CANDIDATE_LIMIT = 50  # Other users' bucket matches scored per submission
+
     @staticmethod
-    def get_pending_quotes(page=1, per_page=20):
-        """Get paginated list of pending quotes for admin verification"""
+    def find_similar(user_id, work_id, fingerprint):
+        """Pending and verified quotes from the same work that share an LSH bucket.
+
+        Returns (own, others): (similarity, quote) pairs for the user's own quotes and
+        for other users', closest first. Both lookups use the (work_id, lsh_buckets)
+        index; similarity is estimated from the MinHash signatures, and an identical
+        normalized text scores 1.
+        """
+        query = {
+            'work_id': work_id,
+            'lsh_buckets': {'$in': fingerprint['lsh_buckets']},
+            'status': {'$in': ['pending', 'verified']}
+        }
+        projection = {'user_id': 1, 'status': 1, 'text_hash': 1, 'minhash': 1}
+        own = current_app.mongo.db.quotes.find({**query, 'user_id': ObjectId(user_id)}, projection)
+        others = current_app.mongo.db.quotes.find(
+            {**query, 'user_id': {'$ne': ObjectId(user_id)}}, projection
+        ).limit(QuoteModel.CANDIDATE_LIMIT)
+        
+        def scored(quotes):
+            matches = [(
+                1.0 if q.get('text_hash') == fingerprint['text_hash']
+                else text_fingerprint.similarity(q.get('minhash'), fingerprint['minhash']),
+                q
+            ) for q in quotes]
+            return sorted(matches, key=lambda match: match[0], reverse=True)
+        
+        return scored(own), scored(others)
+
+    CLAIM_MINUTES = 10  # How long a moderator holds claimed quotes before others can take them
+
+    @staticmethod
+    def _claimable(admin_id, now):
+        """Filter for quotes nobody else holds an unexpired claim on"""
+        return {'$or': [
+            {'claimed_by': None},
+            {'claimed_by': ObjectId(admin_id)},
+            {'claim_expires_at': {'$lt': now}}
+        ]}
+
+    @staticmethod
+    def get_pending_quotes(after=None, per_page=20, admin_id=None, available_only=False):
+        """Oldest-first page of the moderation queue; returns (quotes, total_pending, next_cursor).
+
+        The page is matched, sorted and limited on the (status, submitted_at, _id) index
+        before the user and book lookups, which only bring back the fields the queue shows.
+        `available_only` hides quotes another moderator has claimed.
+        """
         try:
-            skip = (page - 1) * per_page
+            query = {'status': 'pending'}
+            position = decode_cursor(after)
+            if position:
+                query['$or'] = [
+                    {'submitted_at': {'$gt': position[0]}},
+                    {'submitted_at': position[0], '_id': {'$gt': position[1]}}
+                ]
+            if available_only and admin_id:
+                query = {'$and': [query, QuoteModel._claimable(admin_id, datetime.utcnow())]}
             
             pipeline = [
-                {'$match': {'status': 'pending'}},
+                {'$match': query},
+                {'$sort': {'submitted_at': 1, '_id': 1}},
+                {'$limit': per_page + 1},
+                {'$project': {'minhash': 0, 'lsh_buckets': 0}},
                 {'$lookup': {
                     'from': 'users',
-                    'localField': 'user_id',
-                    'foreignField': '_id',
+                    'let': {'user_id': '$user_id'},
+                    'pipeline': [
+                        {'$match': {'$expr': {'$eq': ['$_id', '$$user_id']}}},
+                        {'$project': {'username': 1, 'email': 1}}
+                    ],
                     'as': 'user'
                 }},
                 {'$lookup': {
                     'from': 'books',
-                    'localField': 'book_id',
-                    'foreignField': '_id',
+                    'let': {'book_id': '$book_id'},
+                    'pipeline': [
+                        {'$match': {'$expr': {'$eq': ['$_id', '$$book_id']}}},
+                        {'$project': {'title': 1, 'total_pages': 1, 'authors': 1, 'cover_url': 1, 'isbn': 1, 'catalog_id': 1}},
+                        # ISBN lives on the shared catalog entry once a book is attached to one
+                        {'$lookup': {
+                            'from': 'catalog',
+                            'let': {'catalog_id': '$catalog_id'},
+                            'pipeline': [
+                                {'$match': {'$expr': {'$eq': ['$_id', '$$catalog_id']}}},
+                                {'$project': {'isbn': 1}}
+                            ],
+                            'as': 'catalog'
+                        }},
+                        {'$set': {'isbn': {'$ifNull': ['$isbn', {'$arrayElemAt': ['$catalog.isbn', 0]}]}}},
+                        {'$unset': 'catalog'}
+                    ],
                     'as': 'book'
                 }},
                 {'$unwind': '$user'},
-                {'$unwind': '$book'},
-                {'$sort': {'submitted_at': 1}},
-                {'$skip': skip},
-                {'$limit': per_page}
+                {'$unwind': '$book'}
             ]
             
             quotes = list(current_app.mongo.db.quotes.aggregate(pipeline))
+            next_cursor = encode_cursor(quotes[per_page - 1], 'submitted_at') if len(quotes) > per_page else None
             total_pending = current_app.mongo.db.quotes.count_documents({'status': 'pending'})
             
-            return quotes, total_pending
+            return quotes[:per_page], total_pending, next_cursor
             
         except Exception as e:
             logger.error(f"Error getting pending quotes: {str(e)}")
-            return [], 0
+            return [], 0, None
+
+    @staticmethod
+    def claim_quotes(admin_id, limit=10):
+        """Claim the next pending quotes nobody else holds; returns their ids, oldest first"""
+        now = datetime.utcnow()
+        claimed = []
+        for _ in range(limit):
+            quote = current_app.mongo.db.quotes.find_one_and_update(
+                {'$and': [
+                    {'status': 'pending', '_id': {'$nin': claimed}},
+                    # Skip quotes this moderator already holds, so each call takes new work
+                    {'claimed_by': {'$ne': ObjectId(admin_id)}},
+                    QuoteModel._claimable(admin_id, now)
+                ]},
+                {'$set': {
+                    'claimed_by': ObjectId(admin_id),
+                    'claim_expires_at': now + timedelta(minutes=QuoteModel.CLAIM_MINUTES)
+                }},
+                sort=[('submitted_at', 1), ('_id', 1)],
+                projection={'_id': 1}
+            )
+            if not quote:
+                break
+            claimed.append(quote['_id'])
+        return claimed
+
+    @staticmethod
+    def release_claims(admin_id, quote_ids=None):
+        """Give back quotes this moderator claimed (all of them if no ids are given)"""
+        query = {'claimed_by': ObjectId(admin_id), 'status': 'pending'}
+        if quote_ids is not None:
+            query['_id'] = {'$in': [ObjectId(q) for q in quote_ids]}
+        return current_app.mongo.db.quotes.update_many(
+            query, {'$set': {'claimed_by': None, 'claim_expires_at': None}}
+        ).modified_count
     
     @staticmethod
     def verify_quote(quote_id, admin_id, approved=True, rejection_reason=None):
         """Admin function to verify or reject a quote"""
         try:
-            quote = current_app.mongo.db.quotes.find_one({'_id': ObjectId(quote_id)})
-            if not quote:
-                return False, "Quote not found"
-            
-            if quote['status'] != 'pending':
-                return False, "Quote has already been processed"
-            
+            now = datetime.utcnow()
             update_data = {
-                'verified_at': datetime.utcnow(),
-                'verified_by': ObjectId(admin_id)
+                'status': 'verified' if approved else 'rejected',
+                'verified_at': now,
+                'verified_by': ObjectId(admin_id),
+                'claimed_by': None,
+                'claim_expires_at': None
             }
+            if not approved:
+                update_data['rejection_reason'] = rejection_reason or "Quote could not be verified"
+            
+            # Move the quote out of pending first, so two moderators can't both process it
+            quote = current_app.mongo.db.quotes.find_one_and_update(
+                {'$and': [
+                    {'_id': ObjectId(quote_id), 'status': 'pending'},
+                    QuoteModel._claimable(admin_id, now)
+                ]},
+                {'$set': update_data}
+            )
+            if not quote:
+                existing = current_app.mongo.db.quotes.find_one({'_id': ObjectId(quote_id)}, {'status': 1})
+                if not existing:
+                    return False, "Quote not found"
+                if existing['status'] != 'pending':
+                    return False, "Quote has already been processed"
+                return False, "Quote is claimed by another moderator"
             
             if approved:
-                update_data['status'] = 'verified'
-                
                 from blueprints.rewards.services import RewardService
                 
                 RewardService.award_points(
@@ -1644,9 +3459,6 @@ class QuoteModel:
                 )
                 
             else:
-                update_data['status'] = 'rejected'
-                update_data['rejection_reason'] = rejection_reason or "Quote could not be verified"
-                
                 ActivityLogger.log_activity(
                     user_id=quote['user_id'],
                     action='quote_rejected',
@@ -1660,17 +3472,126 @@ class QuoteModel:
                     }
                 )
             
-            result = current_app.mongo.db.quotes.update_one(
-                {'_id': ObjectId(quote_id)},
-                {'$set': update_data}
-            )
-            
-            return result.modified_count > 0, None
+            return True, None
             
         except Exception as e:
             logger.error(f"Error verifying quote: {str(e)}")
             return False, str(e)
     
+    @staticmethod
+    def bulk_verify(quote_ids, admin_id, approved=True, rejection_reason=None):
+        """Verify or reject many quotes with the same outcome as verify_quote, in batches.
+
+        Quotes are read in one query and moved out of pending with one conditional
+        bulk_write, so none can be processed twice. Rewards are aggregated per user, and
+        transactions and activity entries go in with insert_many. Returns a dict of
+        quote id to (success, error).
+        """
+        from blueprints.rewards.services import RewardService
+        
+        now = datetime.utcnow()
+        results = {}
+        ids = []
+        for quote_id in dict.fromkeys(quote_ids):
+            if ObjectId.is_valid(quote_id):
+                ids.append(ObjectId(quote_id))
+            else:
+                results[quote_id] = (False, "Quote not found")
+        
+        quotes = {q['_id']: q for q in current_app.mongo.db.quotes.find({'_id': {'$in': ids}})}
+        candidates = []
+        for quote_id in ids:
+            quote = quotes.get(quote_id)
+            if not quote:
+                results[str(quote_id)] = (False, "Quote not found")
+            elif quote['status'] != 'pending':
+                results[str(quote_id)] = (False, "Quote has already been processed")
+            else:
+                candidates.append(quote)
+        
+        # Tag this batch's transitions so we can tell which conditional updates matched
+        batch_id = ObjectId()
+        update_data = {
+            'status': 'verified' if approved else 'rejected',
+            'verified_at': now,
+            'verified_by': ObjectId(admin_id),
+            'verify_batch': batch_id,
+            'claimed_by': None,
+            'claim_expires_at': None
+        }
+        if not approved:
+            update_data['rejection_reason'] = rejection_reason or "Quote could not be verified"
+        if candidates:
+            current_app.mongo.db.quotes.bulk_write([
+                UpdateOne(
+                    {'$and': [{'_id': q['_id'], 'status': 'pending'}, QuoteModel._claimable(admin_id, now)]},
+                    {'$set': update_data}
+                ) for q in candidates
+            ], ordered=False)
+        moved = {q['_id'] for q in current_app.mongo.db.quotes.find(
+            {'_id': {'$in': [q['_id'] for q in candidates]}, 'verify_batch': batch_id}, {'_id': 1}
+        )} if candidates else set()
+        
+        processed = []
+        for quote in candidates:
+            if quote['_id'] in moved:
+                processed.append(quote)
+                results[str(quote['_id'])] = (True, None)
+            else:
+                # Lost a race with another moderator, or someone else holds the claim
+                results[str(quote['_id'])] = (False, "Quote was processed or claimed by another moderator")
+        
+        activities = []
+        for quote in processed:
+            metadata = {
+                'quote_id': str(quote['_id']),
+                'verified_by': str(admin_id),
+                'book_id': str(quote['book_id']),
+                'page_number': quote['page_number']
+            }
+            if approved:
+                activities.append(ActivityLogger.build_activity(
+                    user_id=quote['user_id'],
+                    action='quote_verified',
+                    description=f'Quote verified and rewarded ₦{quote["reward_amount"]}',
+                    metadata=dict(metadata, reward_amount=quote['reward_amount'])
+                ))
+            else:
+                activities.append(ActivityLogger.build_activity(
+                    user_id=quote['user_id'],
+                    action='quote_rejected',
+                    description=f'Quote rejected: {rejection_reason or "Could not be verified"}',
+                    metadata=dict(metadata, rejection_reason=rejection_reason)
+                ))
+        
+        if approved and processed:
+            by_user = {}
+            for quote in processed:
+                by_user.setdefault(quote['user_id'], []).append(quote)
+            for user_id, user_quotes in by_user.items():
+                try:
+                    RewardService.award_many(user_id, [{
+                        'points': q['reward_amount'],
+                        'source': 'quotes',
+                        'description': f'Quote verified from page {q["page_number"]}',
+                        'category': 'quote_verified',
+                        'reference_id': q['_id'],
+                        'goal_type': 'quote_reflection'
+                    } for q in user_quotes])
+                    RewardService.finish_awards(user_id)
+                except Exception as e:
+                    logger.error(f"Error awarding bulk quote rewards to user {user_id}: {str(e)}")
+            TransactionModel.create_transactions([{
+                'user_id': q['user_id'],
+                'amount': q['reward_amount'],
+                'reward_type': 'quote_verified',
+                'quote_id': q['_id'],
+                'description': f"Quote verification reward - Page {q['page_number']}"
+            } for q in processed])
+        ActivityLogger.log_activities(activities)
+        
+        return results
+    
     @staticmethod
     def get_user_quotes(user_id, status=None, page=1, per_page=20):
         """Get user's quotes with optional status filter"""
@@ -1692,7 +3613,8 @@ class QuoteModel:
                 {'$unwind': '$book'},
                 {'$sort': {'submitted_at': -1}},
                 {'$skip': skip},
-                {'$limit': per_page}
+                {'$limit': per_page},
+                {'$project': {'minhash': 0, 'lsh_buckets': 0}}
             ]
             
             quotes = list(current_app.mongo.db.quotes.aggregate(pipeline))
@@ -1743,6 +3665,300 @@ class QuoteModel:
             logger.error(f"Error getting quote statistics: {str(e)}")
             return {}
 
+class PageTextModel:
+    """Text extracted from uploaded PDFs, one `book_page_texts` document per page.
+
+    The text is stored Fernet-encrypted like the PDF itself. Each page also keeps the
+    hashes of its word trigrams, so quotes are located by set overlap without
+    decrypting anything. Books move through `page_text_status` pending -> processing
+    -> indexed (or failed) as PageTextService works through them.
+    """
+
+    NEAR_PAGES = 2  # Printed page numbers often sit a little off the PDF's own
+    CONFIDENT = 0.9  # Share of a quote's trigrams found to pre-mark it for approval
+    STALE_MINUTES = 15  # A claim this old is assumed to belong to a dead worker
+    INSERT_BATCH = 500
+
+    @staticmethod
+    def claim_book():
+        """Atomically take the next book waiting for indexing, or None"""
+        now = datetime.utcnow()
+        return current_app.mongo.db.books.find_one_and_update(
+            {'pdf_path': {'$ne': None}, '$or': [
+                {'page_text_status': 'pending'},
+                {'page_text_status': 'processing',
+                 'page_text_claimed_at': {'$lt': now - timedelta(minutes=PageTextModel.STALE_MINUTES)}}
+            ]},
+            {'$set': {'page_text_status': 'processing', 'page_text_claimed_at': now}},
+            projection={'pdf_path': 1, 'title': 1}
+        )
+
+    @staticmethod
+    def finish_book(book_id, status, page_count=0):
+        # A new upload while indexing puts the book back to pending; leave that alone
+        current_app.mongo.db.books.update_one(
+            {'_id': ObjectId(book_id), 'page_text_status': 'processing'},
+            {'$set': {'page_text_status': status, 'page_text_pages': page_count},
+             '$unset': {'page_text_claimed_at': ''}}
+        )
+
+    @staticmethod
+    def save_pages(book_id, pages):
+        """Replace a book's pages with `pages`, a list of (encrypted_text, grams) in page order"""
+        book_id = ObjectId(book_id)
+        current_app.mongo.db.book_page_texts.delete_many({'book_id': book_id})
+        docs = [
+            {'book_id': book_id, 'page': number, 'text': text, 'grams': grams}
+            for number, (text, grams) in enumerate(pages, start=1)
+        ]
+        for i in range(0, len(docs), PageTextModel.INSERT_BATCH):
+            current_app.mongo.db.book_page_texts.insert_many(docs[i:i + PageTextModel.INSERT_BATCH], ordered=False)
+
+    @staticmethod
+    def get_page(book_id, page):
+        return current_app.mongo.db.book_page_texts.find_one(
+            {'book_id': ObjectId(book_id), 'page': page}, {'text': 1}
+        )
+
+    @staticmethod
+    def match(book_id, quote_text, page_number):
+        """Where a quote sits near its claimed page, as {'page', 'score', 'confident'}, or None.
+
+        The score is the share of the quote's trigrams found on a page together with the
+        one after it, since quotes can run over a page break; ties go to the page
+        closest to the claimed one.
+        """
+        grams = set(text_fingerprint.word_grams(quote_text))
+        if not grams or not page_number:
+            return None
+        pages = {
+            p['page']: set(p['grams']) for p in current_app.mongo.db.book_page_texts.find(
+                {'book_id': ObjectId(book_id), 'page': {
+                    '$gte': page_number - PageTextModel.NEAR_PAGES,
+                    '$lte': page_number + PageTextModel.NEAR_PAGES
+                }},
+                {'page': 1, 'grams': 1}
+            )
+        }
+        best = None
+        for page, page_grams in pages.items():
+            score = len(grams & (page_grams | pages.get(page + 1, set()))) / len(grams)
+            if best is None or (score, -abs(page - page_number)) > (best[1], -abs(best[0] - page_number)):
+                best = (page, score)
+        if best is None:
+            return None
+        return {'page': best[0], 'score': round(best[1], 2), 'confident': best[1] >= PageTextModel.CONFIDENT}
+
+    @staticmethod
+    def match_pending_quotes(book_id):
+        """Match a freshly indexed book's quotes that are still waiting for moderation"""
+        operations = [
+            UpdateOne({'_id': q['_id']}, {'$set': {
+                'page_match': PageTextModel.match(book_id, q['quote_text'], q['page_number'])
+            }})
+            for q in current_app.mongo.db.quotes.find(
+                {'book_id': ObjectId(book_id), 'status': 'pending'}, {'quote_text': 1, 'page_number': 1}
+            )
+        ]
+        if operations:
+            current_app.mongo.db.quotes.bulk_write(operations, ordered=False)
+        return len(operations)
+
+class PointsLedgerModel:
+    """Append-only log of every change to a user's points, with the balance after each entry.
+
+    The users document sequences the log: one update moves `total_points` and
+    `ledger_seq` together, and the entries take the seqs and running balances that
+    update implies, so the current balance is always `total_points` and each entry
+    shows the balance it left behind. `points_snapshots` checkpoints each user's
+    balance daily so reconciliation only re-adds the entries since.
+    """
+
+    SNAPSHOT_INTERVAL = 60 * 60
+    RECONCILE_INTERVAL = 24 * 60 * 60
+    REPORT_LIMIT = 200  # Drifted users kept in each reconciliation report
+
+    @staticmethod
+    def opening_entry(user_id, balance):
+        """Upsert of the seq 0 entry carrying the points a user had before the ledger"""
+        return UpdateOne(
+            {'user_id': user_id, 'seq': 0},
+            {'$setOnInsert': {
+                'amount': balance,
+                'balance': balance,
+                'source': 'system',
+                'category': 'opening_balance',
+                'description': 'Balance before the points ledger',
+                'reference_id': None,
+                'date': datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    @staticmethod
+    def record(user_id, entries, session=None):
+        """Apply entries (dicts of amount, source, category, description, reference_id) to a
+        user's points and append them to the ledger; returns the new balance, or None
+        if the user doesn't exist"""
+        if not entries:
+            return None
+        user_id = ObjectId(user_id)
+        amount = sum(entry['amount'] for entry in entries)
+        user = current_app.mongo.db.users.find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {'total_points': amount, 'ledger_seq': len(entries)}},
+            projection={'total_points': 1, 'ledger_seq': 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if not user:
+            return None
+        
+        seq = user['ledger_seq'] - len(entries)
+        balance = user['total_points'] - amount
+        operations = []
+        # First entry for a user the migration hasn't reached: open with what they had
+        if seq == 0 and balance:
+            operations.append(PointsLedgerModel.opening_entry(user_id, balance))
+        now = datetime.utcnow()
+        for entry in entries:
+            seq += 1
+            balance += entry['amount']
+            operations.append(InsertOne({
+                'user_id': user_id,
+                'seq': seq,
+                'amount': entry['amount'],
+                'balance': balance,
+                'source': entry.get('source'),
+                'category': entry.get('category', 'general'),
+                'description': entry.get('description'),
+                'reference_id': entry.get('reference_id'),
+                'date': now
+            }))
+        current_app.mongo.db.points_ledger.bulk_write(operations, session=session)
+        return user['total_points']
+
+    @staticmethod
+    def snapshot_balances():
+        """Scheduled job: checkpoint yesterday's and today's closing balance for every user with entries"""
+        try:
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            taken = 0
+            for start in (today - timedelta(days=1), today):
+                closing = current_app.mongo.db.points_ledger.aggregate([
+                    {'$match': {'date': {'$gte': start, '$lt': start + timedelta(days=1)}}},
+                    {'$sort': {'user_id': 1, 'seq': 1}},
+                    {'$group': {'_id': '$user_id', 'balance': {'$last': '$balance'}, 'seq': {'$last': '$seq'}}}
+                ], allowDiskUse=True)
+                operations = [
+                    UpdateOne(
+                        {'user_id': c['_id'], 'day': start},
+                        {'$set': {'balance': c['balance'], 'seq': c['seq'], 'taken_at': datetime.utcnow()}},
+                        upsert=True
+                    )
+                    for c in closing
+                ]
+                if operations:
+                    current_app.mongo.db.points_snapshots.bulk_write(operations, ordered=False)
+                taken += len(operations)
+            return taken
+        except Exception as e:
+            logger.error(f"Error taking points snapshots: {str(e)}")
+            return 0
+
+    @staticmethod
+    def reconcile(batch_size=500):
+        """Scheduled job: stream users in batches and report where the ledger, total_points,
+        rewards and quote transactions disagree; returns the stored report"""
+        db = current_app.mongo.db
+        report = {'run_at': datetime.utcnow(), 'users_checked': 0, 'drifted_count': 0, 'drifted': []}
+        last_id = None
+        try:
+            while True:
+                users = list(db.users.find(
+                    {'_id': {'$gt': last_id}} if last_id else {}, {'total_points': 1, 'ledger_seq': 1}
+                ).sort('_id', 1).limit(batch_size))
+                if not users:
+                    break
+                last_id = users[-1]['_id']
+                ids = [u['_id'] for u in users]
+                
+                snapshots = {s['_id']: s for s in db.points_snapshots.aggregate([
+                    {'$match': {'user_id': {'$in': ids}}},
+                    {'$sort': {'user_id': 1, 'day': -1}},
+                    {'$group': {'_id': '$user_id', 'balance': {'$first': '$balance'}, 'seq': {'$first': '$seq'}}}
+                ])}
+                # Only entries after each user's last snapshot are re-added
+                since = {e['_id']: e for e in db.points_ledger.aggregate([
+                    {'$match': {'$or': [
+                        {'user_id': u, 'seq': {'$gt': snapshots[u]['seq'] if u in snapshots else -1}} for u in ids
+                    ]}},
+                    {'$sort': {'user_id': 1, 'seq': 1}},
+                    {'$group': {
+                        '_id': '$user_id',
+                        'amount': {'$sum': '$amount'},
+                        'balance': {'$last': '$balance'},
+                        'seq': {'$last': '$seq'}
+                    }}
+                ])}
+                rewards = {r['_id']: r['total'] for r in db.rewards.aggregate([
+                    {'$match': {'user_id': {'$in': ids}}},
+                    {'$project': {'user_id': 1, 'points': 1}},
+                    {'$unionWith': {'coll': 'reward_summaries', 'pipeline': [
+                        {'$match': {'user_id': {'$in': ids}}},
+                        {'$project': {'user_id': 1, 'points': 1}}
+                    ]}},
+                    {'$group': {'_id': '$user_id', 'total': {'$sum': '$points'}}}
+                ])}
+                quote_transactions = {t['_id']: t['count'] for t in db.transactions.aggregate([
+                    {'$match': {'user_id': {'$in': ids}, 'reward_type': 'quote_verified', 'status': 'completed'}},
+                    {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}}
+                ])}
+                quote_entries = {e['_id']: e['count'] for e in db.points_ledger.aggregate([
+                    {'$match': {'user_id': {'$in': ids}, 'category': 'quote_verified'}},
+                    {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}}
+                ])}
+                
+                for user in users:
+                    user_id = user['_id']
+                    snapshot = snapshots.get(user_id, {'balance': 0, 'seq': 0})
+                    latest = since.get(user_id, {'amount': 0, 'balance': snapshot['balance'], 'seq': snapshot['seq']})
+                    issues = []
+                    if latest['seq'] != user.get('ledger_seq', 0):
+                        issues.append('missing_entries')
+                    if snapshot['balance'] + latest['amount'] != latest['balance']:
+                        issues.append('broken_chain')
+                    if user.get('total_points', 0) != latest['balance']:
+                        issues.append('total_points')
+                    if rewards.get(user_id, 0) != latest['balance']:
+                        issues.append('rewards')
+                    if quote_transactions.get(user_id, 0) != quote_entries.get(user_id, 0):
+                        issues.append('transactions')
+                    if issues:
+                        report['drifted_count'] += 1
+                        if len(report['drifted']) < PointsLedgerModel.REPORT_LIMIT:
+                            report['drifted'].append({
+                                'user_id': user_id,
+                                'issues': issues,
+                                'ledger_balance': latest['balance'],
+                                'ledger_seq': latest['seq'],
+                                'total_points': user.get('total_points', 0),
+                                'rewards_total': rewards.get(user_id, 0),
+                                'quote_transactions': quote_transactions.get(user_id, 0),
+                                'quote_entries': quote_entries.get(user_id, 0)
+                            })
+                report['users_checked'] += len(users)
+            
+            db.points_reconciliations.insert_one(report)
+            if report['drifted_count']:
+                logger.warning(f"Points reconciliation: {report['drifted_count']} of {report['users_checked']} users drifted")
+            else:
+                logger.info(f"Points reconciliation: {report['users_checked']} users in balance")
+            return report
+        except Exception as e:
+            logger.error(f"Error reconciling points: {str(e)}")
+            return None
+
 class TransactionModel:
     """Transaction model for tracking all financial transactions"""
     
@@ -1780,6 +3996,38 @@ class TransactionModel:
             logger.error(f"Error creating transaction: {str(e)}")
             return None
     
+    @staticmethod
+    def create_transactions(transactions, status='completed'):
+        """Insert many transactions (dicts of create_transaction arguments) and their
+        activity entries in two writes; returns the inserted ids in order"""
+        if not transactions:
+            return []
+        now = datetime.utcnow()
+        docs = [{
+            'user_id': ObjectId(t['user_id']),
+            'amount': t['amount'],
+            'reward_type': t['reward_type'],
+            'quote_id': ObjectId(t['quote_id']) if t.get('quote_id') else None,
+            'description': t['description'],
+            'timestamp': now,
+            'status': t.get('status', status)
+        } for t in transactions]
+        inserted_ids = current_app.mongo.db.transactions.insert_many(docs).inserted_ids
+        ActivityLogger.log_activities([
+            ActivityLogger.build_activity(
+                user_id=doc['user_id'],
+                action='transaction_created',
+                description=f"Transaction: {doc['description']}",
+                metadata={
+                    'transaction_id': str(transaction_id),
+                    'amount': doc['amount'],
+                    'reward_type': doc['reward_type'],
+                    'quote_id': str(doc['quote_id']) if doc['quote_id'] else None
+                }
+            ) for doc, transaction_id in zip(docs, inserted_ids)
+        ])
+        return inserted_ids
+    
     @staticmethod
     def get_user_transactions(user_id, page=1, per_page=20):
         """Get user's transaction history"""
@@ -1,36 +1,71 @@
 from flask import Flask, session, request
-from flask_socketio import SocketIO, join_room, leave_room, emit
+from flask_socketio import join_room, leave_room, emit
 from flask_login import current_user
-from models import ClubChatMessageModel
+from bson import ObjectId
+from blueprints.nooks_club.chat import get_history, post_message, serialize_message
+from blueprints.nooks_club.presence import presence_tracker
+from models import ClubMembershipModel
 import os
 
+# Single entry point for HTTP and WebSockets:
+#   gunicorn --worker-class geventwebsocket.gunicorn.workers.GeventWebSocketWorker --workers 1 socketio_server:app
+# Socket.IO needs sticky sessions, so scale with more single-worker processes behind the
+# load balancer and set SOCKETIO_MESSAGE_QUEUE so emits reach clients on every process.
 from app import app  # Use the main app instance
-
-socketio = SocketIO(app, cors_allowed_origins="*")
+from utils.realtime import socketio  # Bound to the app in create_app
 
 @socketio.on('join_club')
 def handle_join_club(data):
+    if not isinstance(data, dict):
+        return
     club_id = data.get('club_id')
-    user_id = str(current_user.id) if hasattr(current_user, 'id') else None
+    # Only signed-in members may listen to a club's room or read its backlog
+    if not current_user.is_authenticated or not club_id or not ObjectId.is_valid(club_id):
+        return
+    user_id = str(current_user.id)
+    if not ClubMembershipModel.is_member(club_id, user_id):
+        return
     join_room(club_id)
-    emit('status', {'msg': f'User {user_id} has joined the club.'}, room=club_id)
+    # Backlog for the joining socket comes from the in-memory ring buffer
+    messages, older_cursor = get_history(club_id)
+    emit('chat_backlog', {'messages': [serialize_message(m) for m in messages], 'older_cursor': older_cursor})
+    # Others hear about the join in the room's next batched presence_diff
+    presence_tracker.join(request.sid, club_id, user_id, current_user.username)
+    emit('presence_snapshot', {'club_id': club_id, 'online': presence_tracker.members(club_id)})
 
 @socketio.on('leave_club')
 def handle_leave_club(data):
-    club_id = data.get('club_id')
-    user_id = str(current_user.id) if hasattr(current_user, 'id') else None
+    if not isinstance(data, dict) or not isinstance(data.get('club_id'), str):
+        return
+    club_id = data['club_id']
     leave_room(club_id)
-    emit('status', {'msg': f'User {user_id} has left the club.'}, room=club_id)
+    presence_tracker.leave(request.sid, club_id)
+
+@socketio.on('presence_heartbeat')
+def handle_presence_heartbeat(data=None):
+    presence_tracker.heartbeat(request.sid)
+
+@socketio.on('typing')
+def handle_typing(data):
+    # Clients send whatever they like; ignore anything but an object naming a club
+    if not isinstance(data, dict) or not isinstance(data.get('club_id'), str):
+        return
+    presence_tracker.typing(request.sid, data['club_id'], data.get('typing', True))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    presence_tracker.disconnect(request.sid)
 
 @socketio.on('send_message')
 def handle_send_message(data):
+    if not isinstance(data, dict):
+        return
     club_id = data.get('club_id')
     message = data.get('message')
-    user_id = str(current_user.id) if hasattr(current_user, 'id') else None
-    # Save to DB
-    if club_id and user_id and message:
-        ClubChatMessageModel.send_message(club_id, user_id, message)
-        emit('receive_message', {'user_id': user_id, 'message': message}, room=club_id)
+    user_id = str(current_user.id) if current_user.is_authenticated else None
+    # post_message broadcasts chat_message to the room; the write is batched
+    if club_id and user_id and message and ObjectId.is_valid(club_id) and ClubMembershipModel.is_member(club_id, user_id):
+        post_message(club_id, user_id, current_user.username, message)
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
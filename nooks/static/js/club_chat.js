@@ -7,12 +7,25 @@ const chatForm = document.getElementById('chat-form');
 
 if (clubId) {
   socket.emit('join_club', { club_id: clubId });
+  // Keeps this socket in the club's presence list
+  setInterval(() => socket.emit('presence_heartbeat'), 25000);
 
-  socket.on('receive_message', function(data) {
+  function appendMessage(name, message) {
     const msgDiv = document.createElement('div');
     msgDiv.className = 'chat-message';
-    msgDiv.innerText = data.user_id + ': ' + data.message;
+    msgDiv.innerText = name + ': ' + message;
     chatBox.appendChild(msgDiv);
+  }
+
+  // Recent messages sent by the server when this socket joins the club
+  socket.on('chat_backlog', function(data) {
+    chatBox.innerHTML = '';
+    data.messages.forEach(msg => appendMessage(msg.username, msg.message));
+    chatBox.scrollTop = chatBox.scrollHeight;
+  });
+
+  socket.on('chat_message', function(data) {
+    appendMessage(data.username, data.message);
     chatBox.scrollTop = chatBox.scrollHeight;
   });
 
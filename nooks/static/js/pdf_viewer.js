@@ -10,6 +10,10 @@ let scale = 1.2;
 let canvas = null;
 let ctx = null;
 let bookId = null;
+// Page turns are debounced and sent in batches; the server coalesces them into sessions
+const PROGRESS_DEBOUNCE_MS = 3000;
+let pendingProgress = {};
+let progressTimer = null;
 
 function renderPage(num) {
     pageRendering = true;
@@ -67,14 +71,30 @@ function onNextPage() {
 }
 
 function updateReadingProgress(page) {
-    // Send AJAX request to backend to update current page
-    fetch(`/nook/update_progress_ajax/${bookId}`, {
+    // Remember the latest page and send it once the reader pauses
+    pendingProgress[bookId] = page;
+    clearTimeout(progressTimer);
+    progressTimer = setTimeout(flushReadingProgress, PROGRESS_DEBOUNCE_MS);
+}
+
+function flushReadingProgress() {
+    clearTimeout(progressTimer);
+    const updates = Object.keys(pendingProgress).map(function(id) {
+        return { book_id: id, page: pendingProgress[id] };
+    });
+    if (updates.length === 0) {
+        return;
+    }
+    pendingProgress = {};
+    // keepalive lets the request finish while the page is being hidden or unloaded
+    fetch('/nook/progress/batch', {
         method: 'POST',
+        keepalive: true,
         headers: {
             'Content-Type': 'application/json',
             'X-CSRFToken': window.csrf_token || ''
         },
-        body: JSON.stringify({ current_page: page })
+        body: JSON.stringify({ updates: updates })
     });
 }
 
@@ -102,4 +122,10 @@ function setupPdfViewer(pdfUrl, book_id) {
     document.getElementById('prev').addEventListener('click', onPrevPage);
     document.getElementById('next').addEventListener('click', onNextPage);
     canvas.addEventListener('mouseup', extractSelectedText);
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flushReadingProgress();
+        }
+    });
+    window.addEventListener('pagehide', flushReadingProgress);
 }
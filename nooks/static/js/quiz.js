@@ -4,18 +4,33 @@ let quizIndex = 0;
 let quizScore = 0;
 let quizStartTime = null;
 let quizTimer = null;
+let quizSessionId = null;
 const QUIZ_TIME_LIMIT = 60; // seconds
 
-function startQuiz() {
-  fetch('/nooks_club/api/quiz/start', { method: 'POST' })
+// Everyone gets the same questions each day; a tag picks that tag's daily set
+function startQuiz(tag) {
+  fetch('/nooks_club/api/quiz/start', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ tag: tag || null })
+  })
     .then(res => res.json())
     .then(data => {
+      if (data.error) {
+        // Each daily set is scored once; a finished one can't be restarted
+        document.getElementById('quiz-question').innerText = data.score !== undefined
+          ? `${data.error} (score: ${data.score})` : data.error;
+        document.getElementById('quiz-options').innerHTML = '';
+        return;
+      }
+      // Starting again resumes the day's session with its remaining questions and time
+      quizSessionId = data.session_id;
       quizQuestions = data.questions;
       quizIndex = 0;
-      quizScore = 0;
+      quizScore = data.score || 0;
       quizStartTime = Date.now();
       showQuestion();
-      startTimer();
+      startTimer(Math.ceil(data.time_remaining ?? QUIZ_TIME_LIMIT));
     });
 }
 
@@ -41,18 +56,18 @@ function submitAnswer(questionId, answer) {
   fetch('/nooks_club/api/quiz/answer', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ question_id: questionId, answer })
+    body: JSON.stringify({ session_id: quizSessionId, question_id: questionId, answer })
   })
     .then(res => res.json())
     .then(data => {
-      if (data.is_correct) quizScore++;
+      if (data.score !== undefined) quizScore = data.score;
       quizIndex++;
       showQuestion();
     });
 }
 
-function startTimer() {
-  let timeLeft = QUIZ_TIME_LIMIT;
+function startTimer(seconds) {
+  let timeLeft = seconds ?? QUIZ_TIME_LIMIT;
   quizTimer = setInterval(() => {
     timeLeft--;
     document.getElementById('quiz-timer').innerText = 'Time left: ' + timeLeft + 's';
@@ -65,7 +80,11 @@ function startTimer() {
 
 function finishQuiz() {
   clearInterval(quizTimer);
-  fetch('/nooks_club/api/quiz/finish', { method: 'POST' })
+  fetch('/nooks_club/api/quiz/finish', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ session_id: quizSessionId })
+  })
     .then(res => res.json())
     .then(data => {
       document.getElementById('quiz-question').innerText = 'Quiz Complete!';
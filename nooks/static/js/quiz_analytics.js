@@ -8,7 +8,8 @@ function loadQuizAnalytics() {
           <b>Total Attempts:</b> ${data.total_attempts}<br>
           <b>Correct Answers:</b> ${data.correct}<br>
           <b>Accuracy:</b> ${data.accuracy.toFixed(1)}%<br>
-          <b>Current Correct Streak:</b> ${data.current_streak}
+          <b>Current Correct Streak:</b> ${data.current_streak}<br>
+          <b>Best Streak:</b> ${data.best_streak}
         </div>`;
     });
 }
@@ -1,21 +1,42 @@
 // Quiz Question Review Frontend
-function loadQuizReview() {
-  fetch('/nooks_club/api/quiz/review')
+let quizReviewCursor = null;
+let quizReviewCount = 0;
+
+// Pass incorrectOnly for revision mode; pass more to append the next older page
+function loadQuizReview(incorrectOnly, more) {
+  const params = new URLSearchParams();
+  if (incorrectOnly) params.set('incorrect_only', '1');
+  if (more && quizReviewCursor) params.set('before', quizReviewCursor);
+  fetch('/nooks_club/api/quiz/review?' + params.toString())
     .then(res => res.json())
     .then(data => {
       const review = data.review;
       const reviewDiv = document.getElementById('quiz-review');
-      reviewDiv.innerHTML = '';
-      review.forEach((item, i) => {
+      if (!more) {
+        reviewDiv.innerHTML = '';
+        quizReviewCount = 0;
+      }
+      document.getElementById('quiz-review-more')?.remove();
+      review.forEach(item => {
+        quizReviewCount++;
         const card = document.createElement('div');
         card.className = 'card mb-2';
         card.innerHTML = `<div class='card-body'>
-          <strong>Q${i+1}:</strong> ${item.question}<br>
+          <strong>Q${quizReviewCount}:</strong> ${item.question}<br>
           <span>Your answer: <b>${item.your_answer}</b> ${item.is_correct ? '✅' : '❌'}</span><br>
           <span>Correct answer: <b>${item.correct_answer}</b></span><br>
           <small class='text-muted'>Answered at: ${new Date(item.answered_at).toLocaleString()}</small>
         </div>`;
         reviewDiv.appendChild(card);
       });
+      quizReviewCursor = data.older_cursor;
+      if (quizReviewCursor) {
+        const button = document.createElement('button');
+        button.id = 'quiz-review-more';
+        button.className = 'btn btn-outline-secondary btn-sm';
+        button.innerText = 'Load more';
+        button.onclick = () => loadQuizReview(incorrectOnly, true);
+        reviewDiv.after(button);
+      }
     });
 }
@@ -1,4 +1,8 @@
 // Timer functionality for Hook
+// The server pushes `timer_state` over Socket.IO on start/pause/resume/complete/cancel;
+// the countdown is computed locally from `end_time`. Polling is only a fallback.
+
+const TIMER_POLL_FALLBACK_MS = 30000;
 
 class Timer {
     constructor() {
@@ -10,10 +14,99 @@ class Timer {
         this.taskName = '';
         this.timerType = 'work';
         this.category = 'general';
+        this.endTime = null;      // Server-clock epoch ms when the running timer ends
+        this.clockOffset = 0;     // Server clock minus local clock, in ms
+        this.socket = null;
+        this.pollInterval = null;
         
         this.initializeElements();
         this.bindEvents();
         this.checkActiveTimer();
+        this.connectSocket();
+    }
+    
+    connectSocket() {
+        if (typeof io === 'undefined') {
+            this.startPolling();
+            return;
+        }
+        this.socket = io();
+        this.socket.on('connect', () => {
+            this.stopPolling();
+            this.socket.emit('timer_sync');
+        });
+        this.socket.on('disconnect', () => this.startPolling());
+        this.socket.on('connect_error', () => this.startPolling());
+        this.socket.on('timer_state', (state) => this.applyState(state));
+    }
+    
+    startPolling() {
+        if (!this.pollInterval) {
+            this.pollInterval = setInterval(() => this.checkActiveTimer(), TIMER_POLL_FALLBACK_MS);
+        }
+    }
+    
+    stopPolling() {
+        clearInterval(this.pollInterval);
+        this.pollInterval = null;
+    }
+    
+    serverNow() {
+        return Date.now() + this.clockOffset;
+    }
+    
+    applyState(state) {
+        // Bring this tab in line with the server; also used for changes made in other tabs/devices
+        if (state.server_time) {
+            this.clockOffset = Date.parse(state.server_time) - Date.now();
+        }
+        if (!state.active) {
+            if (this.isRunning) {
+                this.stopLocal();
+            }
+            if (state.event === 'auto_complete') {
+                showToast('Your expired timer was saved as a completed task', 'info');
+            }
+            return;
+        }
+        
+        this.taskName = state.task_name;
+        this.timerType = state.timer_type;
+        this.category = state.category;
+        this.duration = state.duration * 60;
+        this.endTime = Date.parse(state.end_time);
+        this.timeLeft = Math.max(0, Math.round(state.remaining));
+        this.taskNameInput.value = this.taskName;
+        
+        this.isRunning = true;
+        this.isPaused = state.is_paused;
+        clearInterval(this.interval);
+        if (!this.isPaused) {
+            this.interval = setInterval(() => this.tick(), 1000);
+        }
+        this.pauseBtn.innerHTML = this.isPaused
+            ? '<i class="bi bi-play-fill"></i> Resume'
+            : '<i class="bi bi-pause-fill"></i> Pause';
+        
+        this.updateDisplay();
+        this.updateProgress();
+        this.updateButtons();
+        this.updateTimerInfo();
+        this.hideSetup();
+        document.querySelector('.card').classList.add('timer-active');
+    }
+    
+    stopLocal() {
+        // Stop without notifying the server (the change came from the server)
+        this.isRunning = false;
+        this.isPaused = false;
+        this.endTime = null;
+        clearInterval(this.interval);
+        this.timeLeft = this.duration;
+        this.updateDisplay();
+        this.updateButtons();
+        this.showSetup();
+        document.querySelector('.card').classList.remove('timer-active');
     }
     
     initializeElements() {
@@ -93,6 +186,7 @@ class Timer {
             if (this.timeLeft === this.duration || this.timeLeft === 0) {
                 this.timeLeft = this.duration;
             }
+            this.endTime = this.serverNow() + this.timeLeft * 1000;
             
             // Send start request to server
             this.startTimer();
@@ -120,6 +214,7 @@ class Timer {
             clearInterval(this.interval);
             this.pauseBtn.innerHTML = '<i class="bi bi-play-fill"></i> Resume';
         } else {
+            this.endTime = this.serverNow() + this.timeLeft * 1000;
             this.interval = setInterval(() => {
                 this.tick();
             }, 1000);
@@ -161,7 +256,7 @@ class Timer {
     
     tick() {
         if (!this.isPaused) {
-            this.timeLeft--;
+            this.timeLeft = Math.max(0, Math.round((this.endTime - this.serverNow()) / 1000));
             this.updateDisplay();
             this.updateProgress();
             
@@ -353,27 +448,7 @@ class Timer {
     checkActiveTimer() {
         fetch('/hook/get_timer_status')
         .then(response => response.json())
-        .then(data => {
-            if (data.active) {
-                this.taskName = data.task_name;
-                this.timerType = data.timer_type;
-                this.timeLeft = Math.floor(data.remaining);
-                this.duration = this.timeLeft; // Approximate
-                
-                this.taskNameInput.value = this.taskName;
-                this.updateDisplay();
-                this.updateTimerInfo();
-                
-                if (!data.is_paused) {
-                    this.start();
-                } else {
-                    this.isRunning = true;
-                    this.isPaused = true;
-                    this.updateButtons();
-                    this.hideSetup();
-                }
-            }
-        })
+        .then(data => this.applyState(data))
         .catch(error => {
             console.error('Error checking timer status:', error);
         });
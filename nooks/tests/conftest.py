@@ -0,0 +1,27 @@
+import os
+import sys
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from flask import Flask
+from pymongo import MongoClient
+
+# Modules import each other as top-level names (models, blueprints, utils), as under app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    """App context on a throwaway database; needs TEST_MONGO_URI (or MONGO_URI) to reach MongoDB"""
+    uri = os.environ.get('TEST_MONGO_URI') or os.environ.get('MONGO_URI')
+    if not uri:
+        pytest.skip('TEST_MONGO_URI is not set')
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    name = f'nooks_test_{uuid4().hex[:12]}'
+    app = Flask(__name__)
+    app.mongo = SimpleNamespace(db=client[name])
+    with app.app_context():
+        yield app
+    client.drop_database(name)
+    client.close()
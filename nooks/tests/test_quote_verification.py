@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from blueprints.rewards.services import RewardService
+from models import QuoteModel
+
+# Ids, clocks and batch tags differ between any two runs, and ledger entries are
+# numbered in the order each path writes them; everything else must match
+VOLATILE = {
+    '_id', 'user_id', 'book_id', 'quote_id', 'reference_id', 'transaction_id',
+    'date', 'timestamp', 'earned_at', 'submitted_at', 'verified_at', 'verify_batch',
+    'seq', 'balance'
+}
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    return value
+
+
+def documents(db, collection, user_id):
+    return sorted((normalize(d) for d in db[collection].find({'user_id': user_id})), key=repr)
+
+
+def reader_with_quotes(db, pages, reward_amount=1500):
+    """A user with one book and a pending quote on each page; returns (user_id, quote_ids)"""
+    user_id = db.users.insert_one({
+        'username': f'reader-{ObjectId()}',
+        'email': f'{ObjectId()}@example.com',
+        'total_points': 0,
+        'level': 1,
+        'ledger_seq': 0,
+        'is_active': True
+    }).inserted_id
+    book_id = db.books.insert_one({'user_id': user_id, 'title': 'Middlemarch', 'status': 'reading'}).inserted_id
+    quote_ids = db.quotes.insert_many([{
+        'user_id': user_id,
+        'book_id': book_id,
+        'quote_text': 'It is a narrow mind which cannot look at a subject from various points of view.',
+        'page_number': page,
+        'reward_amount': reward_amount,
+        'status': 'pending',
+        'claimed_by': None,
+        'claim_expires_at': None,
+        'submitted_at': datetime.utcnow()
+    } for page in pages]).inserted_ids
+    return user_id, quote_ids
+
+
+def test_bulk_verify_matches_verify_quote(app):
+    """Several quotes whose rewards cross more than one level pay the same either way"""
+    db = app.mongo.db
+    admin_id = ObjectId()
+    pages = [12, 40, 77]
+    single_user, single_quotes = reader_with_quotes(db, pages)
+    bulk_user, bulk_quotes = reader_with_quotes(db, pages)
+
+    for quote_id in single_quotes:
+        assert QuoteModel.verify_quote(str(quote_id), str(admin_id)) == (True, None)
+    results = QuoteModel.bulk_verify([str(q) for q in bulk_quotes], str(admin_id))
+    assert results == {str(q): (True, None) for q in bulk_quotes}
+
+    for collection in ('rewards', 'transactions', 'activity_log', 'points_ledger', 'user_badges', 'quotes'):
+        assert documents(db, collection, single_user) == documents(db, collection, bulk_user), collection
+
+    fields = {'total_points': 1, 'level': 1, 'ledger_seq': 1, '_id': 0}
+    single = db.users.find_one({'_id': single_user}, fields)
+    assert single == db.users.find_one({'_id': bulk_user}, fields)
+    assert single['level'] > 3
+    assert single['level'] == RewardService.calculate_level(single['total_points'])
+    bonuses = sorted(r['description'] for r in db.rewards.find({'user_id': bulk_user, 'category': 'level_up'}))
+    assert bonuses == sorted(f'Level {level} reached!' for level in range(2, single['level'] + 1))
+
+    for user_id, quote_ids in ((single_user, single_quotes), (bulk_user, bulk_quotes)):
+        rewarded = {r['reference_id'] for r in db.rewards.find({'user_id': user_id, 'category': 'quote_verified'})}
+        assert rewarded == set(quote_ids)
+        assert {t['quote_id'] for t in db.transactions.find({'user_id': user_id})} == set(quote_ids)
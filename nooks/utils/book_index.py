@@ -0,0 +1,310 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2  # 2: snapshots record the books indexed since built_at
+SNAPSHOT_MAX_AGE = 24 * 60 * 60  # Rebuild from Mongo when the snapshot is older than a day
+REFRESH_INTERVAL = 60  # Seconds between catch-up reads of newly added books
+SNAPSHOT_EVERY = 50  # Persist after this many incremental additions
+MAX_TITLE_SUFFIXES = 6  # Word positions indexed per title so mid-title prefixes match
+TRIGRAM_THRESHOLD = 0.3
+CATALOG_PROJECTION = {
+    'title': 1, 'authors': 1, 'isbn': 1, 'google_books_id': 1, 'cover_image': 1, 'page_count': 1,
+    'genre': 1, 'published_date': 1, 'description': 1, 'library_count': 1
+}
+
+_non_alnum = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """Lowercase and collapse punctuation/whitespace so lookups are forgiving"""
+    if not isinstance(text, str):
+        return ''
+    return _non_alnum.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    """Return the set of padded character trigrams for a normalized string"""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class BookIndex:
+    """In-process autocomplete index over titles, authors and ISBNs in the shared catalog.
+
+    Prefix lookups use a sorted term array searched with bisect; a trigram map
+    over titles covers typos when prefix matches are thin. Full builds happen on a
+    separate instance, sorting the terms once, and are swapped in under the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._entries = {}
+        self._terms = []
+        self._trigrams = defaultdict(set)
+        self._built_at = None
+        self._loaded = False
+        self._last_refresh = 0
+        self._pending_snapshot = 0
+        self._recent_ids = set()
+
+    @staticmethod
+    def entry_key(title, authors):
+        """Identity of a catalog entry: normalized title plus normalized author list"""
+        return f"{normalize(title)}|{','.join(normalize(a) for a in (authors or []))}"
+
+    def ensure_loaded(self):
+        """Load the index from the snapshot (or Mongo) and catch up on new books"""
+        if not self._loaded:
+            # Only one thread loads; searches keep the lock only for the swap
+            with self._load_lock:
+                if not self._loaded:
+                    if not self._load_snapshot():
+                        self.rebuild()
+                    self._loaded = True
+        if time.time() - self._last_refresh >= REFRESH_INTERVAL:
+            self._catch_up()
+
+    def rebuild(self):
+        """Rebuild the whole index from the shared catalog, ranked by library count"""
+        started = datetime.utcnow()
+        index = self._build(
+            (entry, max(entry.get('library_count', 0), 1))
+            for entry in current_app.mongo.db.catalog.find({}, CATALOG_PROJECTION)
+        )
+        with self._lock:
+            self._swap(index, started)
+            self._last_refresh = time.time()
+        self.save_snapshot()
+        logger.info(f"Built book index with {len(index._entries)} entries")
+
+    def add_book(self, book):
+        """Incrementally index a newly added book document"""
+        with self._lock:
+            if not self._loaded:
+                return
+            if book.get('_id') is not None:
+                self._recent_ids.add(book['_id'])
+            self._add(book)
+            self._pending_snapshot += 1
+            if self._pending_snapshot >= SNAPSHOT_EVERY:
+                self.save_snapshot()
+
+    def search(self, query, limit=10):
+        """Return up to `limit` entries matching the query by prefix, then by trigram similarity"""
+        q = normalize(query)
+        if not q:
+            return []
+        with self._lock:
+            keys = []
+            seen = set()
+            start = bisect.bisect_left(self._terms, (q, ''))
+            for term, key in self._terms[start:]:
+                if not term.startswith(q):
+                    break
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+            results = sorted((self._entries[k] for k in keys), key=lambda e: (-e['count'], e['title']))[:limit]
+
+            if len(results) < limit and len(q) >= 3:
+                results.extend(self._fuzzy(q, limit - len(results), exclude=seen))
+            return [dict(entry) for entry in results]
+
+    def save_snapshot(self):
+        """Write the index to disk so the next worker can start without a full rebuild"""
+        path = self._snapshot_path()
+        if not path:
+            return
+        with self._lock:
+            # built_at plus the books indexed since is exactly what the entries cover
+            data = {
+                'version': SNAPSHOT_VERSION,
+                'built_at': self._built_at.isoformat() if self._built_at else None,
+                'recent_ids': [str(book_id) for book_id in self._recent_ids],
+                'entries': list(self._entries.values())
+            }
+            self._pending_snapshot = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing book index snapshot {path}: {str(e)}")
+
+    def _load_snapshot(self):
+        path = self._snapshot_path()
+        if not path or not os.path.exists(path):
+            return False
+        if time.time() - os.path.getmtime(path) > SNAPSHOT_MAX_AGE:
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading book index snapshot {path}: {str(e)}")
+            return False
+        if data.get('version') != SNAPSHOT_VERSION or not data.get('built_at'):
+            return False
+
+        index = self._build((entry, entry.get('count', 1)) for entry in data.get('entries', []))
+        with self._lock:
+            self._swap(index, datetime.fromisoformat(data['built_at']))
+            self._recent_ids = {ObjectId(book_id) for book_id in data.get('recent_ids', [])}
+        logger.info(f"Loaded book index snapshot with {len(index._entries)} entries")
+        return True
+
+    def _catch_up(self):
+        """Index books added (by any worker) since the index was last built or refreshed.
+
+        The queries run without the lock; it is taken only to merge the results.
+        """
+        with self._lock:
+            if time.time() - self._last_refresh < REFRESH_INTERVAL:
+                return  # Another thread got here first
+            self._last_refresh = time.time()
+            built_at = self._built_at
+        if not built_at:
+            return
+        started = datetime.utcnow()
+        new_books = list(current_app.mongo.db.books.find(
+            {'added_at': {'$gt': built_at}},
+            {'title': 1, 'authors': 1, 'catalog_id': 1, 'cover_image': 1, 'cover_url': 1,
+             'page_count': 1, 'total_pages': 1, 'genre': 1}
+        ))
+        # Identifiers and descriptions live on the catalog entry, not the per-user book
+        catalog_ids = [book['catalog_id'] for book in new_books if book.get('catalog_id')]
+        entries = {
+            entry['_id']: entry
+            for entry in current_app.mongo.db.catalog.find({'_id': {'$in': catalog_ids}}, CATALOG_PROJECTION)
+        } if catalog_ids else {}
+
+        with self._lock:
+            if self._built_at != built_at:
+                return  # A rebuild or another catch-up was swapped in meanwhile
+            added = 0
+            for book in new_books:
+                if book['_id'] in self._recent_ids:
+                    continue
+                entry = entries.get(book.get('catalog_id'), {})
+                self._add(dict(entry, **{k: v for k, v in book.items() if v}))
+                added += 1
+            # Books add_book indexed after the query ran will be found by the next one
+            self._recent_ids -= {book['_id'] for book in new_books}
+            self._built_at = started
+            if added:
+                self._pending_snapshot += added
+            save = self._pending_snapshot >= SNAPSHOT_EVERY
+        if save:
+            self.save_snapshot()
+
+    @staticmethod
+    def _build(entries):
+        """A new index over (entry, count) pairs, built without touching any live index"""
+        index = BookIndex()
+        for entry, count in entries:
+            index._add(entry, count=count, sort_terms=False)
+        index._terms.sort()
+        return index
+
+    def _swap(self, index, built_at):
+        """Replace this index's contents with a built one; the caller holds the lock"""
+        self._recent_ids = set()
+        self._entries = index._entries
+        self._terms = index._terms
+        self._trigrams = index._trigrams
+        self._built_at = built_at
+
+    def _add(self, book, count=1, sort_terms=True):
+        title = book.get('title')
+        if not title:
+            return
+        authors = book.get('authors') or []
+        if isinstance(authors, str):
+            authors = [a.strip() for a in authors.split(',') if a.strip()]
+        key = self.entry_key(title, authors)
+
+        entry = self._entries.get(key)
+        if entry:
+            entry['count'] += count
+            for field in ('isbn', 'google_books_id', 'cover_image', 'page_count', 'genre', 'published_date'):
+                if not entry.get(field) and book.get(field):
+                    entry[field] = book[field]
+            return
+
+        self._entries[key] = {
+            'key': key,
+            'title': title,
+            'authors': list(authors),
+            'isbn': book.get('isbn') or '',
+            'google_books_id': book.get('google_books_id') or '',
+            'cover_image': book.get('cover_image') or book.get('cover_url') or '',
+            'page_count': book.get('page_count') or book.get('total_pages') or 0,
+            'genre': book.get('genre') or '',
+            'published_date': book.get('published_date') or '',
+            'description': (book.get('description') or '')[:500],
+            'count': count
+        }
+
+        norm_title = normalize(title)
+        terms = set()
+        words = norm_title.split()
+        for i in range(min(len(words), MAX_TITLE_SUFFIXES)):
+            terms.add(' '.join(words[i:]))
+        for author in authors:
+            norm_author = normalize(author)
+            if norm_author:
+                terms.add(norm_author)
+                terms.add(norm_author.split()[-1])
+        isbn = normalize(book.get('isbn') or '').replace(' ', '')
+        if isbn:
+            terms.add(isbn)
+        if sort_terms:
+            for term in terms:
+                bisect.insort(self._terms, (term, key))
+        else:
+            # Bulk builds sort once at the end instead of an O(n) insert per term
+            self._terms.extend((term, key) for term in terms)
+        for gram in trigrams(norm_title):
+            self._trigrams[gram].add(key)
+
+    def _fuzzy(self, q, limit, exclude):
+        query_grams = trigrams(q)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for key in self._trigrams.get(gram, ()):
+                if key not in exclude:
+                    shared[key] += 1
+
+        scored = []
+        for key, overlap in shared.items():
+            title_grams = len(trigrams(normalize(self._entries[key]['title'])))
+            score = overlap / (len(query_grams) + title_grams - overlap)
+            if score >= TRIGRAM_THRESHOLD:
+                scored.append((score, self._entries[key]['count'], key))
+        scored.sort(reverse=True)
+        return [self._entries[key] for _, _, key in scored[:limit]]
+
+    @staticmethod
+    def _snapshot_path():
+        try:
+            return current_app.config.get('BOOK_INDEX_SNAPSHOT')
+        except RuntimeError:
+            return None
+
+
+book_index = BookIndex()
@@ -0,0 +1,44 @@
+import threading
+import time
+
+CACHE_TTL = 60  # Seconds before a cached role is re-read, so other workers' changes show up
+MAX_ENTRIES = 100000
+MISS = object()  # Returned by get() when the cache has nothing for the pair
+
+
+class MembershipCache:
+    """Per-process map of (club_id, user_id) to the user's role in the club, or None.
+
+    Reads are a dict lookup; ClubMembershipModel invalidates entries on join, leave,
+    promote and demote, and CACHE_TTL bounds staleness from writes in other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles = {}
+
+    def get(self, club_id, user_id):
+        """Cached role, None for a cached non-member, or MISS"""
+        entry = self._roles.get((str(club_id), str(user_id)))
+        if entry and time.time() - entry[1] < CACHE_TTL:
+            return entry[0]
+        return MISS
+
+    def set(self, club_id, user_id, role):
+        with self._lock:
+            if len(self._roles) >= MAX_ENTRIES:
+                self._roles.clear()
+            self._roles[(str(club_id), str(user_id))] = (role, time.time())
+
+    def invalidate(self, club_id, user_id=None):
+        """Drop one user's entry, or every entry for the club"""
+        with self._lock:
+            if user_id is not None:
+                self._roles.pop((str(club_id), str(user_id)), None)
+            else:
+                club_id = str(club_id)
+                for key in [k for k in self._roles if k[0] == club_id]:
+                    del self._roles[key]
+
+
+membership_cache = MembershipCache()
@@ -0,0 +1,91 @@
+from datetime import datetime
+import logging
+import time
+
+from pymongo import MongoClient, CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+import socketio
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = 'socketio_messages'
+COLLECTION_SIZE = 16 * 1024 * 1024  # Capped, so old messages roll off on their own
+RETRY_SECONDS = 1
+MONGO_SCHEMES = ('mongodb://', 'mongodb+srv://')
+
+
+class MongoPubSubManager(socketio.PubSubManager):
+    """Socket.IO client manager that fans out emits through a capped Mongo collection.
+
+    Every process inserts the messages it publishes and tails the collection with an
+    awaiting cursor, so emits reach sockets connected to any worker without running
+    Redis or RabbitMQ. Like Redis pub/sub, delivery is at most once: a listener that
+    reconnects resumes after the last message it saw. Positions come from the capped
+    collection's insertion order, never from publishers' clocks.
+    """
+
+    name = 'mongo'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.client = MongoClient(url)
+        self.collection = self.client.get_default_database('nooks')[COLLECTION]
+        self._ensure_collection()
+
+    def _ensure_collection(self):
+        db = self.collection.database
+        try:
+            db.create_collection(COLLECTION, capped=True, size=COLLECTION_SIZE)
+            # Tailable cursors on an empty capped collection die immediately
+            self.collection.insert_one({'channel': None, 'ts': datetime.utcnow()})
+            logger.info(f"Created capped collection: {COLLECTION}")
+        except CollectionInvalid:
+            if not self.collection.options().get('capped'):
+                logger.error(f"{COLLECTION} exists but is not capped; cross-process emits will not work")
+
+    def _publish(self, data):
+        self.collection.insert_one({
+            'channel': self.channel,
+            'ts': datetime.utcnow(),
+            'message': self.json.dumps(data)
+        })
+
+    def _listen(self):
+        last_id = None
+        started = False
+        while True:
+            try:
+                if not started:
+                    # Start after whatever is already in the collection
+                    last = self.collection.find_one({}, {'_id': 1}, sort=[('$natural', -1)])
+                    last_id = last['_id'] if last else None
+                    started = True
+                # Capped collections return documents in insertion order, so skip up to the
+                # last one seen; if it has rolled off, everything left came after it
+                seeking = last_id is not None and self.collection.count_documents({'_id': last_id}, limit=1) > 0
+                cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for doc in cursor:
+                        if seeking:
+                            seeking = doc['_id'] != last_id
+                            continue
+                        last_id = doc['_id']
+                        if doc.get('channel') == self.channel:
+                            yield doc['message']
+            except PyMongoError as e:
+                logger.error(f"Error tailing {COLLECTION}: {str(e)}")
+            time.sleep(RETRY_SECONDS)
+
+
+def create_client_manager(url, mongo_uri=None, write_only=False):
+    """Client manager for a SOCKETIO_MESSAGE_QUEUE value, or None to let Flask-SocketIO pick.
+
+    `mongodb` means the bundled broker on the app's own database (`mongo_uri`); a
+    mongodb:// URL points it elsewhere. Anything else (redis://, amqp://, kafka://)
+    is left to Flask-SocketIO's own managers.
+    """
+    if url == 'mongodb':
+        url = mongo_uri
+    if not url or not url.startswith(MONGO_SCHEMES):
+        return None
+    return MongoPubSubManager(url, write_only=write_only)
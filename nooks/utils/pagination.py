@@ -0,0 +1,65 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(doc, field):
+    """Opaque cursor for a document's position in a (field, _id) ordering"""
+    value = doc[field]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return f"{value}_{doc['_id']}"
+
+
+def decode_cursor(token):
+    """Return (datetime, ObjectId) from a cursor, or None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        value, _, doc_id = token.rpartition('_')
+        return datetime.fromisoformat(value), ObjectId(doc_id)
+    except (ValueError, InvalidId):
+        logger.warning(f"Ignoring invalid pagination cursor: {token}")
+        return None
+
+
+def keyset_page(collection, query, field, per_page, before=None, after=None, projection=None):
+    """One page of `query` ordered newest first by (field, _id), without skip.
+
+    Needs an index ending in (field, _id) after the query's equality fields.
+
+    `before` pages to older documents, `after` back to newer ones. Both take a cursor
+    from a previous page. Returns (docs, older_cursor, newer_cursor); a cursor is None
+    when there is nothing further in that direction.
+    """
+    older = decode_cursor(before)
+    newer = decode_cursor(after) if not older else None
+    query = dict(query)
+    direction = -1
+    if older:
+        query['$or'] = [{field: {'$lt': older[0]}}, {field: older[0], '_id': {'$lt': older[1]}}]
+    elif newer:
+        query['$or'] = [{field: {'$gt': newer[0]}}, {field: newer[0], '_id': {'$gt': newer[1]}}]
+        direction = 1
+
+    docs = list(collection.find(query, projection)
+                .sort([(field, direction), ('_id', direction)])
+                .limit(per_page + 1))
+    has_more = len(docs) > per_page
+    docs = docs[:per_page]
+    if direction == 1:
+        docs.reverse()
+    if not docs:
+        return docs, None, None
+
+    # Coming back from an older page there is always an older page; from a newer page, a newer one
+    has_older = has_more if direction == -1 else True
+    has_newer = bool(older) if direction == -1 else has_more
+    return (
+        docs,
+        encode_cursor(docs[-1], field) if has_older else None,
+        encode_cursor(docs[0], field) if has_newer else None
+    )
@@ -0,0 +1,80 @@
+from flask_login import current_user
+from flask_socketio import SocketIO, join_room
+import logging
+
+from utils.message_queue import create_client_manager
+
+logger = logging.getLogger(__name__)
+
+# Shared Socket.IO instance; bound to the app in create_app and served by socketio_server.py
+socketio = SocketIO()
+
+_queue_listeners = []
+
+
+def init_realtime(app):
+    """Bind Socket.IO to the app, using SOCKETIO_MESSAGE_QUEUE when workers need to share emits"""
+    queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    options = {'cors_allowed_origins': '*'}
+    client_manager = create_client_manager(queue, mongo_uri=app.config.get('MONGO_URI'))
+    if client_manager:
+        options['client_manager'] = client_manager
+    elif queue:
+        options['message_queue'] = queue
+    socketio.init_app(app, **options)
+    if client_manager or queue:
+        _tap_queue(socketio.server.manager)
+    logger.info(f"Socket.IO running in {socketio.async_mode} mode with message queue: {queue or 'none'}")
+
+
+def listen_to_queue(listener):
+    """Call listener(event, data) for every emit another process publishes on the message queue"""
+    _queue_listeners.append(listener)
+
+
+def _tap_queue(manager):
+    """Let listeners see emits arriving from other processes before they go out to local sockets.
+
+    python-socketio has no public hook for incoming queue messages, so this wraps the
+    pub/sub manager's `_handle_emit`; requirements.txt pins the version it was checked
+    against. If the hook goes away, a warning is logged and listeners stop hearing other
+    processes; local emits are unaffected.
+    """
+    handle_emit = getattr(manager, '_handle_emit', None)
+    if handle_emit is None or not hasattr(manager, 'host_id'):
+        logger.warning(f"{type(manager).__name__} has no _handle_emit to tap; cross-process listeners are disabled")
+        return
+
+    def tapped(message):
+        if isinstance(message, dict) and message.get('host_id') != manager.host_id and not message.get('binary'):
+            # Emits carry their arguments as a list; a single argument is the payload
+            data = message.get('data')
+            if isinstance(data, list):
+                data = data[0] if len(data) == 1 else tuple(data) or None
+            for listener in _queue_listeners:
+                try:
+                    listener(message['event'], data)
+                except Exception as e:
+                    logger.error(f"Error handling {message['event']} from the message queue: {str(e)}")
+        return handle_emit(message)
+
+    manager._handle_emit = tapped
+
+
+def user_room(user_id):
+    """Room every socket of a user joins, so all their tabs and devices get the same events"""
+    return f'user:{user_id}'
+
+
+def emit_to_user(user_id, event, data):
+    """Emit an event to all of a user's connected sockets; failures never break the request"""
+    try:
+        socketio.emit(event, data, to=user_room(user_id))
+    except Exception as e:
+        logger.error(f"Error emitting {event} to user {user_id}: {str(e)}")
+
+
+@socketio.on('connect')
+def handle_connect():
+    if current_user.is_authenticated:
+        join_room(user_room(current_user.id))
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+import logging
+import threading
+
+from flask import current_app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # Plain threads without gevent
+    get_hub = None
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 5
+
+
+class BackgroundScheduler:
+    """Runs registered jobs at fixed intervals on a daemon thread inside the app context.
+
+    Every worker process runs its own scheduler, but each run is claimed in the
+    `scheduler_jobs` collection (one document per job holding its next and last run),
+    so a job fires once per interval across all processes and restarts don't push it
+    back: a job that is overdue, or has never run, is picked up on the first tick.
+    Jobs should still claim their own work atomically, as a manual run_job can overlap.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._app = None
+
+    def add_job(self, name, func, interval):
+        """Register `func` to run every `interval` seconds; re-registering a name replaces it"""
+        with self._lock:
+            # The shared schedule decides when it really runs; check it on the first tick
+            self._jobs[name] = {'func': func, 'interval': interval, 'next_run': datetime.min}
+
+    def init_app(self, app):
+        """Bind to the app and start the worker thread unless SCHEDULER_ENABLED is off"""
+        self._app = app
+        app.extensions['scheduler'] = self
+        if app.config.get('SCHEDULER_ENABLED', True):
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='nooks-scheduler', daemon=True)
+            self._thread.start()
+        logger.info(f"Background scheduler started with jobs: {', '.join(self._jobs) or 'none'}")
+
+    def stop(self):
+        self._stop.set()
+
+    def run_job(self, name):
+        """Run a job immediately in the current thread (used by admin triggers and scripts)"""
+        job = self._jobs.get(name)
+        if not job:
+            raise KeyError(name)
+        with self._app.app_context():
+            return job['func']()
+
+    def _run(self):
+        while not self._stop.wait(TICK_SECONDS):
+            now = datetime.utcnow()
+            with self._lock:
+                due = [(name, job) for name, job in self._jobs.items() if job['next_run'] <= now]
+            for name, job in due:
+                try:
+                    with self._app.app_context():
+                        if self._claim(name, job, now):
+                            job['func']()
+                except Exception as e:
+                    logger.error(f"Error running scheduled job {name}: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def _claim(name, job, now):
+        """Take this interval's run of a job; False if it isn't due or another process has it"""
+        jobs = current_app.mongo.db.scheduler_jobs
+        try:
+            # Upserting creates a never-run job as claimed; a job that isn't due yet
+            # fails the filter and the insert then collides with its _id
+            claimed = jobs.find_one_and_update(
+                {'_id': name, 'next_run': {'$lte': now}},
+                {'$set': {'next_run': now + timedelta(seconds=job['interval']), 'last_run': now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            claimed = None
+        except PyMongoError as e:
+            logger.error(f"Could not claim scheduled job {name}, retrying next tick: {str(e)}")
+            return False
+        if claimed:
+            job['next_run'] = claimed['next_run']
+            return True
+        current = jobs.find_one({'_id': name}, {'next_run': 1})
+        job['next_run'] = current['next_run'] if current else now
+        return False
+
+
+def run_blocking(func, *args):
+    """Call a CPU-bound `func(*args)` without stalling the worker's event loop.
+
+    Under the gevent worker the scheduler "thread" is a greenlet, so long pure-Python
+    work would hold up every socket in the process. There it runs on gevent's pool of
+    real OS threads while this greenlet waits; elsewhere it is simply called. `func`
+    must not touch the app context or the database.
+    """
+    if get_hub is not None and is_module_patched('threading'):
+        return get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+scheduler = BackgroundScheduler()
@@ -0,0 +1,79 @@
+import hashlib
+import random
+import re
+import unicodedata
+import zlib
+
+SHINGLE_SIZE = 5  # Characters per shingle; short enough that a quote yields a useful set
+NUM_HASHES = 64
+BANDS = 16  # 16 bands of 4 rows: pairs above roughly 0.5 similarity share a bucket
+ROWS = NUM_HASHES // BANDS
+GRAM_WORDS = 3  # Words per n-gram in page text indexes
+_PRIME = (1 << 61) - 1
+
+# Fixed seed so every process, and every stored signature, uses the same permutations
+_rng = random.Random(20240611)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    return ' '.join(text.split())
+
+
+def text_hash(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def shingles(normalized):
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def _stable_hash(value):
+    # hash() is salted per process, so signatures are built from a digest instead
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash(shingle_set):
+    """NUM_HASHES minimums, one per permutation; matching positions estimate Jaccard similarity"""
+    hashes = [_stable_hash(s) for s in shingle_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature):
+    """One bucket key per band of the signature, for an indexed multikey field"""
+    return [
+        f"{band}:{_stable_hash(','.join(map(str, signature[band * ROWS:(band + 1) * ROWS]))):x}"
+        for band in range(BANDS)
+    ]
+
+
+def similarity(signature_a, signature_b):
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+def word_grams(text):
+    """Sorted CRC32 hashes of the text's normalized word trigrams, a compact set to match quotes against"""
+    words = normalize(text).split()
+    return sorted({
+        zlib.crc32(' '.join(words[i:i + GRAM_WORDS]).encode('utf-8'))
+        for i in range(len(words) - GRAM_WORDS + 1)
+    })
+
+
+def fingerprint(text):
+    """Fields stored on a quote so it can be matched against later submissions"""
+    normalized = normalize(text)
+    signature = minhash(shingles(normalized))
+    return {
+        'text_hash': text_hash(normalized),
+        'minhash': signature,
+        'lsh_buckets': lsh_buckets(signature)
+    }